@@ -0,0 +1,333 @@
+"""
+In-process load benchmark for the auth and profile endpoints.
+
+Runs against throwaway test databases. Seeds users of every role, then
+replays a request stream through the WSGI stack (Django's test Client from
+a pool of threads, like sync workers) and/or the ASGI stack (AsyncClient
+with the native async views, many requests in flight on one event loop).
+
+A replay file is JSONL with one request per line:
+
+    {"request_id": "r1", "endpoint": "profile_get", "role": "instructor",
+     "headers": {"Accept": "application/json"}, "data": {...}}
+
+`endpoint` is one of ENDPOINTS and `role` picks the seeded user to act as.
+Backlog entries, lines with request_id and title but no endpoint (the
+format of the repo's requests.jsonl), each replay DEFAULT_MIX once under
+their request_id. Other lines without a known endpoint are skipped and
+counted.
+"""
+import asyncio
+import importlib
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.urls import clear_url_caches, reverse
+
+PASSWORD = 'BenchPass123!'
+ROLES = ('student', 'instructor', 'admin')
+
+# endpoint -> (method, url name, needs a logged-in user)
+ENDPOINTS = {
+    'login': ('post', 'authentication:login', False),
+    'register': ('post', 'authentication:register', False),
+    'profile_get': ('get', 'user_management:profile', True),
+    'profile_post': ('post', 'user_management:profile', True),
+    'change_password': ('post', 'user_management:change_password', True),
+    'logout': ('post', 'authentication:logout', True),
+}
+
+# Used without a replay file: mostly profile reads, like real traffic
+DEFAULT_MIX = (
+    [{'endpoint': 'profile_get', 'role': role} for role in ROLES for _ in range(4)]
+    + [{'endpoint': 'profile_post', 'role': 'student', 'data': {'first_name': 'Bench'}}]
+    + [{'endpoint': 'login', 'role': role} for role in ROLES]
+    + [{'endpoint': 'register'}, {'endpoint': 'change_password', 'role': 'student'}, {'endpoint': 'logout', 'role': 'student'}]
+)
+
+_endpoint = ContextVar('bench_endpoint', default=None)
+
+
+def load_replay(path):
+    """
+    Return (records, skipped line count) from a JSONL replay file.
+    Backlog entries expand to one pass of DEFAULT_MIX each.
+    """
+    records, skipped = [], 0
+    with open(path, encoding='utf-8') as stream:
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if isinstance(record, dict) and 'endpoint' not in record and 'request_id' in record and 'title' in record:
+                records.extend({**request, 'request_id': record['request_id']} for request in DEFAULT_MIX)
+                continue
+            if not isinstance(record, dict) or record.get('endpoint') not in ENDPOINTS:
+                skipped += 1
+                continue
+            records.append(record)
+    return records, skipped
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def latency_summary(latencies):
+    return {
+        f'p{pct}_ms': round(percentile(latencies, pct) * 1000, 2) for pct in (50, 95, 99)
+    } if latencies else {}
+
+
+class Recorder:
+    """
+    Collects latencies, statuses and query counts per endpoint from all threads.
+    """
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.queries = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, latency, status):
+        with self._lock:
+            self.latencies[endpoint].append(latency)
+            self.statuses[endpoint][str(status)] += 1
+
+    def count_query(self, execute, sql, params, many, context):
+        endpoint = _endpoint.get()
+        if endpoint is not None:
+            with self._lock:
+                self.queries[endpoint] += 1
+        return execute(sql, params, many, context)
+
+    def install(self):
+        """
+        Count queries on this thread's connections.
+        """
+        for alias in connections:
+            if self.count_query not in connections[alias].execute_wrappers:
+                connections[alias].execute_wrappers.append(self.count_query)
+
+    def report(self, stack, elapsed):
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            endpoints[endpoint] = {
+                'requests': len(latencies),
+                **latency_summary(latencies),
+                'queries_per_request': round(self.queries[endpoint] / len(latencies), 2),
+                'statuses': dict(self.statuses[endpoint]),
+            }
+        latencies = [latency for values in self.latencies.values() for latency in values]
+        statuses = Counter()
+        for counter in self.statuses.values():
+            statuses.update(counter)
+        return {
+            'stack': stack,
+            'requests': len(latencies),
+            'seconds': round(elapsed, 3),
+            'requests_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+            **latency_summary(latencies),
+            'queries_per_request': round(sum(self.queries.values()) / len(latencies), 2) if latencies else 0.0,
+            'statuses': dict(statuses),
+            'endpoints': endpoints,
+        }
+
+
+@contextmanager
+def async_views(enabled):
+    """
+    Serve the native async views (as asgi.py does) while active.
+    URLconfs pick their view classes at import time, so they are reloaded.
+    """
+    def reload_urls():
+        for module in ('authentication.urls', 'user_management.urls', 'auth_service.urls'):
+            importlib.reload(sys.modules[module])
+        clear_url_caches()
+
+    try:
+        with override_settings(ASYNC_VIEWS=enabled):
+            reload_urls()
+            yield
+    finally:
+        reload_urls()
+
+
+class Bench:
+    """
+    Seeds users and replays records through the WSGI and ASGI stacks.
+    """
+    def __init__(self, records, users_per_role=20, concurrency=8, total=None):
+        self.records = records
+        self.users_per_role = users_per_role
+        self.concurrency = concurrency
+        self.total = total or len(records)
+        self.users = {}
+        # change_password ends the user's other sessions, so it gets users of its own
+        self.password_users = {}
+        self._register_ids = itertools.count()
+
+    def seed(self):
+        from user_management.models import Pengguna, Admin, Instruktur
+        # Hash once; every seeded user shares the password
+        encoded = make_password(PASSWORD)
+        models = {'student': Pengguna, 'instructor': Instruktur, 'admin': Admin}
+        for role, model in models.items():
+            self.users[role] = []
+            self.password_users[role] = []
+            for index in range(self.users_per_role * 2):
+                extra = {'keahlian': 5} if model is Instruktur else {}
+                user = model(username=f'bench_{role}_{index}', email=f'{role}{index}@bench.test',
+                             first_name='Bench', last_name=role.title(), password=encoded, **extra)
+                user.save()
+                (self.users if index < self.users_per_role else self.password_users)[role].append(user)
+
+    def requests(self):
+        """
+        Yield (record, user) for the run, cycling the records up to total.
+        """
+        records = itertools.islice(itertools.cycle(self.records), self.total)
+        counters = {role: itertools.cycle(users) for role, users in self.users.items()}
+        password_counters = {role: itertools.cycle(users) for role, users in self.password_users.items()}
+        for record in records:
+            role = record.get('role') if record.get('role') in self.users else 'student'
+            if record['endpoint'] == 'change_password':
+                yield record, next(password_counters[role])
+            else:
+                yield record, next(counters[role])
+
+    def request_args(self, record, user):
+        endpoint = record['endpoint']
+        method, url_name, _ = ENDPOINTS[endpoint]
+        data = dict(record.get('data') or {})
+        if endpoint == 'login':
+            data = {'username': user.username, 'password': PASSWORD, **data}
+        elif endpoint == 'register':
+            index = next(self._register_ids)
+            data = {
+                'username': f'bench_new_{index}', 'password': PASSWORD, 'password2': PASSWORD,
+                'email': f'new{index}@bench.test', 'first_name': 'New', 'last_name': 'User',
+                'role': 'student', **data,
+            }
+        elif endpoint == 'change_password':
+            # Keep the password the same so later logins still work
+            data = {'old_password': PASSWORD, 'new_password1': PASSWORD, 'new_password2': PASSWORD, **data}
+        return method, reverse(url_name), data, record.get('headers') or {}
+
+    def run_wsgi(self):
+        recorder = Recorder()
+        local = threading.local()
+
+        def one(item):
+            record, user = item
+            if not hasattr(local, 'client'):
+                recorder.install()
+                local.client = Client()
+            method, url, data, headers = self.request_args(record, user)
+            if record['endpoint'] == 'change_password':
+                # Each change stores a new hash; log in with the current one
+                user.refresh_from_db(fields=['password'])
+            if ENDPOINTS[record['endpoint']][2]:
+                local.client.force_login(user)
+            token = _endpoint.set(record['endpoint'])
+            started = time.perf_counter()
+            try:
+                response = getattr(local.client, method)(url, data, headers=headers)
+            finally:
+                _endpoint.reset(token)
+            recorder.record(record['endpoint'], time.perf_counter() - started, response.status_code)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(one, self.requests()))
+        elapsed = time.perf_counter() - started
+        return recorder.report('wsgi', elapsed)
+
+    def run_asgi(self):
+        recorder = Recorder()
+
+        async def main():
+            # Sync middleware and the async ORM share one thread
+            await sync_to_async(recorder.install)()
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def one(record, user):
+                async with semaphore:
+                    client = AsyncClient()
+                    method, url, data, headers = self.request_args(record, user)
+                    if record['endpoint'] == 'change_password':
+                        await user.arefresh_from_db(fields=['password'])
+                    if ENDPOINTS[record['endpoint']][2]:
+                        await client.aforce_login(user)
+                    token = _endpoint.set(record['endpoint'])
+                    started = time.perf_counter()
+                    try:
+                        response = await getattr(client, method)(url, data, headers=headers)
+                    finally:
+                        _endpoint.reset(token)
+                    recorder.record(record['endpoint'], time.perf_counter() - started, response.status_code)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(record, user) for record, user in self.requests()))
+            return time.perf_counter() - started
+
+        with async_views(True):
+            elapsed = asyncio.run(main())
+        return recorder.report('asgi', elapsed)
+
+
+@contextmanager
+def bench_environment():
+    """
+    Throwaway file-backed test databases, with throttling disabled.
+    SQLite test databases default to shared memory, which serializes
+    writers from different threads; a temporary file behaves like a server.
+    """
+    setup_test_environment()
+    tmpdir = tempfile.mkdtemp(prefix='bench-')
+    for alias in connections:
+        config = connections[alias].settings_dict
+        if config['ENGINE'] == 'django.db.backends.sqlite3' and not config['TEST'].get('MIRROR'):
+            config['TEST']['NAME'] = os.path.join(tmpdir, f'{alias}.sqlite3')
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        with override_settings(CREDENTIAL_THROTTLE_RATES={}):
+            from authentication.throttling import get_store
+            get_store().clear()
+            yield
+    finally:
+        connections.close_all()
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def environment_summary():
+    return {
+        'databases': {alias: config['ENGINE'] for alias, config in settings.DATABASES.items()},
+        'session_engine': settings.SESSION_ENGINE,
+        'password_hashing_workers': settings.PASSWORD_HASHING_WORKERS,
+        'cpu_count': os.cpu_count(),
+        'python': sys.version.split()[0],
+    }
@@ -0,0 +1,370 @@
+"""
+Per-view request metrics, exposed in Prometheus text format on /metrics.
+
+MetricsMiddleware records, per resolved URL name (authentication:login,
+user_management:profile, ...):
+
+- a latency histogram
+- database query count and time (an execute wrapper on every connection)
+- session saves that reached the database (auth_service.sessions)
+- template render time (InstrumentedTemplates backend)
+- password hashing time, including queue wait (authentication.hashing)
+
+Background jobs outside requests (the session reaper) add to process-wide
+JOB_COUNTERS instead.
+
+The request's totals are gathered in a RequestStats held in a context
+variable, so queries and hashes run via sync_to_async are attributed to the
+request that issued them. Finished requests are added to per-thread rows;
+each thread only ever writes its own rows, so recording takes no lock and
+a scrape sums the rows of all threads.
+
+Each gunicorn worker is a separate process. With METRICS_DIR set, workers
+write their totals to METRICS_DIR/<pid>.json (job counters to
+<pid>.counters.json) at most every
+METRICS_FLUSH_SECONDS, and /metrics adds up the files of every worker. Files
+of exited workers are kept so their counts are not lost; clear the directory
+when deploying.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template, reraise
+from django.template import TemplateDoesNotExist
+
+# Latency histogram upper bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Per-request totals, in row order after the request count and latency
+STATS = ('queries', 'query_seconds', 'session_saves', 'template_seconds', 'hash_seconds')
+
+# (name, help, row index) of the counters rendered besides the histogram
+COUNTERS = (
+    ('auth_db_queries_total', 'Database queries executed.', 2),
+    ('auth_db_query_seconds_total', 'Time spent executing database queries.', 3),
+    ('auth_session_saves_total', 'Session rows written.', 4),
+    ('auth_template_render_seconds_total', 'Time spent rendering templates.', 5),
+    ('auth_password_hash_seconds_total', 'Time spent waiting for and computing password hashes.', 6),
+)
+
+# (name, help) of process-wide counters added to by background jobs
+JOB_COUNTERS = (
+    ('auth_session_reaper_runs_total', 'Expired session cleanup runs.'),
+    ('auth_session_reaper_batches_total', 'Batches of expired sessions deleted.'),
+    ('auth_session_reaper_deleted_total', 'Expired sessions deleted.'),
+    ('auth_session_reaper_seconds_total', 'Time spent deleting expired sessions, pauses included.'),
+    ('auth_session_reaper_budget_exhausted_total', 'Cleanup runs stopped by their time budget.'),
+)
+
+ROW_SIZE = 2 + len(STATS) + len(BUCKETS) + 1
+UNMATCHED = '<unmatched>'
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestStats:
+    __slots__ = STATS
+
+    def __init__(self):
+        for name in STATS:
+            setattr(self, name, 0)
+
+
+def count(name, value=1):
+    """
+    Add value to the named total of the current request, if any.
+    """
+    stats = _current.get()
+    if stats is not None:
+        setattr(stats, name, getattr(stats, name) + value)
+
+
+def _time_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.query_seconds += time.perf_counter() - started
+
+
+def install_query_timer(connection):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+@receiver(connection_created)
+def _connection_created(sender, connection, **kwargs):
+    install_query_timer(connection)
+
+
+class Registry:
+    """
+    Per-view totals of this process, one row list per view and thread.
+    Row layout: requests, latency sum, STATS..., non-cumulative bucket counts.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()  # taken once per thread, to register its shard
+        self._flush_lock = threading.Lock()
+        self._flushed_at = 0.0
+        self._counters = {}
+
+    def _shard(self):
+        shard = getattr(self._local, 'rows', None)
+        if shard is None:
+            shard = self._local.rows = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def observe(self, view, elapsed, stats):
+        shard = self._shard()
+        row = shard.get(view)
+        if row is None:
+            row = shard[view] = [0] * ROW_SIZE
+        row[0] += 1
+        row[1] += elapsed
+        for index, name in enumerate(STATS, 2):
+            row[index] += getattr(stats, name)
+        bucket = next((i for i, bound in enumerate(BUCKETS) if elapsed <= bound), len(BUCKETS))
+        row[2 + len(STATS) + bucket] += 1
+
+    def snapshot(self):
+        totals = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for view, row in list(shard.items()):
+                _add_row(totals, view, row)
+        return totals
+
+    def add(self, name, value=1):
+        # Jobs add a few times per run, so a shared lock is cheap enough here
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self):
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+            self._counters.clear()
+
+    def maybe_flush(self, directory, interval):
+        now = time.monotonic()
+        if now - self._flushed_at < interval or not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            self._flushed_at = now
+            write_worker_file(directory, os.getpid(), self.snapshot())
+            write_worker_file(directory, f'{os.getpid()}.counters', self.counters())
+        finally:
+            self._flush_lock.release()
+
+
+def _add_row(totals, view, row):
+    current = totals.get(view)
+    if current is None:
+        totals[view] = list(row)
+    else:
+        for index, value in enumerate(row):
+            current[index] += value
+
+
+def write_worker_file(directory, pid, totals):
+    # Write and rename, so readers never see a partial file
+    fd, path = tempfile.mkstemp(dir=directory, prefix=f'.{pid}-', suffix='.tmp')
+    with os.fdopen(fd, 'w') as stream:
+        json.dump(totals, stream)
+    os.replace(path, os.path.join(directory, f'{pid}.json'))
+
+
+def read_worker_files(directory, exclude_pid=None):
+    """
+    Return the summed totals of every worker file in directory.
+    """
+    totals = {}
+    for filename in os.listdir(directory):
+        name, ext = os.path.splitext(filename)
+        if ext != '.json' or not name.isdigit() or int(name) == exclude_pid:
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as stream:
+                rows = json.load(stream)
+        except (OSError, ValueError):
+            continue
+        for view, row in rows.items():
+            if len(row) == ROW_SIZE:
+                _add_row(totals, view, row)
+    return totals
+
+
+def read_counter_files(directory, exclude_pid=None):
+    """
+    Return the summed job counters of every worker in directory.
+    """
+    counters = {}
+    for filename in os.listdir(directory):
+        pid, _, rest = filename.partition('.')
+        if rest != 'counters.json' or not pid.isdigit() or int(pid) == exclude_pid:
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as stream:
+                values = json.load(stream)
+        except (OSError, ValueError):
+            continue
+        for name, value in values.items():
+            counters[name] = counters.get(name, 0) + value
+    return counters
+
+
+registry = Registry()
+
+
+def collect():
+    """
+    Return per-view totals of this process and, with METRICS_DIR, of all workers.
+    """
+    totals = registry.snapshot()
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if directory:
+        for view, row in read_worker_files(directory, exclude_pid=os.getpid()).items():
+            _add_row(totals, view, row)
+    return totals
+
+
+def collect_counters():
+    """
+    Return job counters of this process and, with METRICS_DIR, of all workers.
+    """
+    counters = registry.counters()
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if directory:
+        for name, value in read_counter_files(directory, exclude_pid=os.getpid()).items():
+            counters[name] = counters.get(name, 0) + value
+    return counters
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(totals, counters=None):
+    """
+    Render per-view totals and job counters in the Prometheus text exposition format.
+    """
+    views = sorted(totals)
+    lines = [
+        '# HELP auth_request_duration_seconds Request latency by view.',
+        '# TYPE auth_request_duration_seconds histogram',
+    ]
+    for view in views:
+        row = totals[view]
+        label = _label(view)
+        cumulative = 0
+        for bound, observed in zip(BUCKETS + ('+Inf',), row[2 + len(STATS):]):
+            cumulative += observed
+            lines.append(f'auth_request_duration_seconds_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'auth_request_duration_seconds_sum{{view="{label}"}} {_number(row[1])}')
+        lines.append(f'auth_request_duration_seconds_count{{view="{label}"}} {row[0]}')
+    for name, help_text, index in COUNTERS:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for view in views:
+            lines.append(f'{name}{{view="{_label(view)}"}} {_number(totals[view][index])}')
+    for name, help_text in JOB_COUNTERS:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        lines.append(f'{name} {_number((counters or {}).get(name, 0))}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """
+    Record latency and resource totals per resolved URL name.
+    Place first in MIDDLEWARE so the whole chain is measured.
+    Runs natively in both WSGI and ASGI chains.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats, token, started = self.start()
+        try:
+            return self.get_response(request)
+        finally:
+            self.finish(request, stats, token, started)
+
+    async def __acall__(self, request):
+        stats, token, started = self.start()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.finish(request, stats, token, started)
+
+    def start(self):
+        # Connections opened before this module was imported have no timer yet
+        for connection in connections.all(initialized_only=True):
+            install_query_timer(connection)
+        stats = RequestStats()
+        return stats, _current.set(stats), time.perf_counter()
+
+    def finish(self, request, stats, token, started):
+        elapsed = time.perf_counter() - started
+        _current.reset(token)
+        match = getattr(request, 'resolver_match', None)
+        registry.observe(match.view_name if match else UNMATCHED, elapsed, stats)
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if directory:
+            registry.maybe_flush(directory, getattr(settings, 'METRICS_FLUSH_SECONDS', 5))
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            count('template_seconds', time.perf_counter() - started)
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    """
+    Django template backend that adds render time to the request metrics.
+    """
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,107 @@
+"""
+JSON content negotiation for the HTML views.
+
+Views call wants_json(request) and, for JSON clients, return json_response()
+instead of rendering a template, so those requests skip the template engine
+and the messages framework entirely. Such views are decorated with
+@negotiated, so every response they return, HTML pages and redirects
+included, carries Vary: Accept and caches keep the representations apart.
+
+ObjectEncoder serializes the fixed-shape payloads documented in the README.
+Key prefixes are encoded once at import time; encoding a payload only
+escapes its values and joins the pieces.
+"""
+import json
+from functools import lru_cache
+
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views.decorators.vary import vary_on_headers
+
+_encode_str = json.encoder.encode_basestring_ascii
+_encode_any = json.JSONEncoder(separators=(',', ':'), default=str).encode
+
+
+def _encode_value(value):
+    if isinstance(value, ObjectEncoded):
+        return value
+    if isinstance(value, str):
+        return _encode_str(value)
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if value is None:
+        return 'null'
+    if isinstance(value, int):
+        return int.__repr__(value)
+    return _encode_any(value)
+
+
+class ObjectEncoded(str):
+    """
+    Already-encoded JSON, embedded as-is by ObjectEncoder.
+    """
+
+
+class ObjectEncoder:
+    """
+    Encode mappings with a known set of keys into compact JSON.
+    Keys missing from the mapping are left out; unknown keys are ignored.
+    """
+    def __init__(self, *keys):
+        self.fields = tuple((key, _encode_str(key) + ':') for key in keys)
+
+    def encode(self, data):
+        return ObjectEncoded('{' + ','.join(
+            prefix + _encode_value(data[key]) for key, prefix in self.fields if key in data
+        ) + '}')
+
+
+@lru_cache(maxsize=256)
+def _prefers_json(accept):
+    best = None
+    for index, part in enumerate(accept.split(',')):
+        media_type, _, params = part.partition(';')
+        media_type = media_type.strip().lower()
+        if media_type not in ('application/json', 'text/html'):
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0 and (best is None or (-quality, index) < best[0]):
+            best = ((-quality, index), media_type)
+    return best is not None and best[1] == 'application/json'
+
+
+def wants_json(request):
+    """
+    True when the client prefers application/json over text/html.
+    """
+    return _prefers_json(request.META.get('HTTP_ACCEPT', ''))
+
+
+def negotiated(view_class):
+    """
+    Class decorator for views that answer by wants_json(): adds Accept to
+    the Vary header of all their responses. Works for sync and async views.
+    """
+    return method_decorator(vary_on_headers('Accept'), name='dispatch')(view_class)
+
+
+def json_response(content, status=200):
+    """
+    Build a JSON response from a payload encoded with ObjectEncoder,
+    or from any JSON-serializable value.
+    """
+    if not isinstance(content, ObjectEncoded):
+        content = _encode_any(content)
+    response = HttpResponse(content, content_type='application/json', status=status)
+    patch_vary_headers(response, ('Accept',))
+    return response
@@ -0,0 +1,175 @@
+"""
+Sampled request profiling.
+
+ProfilingMiddleware runs cProfile over:
+
+- a random PROFILING_SAMPLE_RATE fraction of requests
+- any request whose PROFILING_HEADER carries a token from profiling_token(),
+  which staff can generate on the admin profiles page
+
+Each profile is written to PROFILING_DIR as a pstats file named after its
+start time, URL name and latency, e.g.
+1718000000123-authentication.login-412ms.prof. The directory is a ring:
+beyond PROFILING_MAX_FILES the oldest profiles are deleted. Open a
+downloaded profile with `python -m pstats` or snakeviz.
+
+cProfile only sees the thread it runs on and a thread can run one profiler
+at a time, so a request that arrives while its thread is already profiling
+is not profiled. Under ASGI, profiles of async views also include other
+requests interleaved on the event loop, and not sync code those requests
+run on worker threads.
+"""
+import cProfile
+import os
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+
+TOKEN_SALT = 'auth_service.profiling'
+FILENAME_RE = re.compile(r'^(?P<started>\d+)-(?P<view>[\w.-]+)-(?P<latency>\d+)ms\.prof$')
+
+_active = threading.local()
+
+
+def profiling_token(user):
+    """
+    Return a signed header value that requests a profile, valid for PROFILING_TOKEN_MAX_AGE.
+    """
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(str(user.pk))
+
+
+def _valid_token(value):
+    try:
+        signing.TimestampSigner(salt=TOKEN_SALT).unsign(value, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def should_profile(request):
+    token = request.headers.get(settings.PROFILING_HEADER)
+    if token:
+        return _valid_token(token)
+    rate = settings.PROFILING_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+@dataclass(frozen=True)
+class ProfileFile:
+    name: str
+    view: str
+    started: datetime
+    latency_ms: int
+    size: int
+
+
+def list_profiles(directory=None):
+    """
+    Return the stored profiles, newest first.
+    """
+    directory = directory or settings.PROFILING_DIR
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in names:
+        match = FILENAME_RE.match(name)
+        if match is None:
+            continue
+        try:
+            size = os.path.getsize(os.path.join(directory, name))
+        except OSError:
+            continue
+        profiles.append(ProfileFile(
+            name=name,
+            view=match['view'].replace('.', ':'),
+            started=datetime.fromtimestamp(int(match['started']) / 1000, tz=timezone.utc),
+            latency_ms=int(match['latency']),
+            size=size,
+        ))
+    profiles.sort(key=lambda profile: profile.name, reverse=True)
+    return profiles
+
+
+def profile_path(name, directory=None):
+    """
+    Return the path of a stored profile, or None for names that are not profiles.
+    """
+    if FILENAME_RE.match(name) is None:
+        return None
+    return os.path.join(directory or settings.PROFILING_DIR, name)
+
+
+def save_profile(profiler, view, started, latency, directory=None, max_files=None):
+    directory = directory or settings.PROFILING_DIR
+    max_files = max_files or settings.PROFILING_MAX_FILES
+    os.makedirs(directory, exist_ok=True)
+    slug = re.sub(r'[^\w.-]', '', view.replace(':', '.')) or 'unknown'
+    name = f'{int(started * 1000)}-{slug}-{int(latency * 1000)}ms.prof'
+    profiler.dump_stats(os.path.join(directory, name))
+
+    names = sorted(n for n in os.listdir(directory) if FILENAME_RE.match(n))
+    for stale in names[:max(len(names) - max_files, 0)]:
+        try:
+            os.remove(os.path.join(directory, stale))
+        except FileNotFoundError:
+            pass  # Removed by another worker
+    return name
+
+
+class ProfilingMiddleware:
+    """
+    Profile sampled or token-carrying requests into PROFILING_DIR.
+    Runs natively in both WSGI and ASGI chains.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profiler = self.start(request)
+        if profiler is None:
+            return self.get_response(request)
+        started, clock = time.time(), time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            self.finish(request, profiler, started, time.perf_counter() - clock)
+
+    async def __acall__(self, request):
+        profiler = self.start(request)
+        if profiler is None:
+            return await self.get_response(request)
+        started, clock = time.time(), time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.finish(request, profiler, started, time.perf_counter() - clock)
+
+    def start(self, request):
+        if getattr(_active, 'profiling', False) or not should_profile(request):
+            return None
+        _active.profiling = True
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def finish(self, request, profiler, started, latency):
+        profiler.disable()
+        _active.profiling = False
+        match = getattr(request, 'resolver_match', None)
+        save_profile(profiler, match.view_name if match else 'unmatched', started, latency)
@@ -0,0 +1,120 @@
+"""
+Read-replica routing for the user models.
+
+ReplicaRouter sends reads of Pengguna, Instruktur and Admin to one of
+DATABASE_REPLICAS and every write to the primary. Replicas lag behind the
+primary, so a client that has just written must keep reading from it:
+
+- within one request (or, outside requests, one context), the first write
+  of a user model pins the remaining reads to the primary
+- ReplicaPinningMiddleware then sets REPLICA_PIN_COOKIE on the response, and
+  requests carrying it read from the primary for REPLICA_PIN_SECONDS
+
+Reads inside a transaction on the primary also stay on the primary.
+Without replicas configured, reads are left to Django's defaults.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+ROUTED_APP_LABELS = {'user_management'}
+
+
+class PinState:
+    __slots__ = ('pinned', 'wrote')
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+# Holds a mutable PinState so writes made in a sync_to_async thread are
+# visible to the middleware after the thread returns
+_pin_state = ContextVar('replica_pin_state', default=None)
+
+
+def pin_to_primary():
+    """
+    Send the rest of this request's reads to the primary.
+    """
+    state = _pin_state.get()
+    if state is None:
+        state = PinState()
+        _pin_state.set(state)
+    state.pinned = state.wrote = True
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or model._meta.app_label not in ROUTED_APP_LABELS:
+            return None
+        state = _pin_state.get()
+        if (state is not None and state.pinned) or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label in ROUTED_APP_LABELS:
+            pin_to_primary()
+        # Django would otherwise write related objects to the database of an
+        # instance read from a replica
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db and instance._state.db not in settings.DATABASE_REPLICAS:
+            return instance._state.db
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaPinningMiddleware:
+    """
+    Pin reads to the primary for clients that recently wrote a user.
+    Runs natively in both WSGI and ASGI chains.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.process_request(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _pin_state.set(None)
+        return self.process_response(state, response)
+
+    async def __acall__(self, request):
+        state = self.process_request(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pin_state.set(None)
+        return self.process_response(state, response)
+
+    def process_request(self, request):
+        state = PinState(pinned=settings.REPLICA_PIN_COOKIE in request.COOKIES)
+        _pin_state.set(state)
+        return state
+
+    def process_response(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE, '1',
+                max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
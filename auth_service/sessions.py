@@ -0,0 +1,164 @@
+"""
+Write-coalescing database session engine.
+
+With SESSION_SAVE_EVERY_REQUEST the stock DB backend issues an UPDATE on every
+request just to slide expire_date. This engine keeps the sliding expiry but
+only writes when the session data actually changed or when the stored expiry
+is due for a refresh:
+
+- rows are written with expire_date = now + age + grace, where grace is
+  SESSION_REFRESH_FRACTION of the cookie age
+- a request refreshes the row once less than `age` of it remains, i.e. once
+  the grace has passed since the last write
+
+Any activity after the grace rewrites the row, so the stored expiry is never
+before last activity + age and no session ends earlier than with the stock
+SESSION_SAVE_EVERY_REQUEST. It is at most the grace later, which is what
+clearsessions, the session reaper and the session list see. The cookie
+max-age is still renewed on every response by SessionMiddleware.
+
+Decoded reads are served from a small per-process cache for
+SESSION_LOCAL_CACHE_TIMEOUT seconds.
+"""
+import copy
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.base import CreateError, UpdateError
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.db import DatabaseError, IntegrityError, router, transaction
+from django.utils import timezone
+
+from . import metrics
+from .lru import LRUCache
+
+local_cache = LRUCache(
+    max_entries=getattr(settings, 'SESSION_LOCAL_CACHE_SIZE', 10000),
+    timeout=getattr(settings, 'SESSION_LOCAL_CACHE_TIMEOUT', 5),
+)
+
+
+class SessionStore(DBStore):
+    """
+    Database session store that skips redundant writes.
+    """
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._stored_data = None
+        self._stored_expiry = None
+
+    @property
+    def refresh_fraction(self):
+        return getattr(settings, 'SESSION_REFRESH_FRACTION', 0.1)
+
+    def _cached(self):
+        cached = local_cache.get(self.session_key) if self.session_key else None
+        if cached is not None and cached[1] <= timezone.now():
+            return None
+        return cached
+
+    def _decode_stored(self, session_data, expire_date):
+        data = self.decode(session_data)
+        self._stored_data = copy.deepcopy(data)
+        self._stored_expiry = expire_date
+        return data
+
+    def load(self):
+        cached = self._cached()
+        if cached is None:
+            s = self._get_session_from_db()
+            if s is None:
+                return {}
+            cached = (s.session_data, s.expire_date)
+            local_cache.set(self.session_key, cached)
+        return self._decode_stored(*cached)
+
+    async def aload(self):
+        # Cache hits are served without leaving the event loop
+        cached = self._cached()
+        if cached is None:
+            s = await self._aget_session_from_db()
+            if s is None:
+                return {}
+            cached = (s.session_data, s.expire_date)
+            local_cache.set(self.session_key, cached)
+        return self._decode_stored(*cached)
+
+    @staticmethod
+    def _fixed_expiry(data):
+        # set_expiry(datetime) pins the expiry; every other form slides
+        return isinstance(data.get('_session_expiry'), str)
+
+    def _grace(self):
+        return timedelta(seconds=self.get_expiry_age() * self.refresh_fraction)
+
+    def _refresh_due(self, data):
+        if self._stored_expiry is None:
+            return True
+        if self._fixed_expiry(data):
+            # Unchanged data means an unchanged pinned expiry.
+            return False
+        # Past the grace, the stored expiry would fall before now + age
+        remaining = self._stored_expiry - timezone.now()
+        return remaining <= timedelta(seconds=self.get_expiry_age())
+
+    def create_model_instance(self, data):
+        obj = super().create_model_instance(data)
+        if not self._fixed_expiry(data):
+            obj.expire_date += self._grace()
+        return obj
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        if not must_create and data == self._stored_data and not self._refresh_due(data):
+            return
+        obj = self.create_model_instance(data)
+        using = router.db_for_write(self.model, instance=obj)
+        try:
+            with transaction.atomic(using=using):
+                obj.save(force_insert=must_create, force_update=not must_create, using=using)
+        except IntegrityError:
+            if must_create:
+                raise CreateError
+            raise
+        except DatabaseError:
+            if not must_create:
+                raise UpdateError
+            raise
+        metrics.count('session_saves')
+        self._stored_data = copy.deepcopy(data)
+        self._stored_expiry = obj.expire_date
+        local_cache.set(self.session_key, (obj.session_data, obj.expire_date))
+
+    async def asave(self, must_create=False):
+        if self.session_key is not None and not must_create:
+            data = await self._aget_session()
+            if data == self._stored_data and not self._refresh_due(data):
+                return
+        return await sync_to_async(self.save)(must_create)
+
+    def delete(self, session_key=None):
+        if session_key is None and self.session_key is None:
+            return
+        local_cache.delete(session_key or self.session_key)
+        super().delete(session_key)
+
+    async def adelete(self, session_key=None):
+        return await sync_to_async(self.delete)(session_key)
+
+    @classmethod
+    def delete_many(cls, session_keys):
+        """
+        Delete the given sessions with one query.
+        Other workers may still serve them from their local cache for up
+        to SESSION_LOCAL_CACHE_TIMEOUT seconds.
+        """
+        session_keys = list(session_keys)
+        if not session_keys:
+            return
+        for session_key in session_keys:
+            local_cache.delete(session_key)
+        cls.get_model_class().objects.filter(session_key__in=session_keys).delete()
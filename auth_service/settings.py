@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 import os
 
+from auth_service.databases import database_settings, shard_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -40,24 +42,33 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'authentication',
     'user_management',
+    'security',
     'rest_framework',
 ]
 
 MIDDLEWARE = [
+    'auth_service.metrics.MetricsMiddleware',
+    'auth_service.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'auth_service.routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'authentication.middleware.HashingSaturationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'auth_service.urls'
 
+# Route login/register/profile to the native async views (set by asgi.py)
+ASYNC_VIEWS = os.environ.get('DJANGO_ASYNC_VIEWS', '0') == '1'
+
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that records render time in the request metrics
+        'BACKEND': 'auth_service.metrics.InstrumentedTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'auth_service', 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -77,32 +88,151 @@ WSGI_APPLICATION = 'auth_service.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# DATABASE_URL is the primary, DATABASE_REPLICA_URLS a comma-separated list of
+# read replicas; see auth_service/databases.py for the URL format
+DATABASES, DATABASE_REPLICAS = database_settings(
+    primary_url=os.environ.get('DATABASE_URL', 'sqlite:///db.sqlite3'),
+    replica_urls=os.environ.get('DATABASE_REPLICA_URLS', '').split(','),
+    base_dir=BASE_DIR,
+    # Keep connections open between requests and check them before reuse
+    conn_max_age=int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+    health_checks=os.environ.get('DATABASE_CONN_HEALTH_CHECKS', '1') == '1',
+)
+
+# Optional sharding of users by user_id across DATABASE_SHARD_URLS;
+# run `manage.py migrate --database shard_N` for each shard
+_shard_databases, USER_SHARDS = shard_settings(
+    shard_urls=os.environ.get('DATABASE_SHARD_URLS', '').split(','),
+    base_dir=BASE_DIR,
+    conn_max_age=DATABASES['default']['CONN_MAX_AGE'],
+    health_checks=DATABASES['default']['CONN_HEALTH_CHECKS'],
+)
+DATABASES.update(_shard_databases)
+
+# Users go to their shard (when sharded), reads of the user models to
+# DATABASE_REPLICAS, everything else to the primary
+DATABASE_ROUTERS = ['user_management.sharding.ShardRouter', 'auth_service.routers.ReplicaRouter']
+
+# After a client writes a user, its reads stay on the primary this long
+REPLICA_PIN_SECONDS = 5
+REPLICA_PIN_COOKIE = 'dbpin'
+
+
+# Request metrics on /metrics (see auth_service.metrics)
+# With several worker processes, set METRICS_DIR to a directory shared by the
+# workers of one host so /metrics reports all of them
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_FLUSH_SECONDS = 5
+# /metrics is served to staff users and to scrapers sending
+# `Authorization: Bearer <METRICS_TOKEN>`; unset, only staff can read it
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
+# Per-host files written at runtime (request profiles, hasher calibration)
+# live outside the source tree
+_STATE_HOME = os.environ.get('XDG_STATE_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'state')
+
+# Sampled cProfile profiles of requests (see auth_service.profiling),
+# listed and downloadable at /admin/profiles/
+PROFILING_DIR = os.environ.get('PROFILING_DIR') or os.path.join(_STATE_HOME, 'auth_service', 'profiles')
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))  # 0.01 profiles 1% of requests
+PROFILING_MAX_FILES = 200  # oldest profiles beyond this are deleted
+PROFILING_HEADER = 'X-Profile-Token'  # requests carrying a token from the admin page are profiled
+PROFILING_TOKEN_MAX_AGE = 3600  # seconds
 
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
+# The similarity and common-password checks are security's faster equivalents
+# of Django's validators (see security.validators)
 AUTH_PASSWORD_VALIDATORS = [
     {
-        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+        'NAME': 'security.validators.UserAttributeSimilarityValidator',
     },
     {
         'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
     },
     {
-        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+        'NAME': 'security.validators.CommonPasswordValidator',
     },
     {
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
     },
 ]
 
+# Compiled common/breached password set, memory-mapped by every worker;
+# build it with `manage.py compile_password_list`, otherwise Django's list
+# of 20,000 common passwords is compiled here on first use (or kept in
+# memory when the file cannot be written)
+PASSWORD_LIST_FILE = os.environ.get('PASSWORD_LIST_FILE') or os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'auth_service', 'passwords.pwset',
+)
+
+
+# PBKDF2 with the iteration count calibrated per host by `manage.py calibrate_hasher`
+# (see authentication.hashers); it shares Django's pbkdf2_sha256 algorithm name,
+# so Django's own PBKDF2PasswordHasher must not be listed after it
+PASSWORD_HASHERS = [
+    'authentication.hashers.CalibratedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASHER_CALIBRATION_FILE = os.environ.get('PASSWORD_HASHER_CALIBRATION_FILE') or os.path.join(
+    _STATE_HOME, 'auth_service', 'hasher_calibration.json',
+)
+PASSWORD_HASH_TARGET_MS = 250  # default calibrate_hasher target per hash
+PASSWORD_HASH_MIN_ITERATIONS = 600_000  # never calibrate below this, whatever the latency
+PASSWORD_HASH_REHASH_TOLERANCE = 0.25  # re-encode stored hashes more than 25% off the calibration
+
+
+# Cache shared by all workers on the host through a memory-mapped file
+# (see auth_service.shmcache): MAX_ENTRIES slots of SLOT_SIZE bytes
+CACHES = {
+    'default': {
+        'BACKEND': 'auth_service.shmcache.SharedMemoryCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),  # default: /dev/shm/auth_service-<uid>/cache
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 16384)),
+            'SLOT_SIZE': 1024,
+        },
+    },
+}
+
+# Test runs get a cache file of their own (see auth_service.testing)
+TEST_RUNNER = 'auth_service.testing.TestRunner'
+
+
+# Per-process cache of authenticated users (see user_management.cache)
+USER_CACHE_SIZE = 10000
+USER_CACHE_TIMEOUT = 60  # seconds
+# Invalidations reach every worker through CACHES[USER_CACHE_ALIAS], so password
+# changes, deactivations and deletions apply everywhere at once. 'local' keeps
+# them in one process and other workers catch up within USER_CACHE_TIMEOUT.
+USER_CACHE_INVALIDATION = os.environ.get('USER_CACHE_INVALIDATION') or 'cache'
+USER_CACHE_ALIAS = 'default'
+
+# Batch lookup of public profiles by other services (see user_management.lookup)
+USER_LOOKUP_MAX_IDS = 500
+USER_LOOKUP_CACHE_ALIAS = 'default'
+USER_LOOKUP_CACHE_TIMEOUT = 30  # seconds
+USER_LOOKUP_WAIT_SECONDS = 5  # how long a request waits for another one loading the same ids
+
+# Keyset-paginated user directory (see user_management.directory)
+USER_DIRECTORY_PAGE_SIZE = 50
+USER_DIRECTORY_MAX_PAGE_SIZE = 200
+
+
+# Password hashing pool
+# Hashes run in a bounded process pool per worker; 0 workers hashes inline.
+# Requests beyond workers + queue are rejected with 503 and Retry-After.
+
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', min(4, os.cpu_count() or 1)))
+PASSWORD_HASHING_MAX_QUEUE = int(os.environ.get('PASSWORD_HASHING_MAX_QUEUE', 16))
+PASSWORD_HASHING_TIMEOUT = 10  # seconds to wait for a queued hash
+PASSWORD_HASHING_RETRY_AFTER = 2  # seconds
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
@@ -132,16 +262,66 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Custom User Model
 AUTH_USER_MODEL = 'user_management.Pengguna'
 
-# REST Framework settings using session authentication
+# Loads request.user as its Admin/Instruktur subclass in a single joined query
+AUTHENTICATION_BACKENDS = [
+    'user_management.backends.RoleModelBackend',
+]
+
+# Role permissions: each role has the permissions of its group (admins have all)
+# (see user_management.roles)
+ROLE_GROUPS = {
+    'student': 'Students',
+    'instructor': 'Instructors',
+    'admin': 'Admins',
+}
+ROLE_PERMISSIONS_CHECK_SECONDS = 1  # how often workers check for permission changes
+ROLE_PERMISSIONS_TIMEOUT = 60  # recompile at least this often, e.g. with USER_CACHE_INVALIDATION = 'local'
+
+# REST Framework settings using bearer token and session authentication
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'authentication.tokens.AccessTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
+    # Reverse proxies in front of the app. Throttles take the client IP from
+    # X-Forwarded-For only behind this many proxies, and from REMOTE_ADDR at 0;
+    # otherwise clients could pick a new IP bucket on every request
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
 }
 
+# Token-bucket limits for credential checks, per client IP, username and IP+username
+# (see authentication.throttling)
+CREDENTIAL_THROTTLE_RATES = {
+    'login': {'ip': '60/min', 'username': '10/min', 'ip_username': '5/min'},
+    'register': {'ip': '10/min'},
+    'password_change': {'username': '5/min'},
+}
+# CacheStore shares buckets between workers through CACHES['default']
+THROTTLE_STORE = os.environ.get('THROTTLE_STORE', 'authentication.throttling.LocalStore')
+
+# API token settings
+ACCESS_TOKEN_LIFETIME = 300  # 5 minutes in seconds
+REFRESH_TOKEN_LIFETIME = 7 * 24 * 3600  # 7 days in seconds
+TOKEN_SIGNING_KEY = os.environ.get('TOKEN_SIGNING_KEY', SECRET_KEY)
+
 # Session settings
 SESSION_COOKIE_SECURE = False  # Set to True in production with HTTPS
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_AGE = 1800  # 30 minutes in seconds
-SESSION_SAVE_EVERY_REQUEST = True  # Extends session on activity
\ No newline at end of file
+SESSION_SAVE_EVERY_REQUEST = True  # Extends session on activity
+
+# Database sessions that only write on data changes or expiry refreshes
+SESSION_ENGINE = 'auth_service.sessions'
+SESSION_REFRESH_FRACTION = 0.1  # refresh the stored expiry after 10% of SESSION_COOKIE_AGE
+SESSION_LOCAL_CACHE_TIMEOUT = 5  # seconds a worker serves a session from memory
+SESSION_LOCAL_CACHE_SIZE = 10000
+
+# Per-user session registry (security.sessions)
+SECURITY_MAX_SESSIONS_PER_USER = 50  # older sessions are revoked when a user logs in past this
+
+# Expired session cleanup (security.reaper, manage.py reap_sessions)
+SESSION_REAPER_INTERVAL = int(os.environ.get('SESSION_REAPER_INTERVAL', 0))  # seconds between runs in each worker; 0 disables the thread
+SESSION_REAPER_BATCH_SIZE = 500  # sessions deleted per statement
+SESSION_REAPER_PAUSE = 0.05  # seconds between batches
+SESSION_REAPER_TIME_BUDGET = 10  # seconds per run; the next run continues
@@ -0,0 +1,331 @@
+"""
+Cache backend shared by all worker processes on a host.
+
+Entries live in a memory-mapped file, by default in a private directory
+under /dev/shm, so every gunicorn worker reads and writes the same table
+instead of keeping its own LocMem copy:
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'auth_service.shmcache.SharedMemoryCache',
+            'LOCATION': '/dev/shm/auth_service-1000/cache',
+            'OPTIONS': {'MAX_ENTRIES': 16384, 'SLOT_SIZE': 1024},
+        },
+    }
+
+The file is a set-associative hash table: MAX_ENTRIES fixed-size slots in
+sets of WAYS. A key can only live in the set its hash selects, so lookups
+read at most WAYS slot headers. Setting a key into a full set evicts the
+set's least recently used entry, which makes LRU eviction approximate
+across the whole table but keeps the size cap exact (MAX_ENTRIES *
+SLOT_SIZE bytes). Entries whose key and pickled value exceed SLOT_SIZE are
+not stored.
+
+Sets are guarded by striped locks: a thread lock within the process and a
+POSIX byte-range lock on the file across processes. incr() is atomic across
+workers. Changing MAX_ENTRIES, WAYS or SLOT_SIZE recreates the file on the
+next start; workers still running on the old layout keep using the old
+file until they restart.
+
+Values are unpickled, so only the account running the workers may be able
+to write the file. The file is opened without following symlinks and must
+be a regular file owned by that account with no group or other access;
+the default directory must be the same. Anything else raises
+PermissionError instead of being used.
+"""
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import pickle
+import stat
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MAGIC = b'SHMCACHE'
+FILE_HEADER = struct.Struct('=8sIIII')  # magic, format version, sets, ways, slot size
+FILE_HEADER_SIZE = 64
+FORMAT_VERSION = 1
+# used, key length, value length, key hash, expires (inf: never), last access
+SLOT_HEADER = struct.Struct('=BxHIQdd')
+STRIPES = 64
+INIT_LOCK = STRIPES  # byte offset of the file lock taken while creating the table
+
+
+def check_private(info, path, kind):
+    """
+    Raise PermissionError unless info (an os.stat_result) is a kind ('file'
+    or 'directory') owned by this user with no group or other permissions.
+    """
+    is_kind = stat.S_ISDIR if kind == 'directory' else stat.S_ISREG
+    if not is_kind(info.st_mode) or info.st_uid != os.geteuid() or info.st_mode & 0o077:
+        raise PermissionError(f'{path} must be a {kind} owned by uid {os.geteuid()} with no group or other access')
+
+
+def default_location():
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    directory = os.path.join(base, f'auth_service-{os.geteuid()}')
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    # lstat: a symlink planted in the shared base directory is refused
+    check_private(os.lstat(directory), directory, 'directory')
+    return os.path.join(directory, 'cache')
+
+
+class SharedTable:
+    """
+    A process's mapping of the cache file and its stripe locks.
+    """
+    def __init__(self, path, sets, ways, slot_size):
+        self.path = path
+        self.sets = sets
+        self.ways = ways
+        self.slot_size = slot_size
+        self.capacity = slot_size - SLOT_HEADER.size
+        self.header = FILE_HEADER.pack(MAGIC, FORMAT_VERSION, sets, ways, slot_size)
+        self.size = FILE_HEADER_SIZE + sets * ways * slot_size
+        self.locks = [threading.Lock() for _ in range(STRIPES)]
+        self.fd = self._open()
+        self.map = mmap.mmap(self.fd, self.size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+
+    def _open(self):
+        while True:
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+            try:
+                check_private(os.fstat(fd), self.path, 'file')
+            except PermissionError:
+                os.close(fd)
+                raise
+            fcntl.lockf(fd, fcntl.LOCK_EX, 1, INIT_LOCK)
+            try:
+                info = os.fstat(fd)
+                if not self._is_current(info):
+                    # Another worker replaced the file while this one waited for
+                    # the lock; unlinking now would delete the new file
+                    pass
+                elif info.st_size == 0:
+                    os.ftruncate(fd, self.size)
+                    os.pwrite(fd, self.header, 0)
+                    return fd
+                elif info.st_size == self.size and os.pread(fd, len(self.header), 0) == self.header:
+                    return fd
+                else:
+                    # Another layout: start a new file and leave the old one to its workers
+                    os.unlink(self.path)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, 1, INIT_LOCK)
+            os.close(fd)
+
+    def _is_current(self, info):
+        # Whether the open file (info from fstat) is still the one at self.path
+        try:
+            current = os.lstat(self.path)
+        except FileNotFoundError:
+            return False
+        return (current.st_dev, current.st_ino) == (info.st_dev, info.st_ino)
+
+    @contextmanager
+    def locked(self, stripe):
+        with self.locks[stripe]:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, 1, stripe)
+
+    def slot_offsets(self, set_index):
+        first = FILE_HEADER_SIZE + set_index * self.ways * self.slot_size
+        return range(first, first + self.ways * self.slot_size, self.slot_size)
+
+    def find(self, set_index, key_hash, key, now):
+        """
+        Return (offset of key's live slot or None, slot for a new entry).
+        Expired entries found on the way are dropped.
+        """
+        free = lru = None
+        lru_access = math.inf
+        for offset in self.slot_offsets(set_index):
+            used, key_len, value_len, slot_hash, expires, accessed = SLOT_HEADER.unpack_from(self.map, offset)
+            if used and expires <= now:
+                self.map[offset] = 0
+                used = 0
+            if not used:
+                if free is None:
+                    free = offset
+                continue
+            start = offset + SLOT_HEADER.size
+            if slot_hash == key_hash and self.map[start:start + key_len] == key:
+                return offset, offset
+            if accessed < lru_access:
+                lru, lru_access = offset, accessed
+        return None, free if free is not None else lru
+
+    def read(self, offset, now):
+        used, key_len, value_len, key_hash, expires, accessed = SLOT_HEADER.unpack_from(self.map, offset)
+        SLOT_HEADER.pack_into(self.map, offset, used, key_len, value_len, key_hash, expires, now)
+        start = offset + SLOT_HEADER.size + key_len
+        return self.map[start:start + value_len]
+
+    def write(self, offset, key_hash, key, value, expires, now):
+        SLOT_HEADER.pack_into(self.map, offset, 1, len(key), len(value), key_hash, expires, now)
+        start = offset + SLOT_HEADER.size
+        self.map[start:start + len(key)] = key
+        self.map[start + len(key):start + len(key) + len(value)] = value
+
+    def set_expiry(self, offset, expires):
+        used, key_len, value_len, key_hash, _, accessed = SLOT_HEADER.unpack_from(self.map, offset)
+        SLOT_HEADER.pack_into(self.map, offset, used, key_len, value_len, key_hash, expires, accessed)
+
+    def clear(self):
+        for stripe in range(STRIPES):
+            self.locks[stripe].acquire()
+        try:
+            fcntl.lockf(self.fd, fcntl.LOCK_EX, STRIPES, 0)
+            try:
+                for offset in range(FILE_HEADER_SIZE, self.size, self.slot_size):
+                    self.map[offset] = 0
+            finally:
+                fcntl.lockf(self.fd, fcntl.LOCK_UN, STRIPES, 0)
+        finally:
+            for lock in self.locks:
+                lock.release()
+
+
+# One mapping per file, layout and process; Django creates a backend per thread
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def get_table(path, sets, ways, slot_size):
+    key = (path, os.getpid(), sets, ways, slot_size)
+    table = _tables.get(key)
+    if table is None:
+        with _tables_lock:
+            table = _tables.get(key)
+            if table is None:
+                # Mappings and locks inherited through fork are not reused
+                table = _tables[key] = SharedTable(path, sets, ways, slot_size)
+    return table
+
+
+class SharedMemoryCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location or default_location()
+        self._ways = options.get('WAYS', 8)
+        self._slot_size = options.get('SLOT_SIZE', 1024)
+        self._sets = max(1, math.ceil(self._max_entries / self._ways))
+
+    @property
+    def _table(self):
+        return get_table(self._path, self._sets, self._ways, self._slot_size)
+
+    def _locate(self, key):
+        key = key.encode()
+        key_hash = int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'big')
+        set_index = key_hash % self._sets
+        return key, key_hash, set_index, set_index % STRIPES
+
+    def _expiry(self, timeout):
+        expires = self.get_backend_timeout(timeout)
+        return math.inf if expires is None else expires
+
+    def _store(self, key, value, timeout, only_new):
+        table = self._table
+        key, key_hash, set_index, stripe = self._locate(key)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        fits = len(key) + len(pickled) <= table.capacity
+        with table.locked(stripe):
+            now = time.time()
+            found, slot = table.find(set_index, key_hash, key, now)
+            if only_new and found is not None:
+                return False
+            if not fits:
+                # Too large to cache; never leave an older value behind
+                if found is not None:
+                    table.map[found] = 0
+                return False
+            table.write(slot, key_hash, key, pickled, self._expiry(timeout), now)
+            return True
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._store(key, value, timeout, only_new=True)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._store(key, value, timeout, only_new=False)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        table = self._table
+        key, key_hash, set_index, stripe = self._locate(key)
+        with table.locked(stripe):
+            now = time.time()
+            found, _ = table.find(set_index, key_hash, key, now)
+            if found is None:
+                return default
+            pickled = table.read(found, now)
+        return pickle.loads(pickled)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        table = self._table
+        key, key_hash, set_index, stripe = self._locate(key)
+        with table.locked(stripe):
+            found, _ = table.find(set_index, key_hash, key, time.time())
+            if found is None:
+                return False
+            table.set_expiry(found, self._expiry(timeout))
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        table = self._table
+        key, key_hash, set_index, stripe = self._locate(key)
+        with table.locked(stripe):
+            now = time.time()
+            found, _ = table.find(set_index, key_hash, key, now)
+            if found is None:
+                raise ValueError("Key '%s' not found" % key.decode())
+            _, _, _, _, expires, _ = SLOT_HEADER.unpack_from(table.map, found)
+            new_value = pickle.loads(table.read(found, now)) + delta
+            pickled = pickle.dumps(new_value, self.pickle_protocol)
+            if len(key) + len(pickled) > table.capacity:
+                table.map[found] = 0
+            else:
+                table.write(found, key_hash, key, pickled, expires, now)
+        return new_value
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        table = self._table
+        key, key_hash, set_index, stripe = self._locate(key)
+        with table.locked(stripe):
+            found, _ = table.find(set_index, key_hash, key, time.time())
+            return found is not None
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        table = self._table
+        key, key_hash, set_index, stripe = self._locate(key)
+        with table.locked(stripe):
+            found, _ = table.find(set_index, key_hash, key, time.time())
+            if found is None:
+                return False
+            table.map[found] = 0
+            return True
+
+    def clear(self):
+        self._table.clear()
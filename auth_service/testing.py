@@ -0,0 +1,68 @@
+"""
+Test runner that keeps test runs away from the host's shared cache and
+compiled password set, and provides spare SQLite databases for tests of
+sharding and replica routing.
+"""
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+SHARED_MEMORY_BACKEND = 'auth_service.shmcache.SharedMemoryCache'
+
+# Test-only database aliases; tests list them in `databases` and use them
+# as USER_SHARDS or DATABASE_REPLICAS
+SPARE_DATABASES = ('spare_1', 'spare_2')
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Points every shared-memory cache, PASSWORD_LIST_FILE, PROFILING_DIR and
+    PASSWORD_HASHER_CALIBRATION_FILE at files of this run's own, so tests
+    never read, clear or lock the cache of workers on the same host, never
+    hash with the host's calibration, and never write into the deployed
+    password set or the host's profiles.
+    Also adds SPARE_DATABASES, SQLite files in the same directory, which
+    are only created for tests that use them.
+    """
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.cache_directory = tempfile.mkdtemp(
+            prefix='auth_service-test-', dir='/dev/shm' if os.path.isdir('/dev/shm') else None,
+        )
+        caches = {}
+        for alias, config in settings.CACHES.items():
+            config = dict(config)
+            if config['BACKEND'] == SHARED_MEMORY_BACKEND:
+                config['LOCATION'] = os.path.join(self.cache_directory, alias)
+            caches[alias] = config
+        self.cache_settings = override_settings(
+            CACHES=caches, PASSWORD_LIST_FILE=os.path.join(self.cache_directory, 'passwords.pwset'),
+            PROFILING_DIR=os.path.join(self.cache_directory, 'profiles'),
+            PASSWORD_HASHER_CALIBRATION_FILE=os.path.join(self.cache_directory, 'hasher_calibration.json'),
+        )
+        self.cache_settings.enable()
+        self.add_spare_databases()
+
+    def add_spare_databases(self):
+        spares = {
+            alias: {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': ':memory:',
+                'TEST': {'NAME': os.path.join(self.cache_directory, f'{alias}.sqlite3')},
+            }
+            for alias in SPARE_DATABASES if alias not in connections.settings
+        }
+        # configure_settings() fills in the defaults and wants the default alias
+        configured = connections.configure_settings({DEFAULT_DB_ALIAS: dict(connections.settings[DEFAULT_DB_ALIAS]), **spares})
+        for alias in spares:
+            connections.settings[alias] = configured[alias]
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_settings.disable()
+        shutil.rmtree(self.cache_directory, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -22,12 +22,23 @@ urlpatterns = [
     # Homepage route
     path('', views.home, name='home'),
     
-    # Admin routes
+    # Prometheus metrics
+    path('metrics', views.metrics, name='metrics'),
+    
+    # Admin routes, with the request profiles page for staff
+    path('admin/profiles/', admin.site.admin_view(views.profile_list), name='profile_list'),
+    path('admin/profiles/<str:name>', admin.site.admin_view(views.profile_download), name='profile_download'),
     path('admin/', admin.site.urls),
     
     # Authentication routes with namespace - removed /api/ prefix
     path('auth/', include('authentication.urls', namespace='authentication')),
     
+    # Token API routes documented in the README
+    path('api/auth/', include('authentication.api_urls', namespace='authentication_api')),
+    
     # User management routes with namespace
     path('users/', include('user_management.urls', namespace='user_management')),
+    
+    # Session registry: list and revoke the current user's sessions
+    path('security/', include('security.urls', namespace='security')),
 ]
@@ -1,7 +1,70 @@
+import hmac
+
+from django.conf import settings
+from django.contrib import admin
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import render
 
+from . import metrics as request_metrics
+from . import profiling
+
 def home(request):
     """
     Renders the home page
     """
-    return render(request, 'home.html')
\ No newline at end of file
+    return render(request, 'home.html')
+
+
+def _metrics_allowed(request):
+    if request.user.is_active and request.user.is_staff:
+        return True
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return bool(
+        settings.METRICS_TOKEN and scheme.lower() == 'bearer'
+        and hmac.compare_digest(token.strip().encode(), settings.METRICS_TOKEN.encode())
+    )
+
+
+def metrics(request):
+    """
+    Serves per-view request metrics in the Prometheus text format,
+    to staff users and to scrapers sending METRICS_TOKEN
+    """
+    if not _metrics_allowed(request):
+        response = HttpResponse('Authentication required\n', status=401, content_type='text/plain; charset=utf-8')
+        response['WWW-Authenticate'] = 'Bearer realm="metrics"'
+        return response
+    return HttpResponse(
+        request_metrics.render(request_metrics.collect(), request_metrics.collect_counters()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+def profile_list(request):
+    """
+    Lists stored request profiles for staff, with a token to request new ones
+    """
+    return render(request, 'admin/profiles.html', {
+        **admin.site.each_context(request),
+        'title': 'Request profiles',
+        'profiles': profiling.list_profiles(),
+        'directory': settings.PROFILING_DIR,
+        'max_files': settings.PROFILING_MAX_FILES,
+        'sample_rate': settings.PROFILING_SAMPLE_RATE,
+        'header': settings.PROFILING_HEADER,
+        'token': profiling.profiling_token(request.user),
+        'token_max_age': settings.PROFILING_TOKEN_MAX_AGE,
+    })
+
+
+def profile_download(request, name):
+    """
+    Downloads a stored request profile as a pstats file
+    """
+    path = profiling.profile_path(name)
+    if path is None:
+        raise Http404('Profile not found')
+    try:
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+    except FileNotFoundError:
+        raise Http404('Profile not found')
@@ -0,0 +1,10 @@
+from django.urls import path
+from .views import TokenLoginView, TokenLogoutView, TokenRefreshView
+
+app_name = 'authentication_api'
+
+urlpatterns = [
+    path('login/', TokenLoginView.as_view(), name='login'),
+    path('logout/', TokenLogoutView.as_view(), name='logout'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+]
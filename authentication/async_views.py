@@ -0,0 +1,192 @@
+"""
+Native async views for the ASGI deployment.
+
+Django's async class-based views with the same behaviour as the DRF views in
+views.py. DRF's APIView only runs sync handlers, which ASGI servers push
+through a thread each, so AsyncAPIView carries the parts of APIView these
+views rely on: bearer or session authentication, CSRF for session users,
+permission checks and throttling.
+"""
+import json
+
+from django.contrib import messages
+from django.contrib.auth import aauthenticate, alogin
+from django.core.exceptions import ValidationError
+from django.http import JsonResponse
+from django.shortcuts import render, redirect
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
+from rest_framework.authentication import CSRFCheck
+
+from auth_service.negotiation import negotiated, wants_json
+from user_management.models import Pengguna
+from . import payloads
+from .forms import LoginForm, RegisterForm
+from .throttling import LoginThrottle, RegisterThrottle
+from .tokens import InvalidToken, TokenUser, decode_access_token, issue_tokens
+
+
+def _error(message, status, **headers):
+    response = JsonResponse({'status': 'error', 'message': message}, status=status)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+class AsyncAPIView(View):
+    """
+    Async counterpart of the APIView features used by this project.
+    Views with login_required get request.user as the loaded role subclass.
+    """
+    login_required = False
+    throttle_classes = []
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Like APIView, CSRF is only enforced for session-authenticated users
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def authenticate(self, request):
+        """
+        Set request.user from a bearer token or the session.
+        Return an error response for invalid tokens or failed CSRF checks.
+        """
+        auth = request.headers.get('Authorization', '').split()
+        if auth and auth[0].lower() == 'bearer':
+            try:
+                request.user = TokenUser(decode_access_token(auth[1] if len(auth) == 2 else ''))
+            except InvalidToken as e:
+                return _error(str(e), 401, **{'WWW-Authenticate': 'Bearer'})
+            return None
+
+        request.user = await request.auser()
+        if request.user.is_authenticated and request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            check = CSRFCheck(lambda req: None)
+            check.process_request(request)
+            reason = check.process_view(request, None, (), {})
+            if reason:
+                return _error(f'CSRF Failed: {reason}', 403)
+        return None
+
+    def parse_data(self, request):
+        """
+        Return the request body as a dict-like, for form and JSON bodies alike.
+        """
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body or b'{}')
+            except ValueError:
+                data = None
+            return data if isinstance(data, dict) else {}
+        return request.POST
+
+    async def dispatch(self, request, *args, **kwargs):
+        response = await self.authenticate(request)
+        if response is not None:
+            return response
+
+        if self.login_required:
+            if not request.user.is_authenticated:
+                return _error('Authentication credentials were not provided.', 401, **{'WWW-Authenticate': 'Bearer'})
+            if isinstance(request.user, TokenUser):
+                # Token claims only carry user_id/role; these views need the full user
+                try:
+                    users = await Pengguna.objects.alocate(user_id=request.user.user_id)
+                    request.user = await users.select_subclasses().aget(user_id=request.user.user_id)
+                except Pengguna.DoesNotExist:
+                    return _error('User not found.', 401, **{'WWW-Authenticate': 'Bearer'})
+
+        request.data = self.parse_data(request)
+        for throttle_class in self.throttle_classes:
+            throttle = throttle_class()
+            if not throttle.allow_request(request, self):
+                wait = throttle.wait()
+                return _error(
+                    f'Request was throttled. Expected available in {wait:.0f} seconds.', 429,
+                    **{'Retry-After': '%d' % max(1, round(wait))}
+                )
+
+        return await super().dispatch(request, *args, **kwargs)
+
+
+@negotiated
+class LoginView(AsyncAPIView):
+    """
+    Handle user login using Django session authentication
+    """
+    throttle_classes = [LoginThrottle]
+
+    async def get(self, request):
+        if wants_json(request):
+            return payloads.method_not_allowed(request, ['POST'])
+
+        # If user is already logged in, redirect to profile
+        if request.user.is_authenticated:
+            return redirect('/users/profile/')
+
+        form = LoginForm()
+        return render(request, 'authentication/login.html', {'form': form})
+
+    async def post(self, request):
+        form = LoginForm(request.data)
+        form.check_credentials = False
+
+        if form.is_valid():
+            user = await aauthenticate(
+                request,
+                username=form.cleaned_data['username'],
+                password=form.cleaned_data['password'],
+            )
+            try:
+                form.confirm_user(user)
+            except ValidationError as e:
+                form.add_error(None, e)
+
+        if form.is_valid():
+            user = form.cleaned_data['user']
+            await alogin(request, user)
+            if wants_json(request):
+                return payloads.login_response(user, await sync_to_async(issue_tokens)(user))
+            messages.success(request, f'Welcome back, {user.first_name}!')
+            return redirect('/users/profile/')
+
+        if wants_json(request):
+            return payloads.login_error_response(form)
+
+        # Authentication failed - form.errors will contain the error messages
+        return render(request, 'authentication/login.html', {'form': form})
+
+
+@negotiated
+class RegisterView(AsyncAPIView):
+    """
+    Handle user registration for students and instructors only
+    """
+    throttle_classes = [RegisterThrottle]
+
+    async def get(self, request):
+        if wants_json(request):
+            return payloads.method_not_allowed(request, ['POST'])
+
+        if request.user.is_authenticated:
+            return redirect('/users/profile/')
+
+        form = RegisterForm()
+        return render(request, 'authentication/register.html', {'form': form})
+
+    async def post(self, request):
+        form = RegisterForm(request.data)
+        # Form validation probes the username and email indexes
+        if await sync_to_async(form.is_valid)():
+            user = await form.asave()
+            await alogin(request, user)
+            if wants_json(request):
+                return payloads.register_response(user, await sync_to_async(issue_tokens)(user))
+            messages.success(request, f'Welcome to InsightED, {user.first_name}! Your account has been created.')
+            return redirect('/users/profile/')
+
+        if wants_json(request):
+            return payloads.form_error_response(form)
+        return render(request, 'authentication/register.html', {'form': form})
@@ -2,16 +2,22 @@ from django import forms
 from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
-from user_management.models import Pengguna, Instruktur
+from user_management import sharding
+from user_management.models import EMAIL_TAKEN_MESSAGE, Pengguna, Instruktur, ShardIndex, email_taken
+from . import hashing
 
 
 class LoginForm(forms.Form):
     """
     Form for user login
     """
-    username = forms.CharField(max_length=150, required=True)
+    # A username or an email address, matched case-insensitively
+    username = forms.CharField(max_length=254, required=True, label='Username or email')
     password = forms.CharField(max_length=128, required=True, widget=forms.PasswordInput)
     
+    # Async views authenticate with aauthenticate() and call confirm_user() themselves
+    check_credentials = True
+    
     def clean(self):
         """
         Validate the username and password and set the authenticated user
@@ -21,14 +27,21 @@ class LoginForm(forms.Form):
         password = cleaned_data.get('password', '')
         
         if username and password:
-            user = authenticate(username=username, password=password)
-            if user:
-                if not user.is_active:
-                    raise ValidationError("User account is disabled.")
-                cleaned_data['user'] = user
-                return cleaned_data
-            raise ValidationError("Unable to log in with provided credentials.")
+            if self.check_credentials:
+                self.confirm_user(authenticate(username=username, password=password))
+            return cleaned_data
         raise ValidationError("Must include 'username' and 'password'.")
+    
+    def confirm_user(self, user):
+        """
+        Accept the result of authenticate() or raise the login error
+        """
+        if user:
+            if not user.is_active:
+                raise ValidationError("User account is disabled.")
+            self.cleaned_data['user'] = user
+            return user
+        raise ValidationError("Unable to log in with provided credentials.")
 
 
 class RegisterForm(forms.ModelForm):
@@ -64,6 +77,32 @@ class RegisterForm(forms.ModelForm):
         self.fields['first_name'].required = True
         self.fields['last_name'].required = True
     
+    def _get_validation_exclusions(self):
+        # clean_username() and clean_email() already probed the case-insensitive
+        # unique indexes; keep full_clean() from repeating those queries
+        return super()._get_validation_exclusions() | {'username', 'email'}
+    
+    def clean_username(self):
+        """
+        Usernames are unique regardless of case. With sharding they are
+        unique across shards through ShardIndex
+        """
+        username = self.cleaned_data.get('username')
+        Pengguna.username_validator(username)
+        directory = ShardIndex.objects if sharding.shard_aliases() else Pengguna.objects
+        if directory.username_taken(username):
+            raise ValidationError(Pengguna._meta.get_field('username').error_messages['unique'])
+        return username
+    
+    def clean_email(self):
+        """
+        Emails are unique regardless of case, since users may log in with them
+        """
+        email = self.cleaned_data.get('email')
+        if email and email_taken(email):
+            raise ValidationError(EMAIL_TAKEN_MESSAGE)
+        return email
+    
     def clean_role(self):
         """
         Validates that the role is allowed
@@ -105,8 +144,8 @@ class RegisterForm(forms.ModelForm):
         # Get the role from cleaned data
         role = self.cleaned_data.get('role')
         
-        # Set the password directly
-        instance.set_password(self.cleaned_data.get('password'))
+        # Hash once on the hashing pool; the instructor reuses the same hash
+        hashing.set_password(instance, self.cleaned_data.get('password'))
         
         if role == 'instructor':
             # Create an instructor with keahlian
@@ -117,9 +156,10 @@ class RegisterForm(forms.ModelForm):
                     username=instance.username,
                     email=instance.email,
                     first_name=instance.first_name,
-                    last_name=instance.last_name
+                    last_name=instance.last_name,
+                    password=instance.password,
                 )
-                instructor.set_password(self.cleaned_data.get('password'))
+                instructor._password = instance._password
                 instructor.save()
                 return instructor
             return instance
@@ -127,4 +167,27 @@ class RegisterForm(forms.ModelForm):
             # Regular student creation
             if commit:
                 instance.save()
-            return instance
\ No newline at end of file
+            return instance
+    
+    async def asave(self):
+        """
+        Async counterpart of save(commit=True)
+        """
+        instance = super().save(commit=False)
+        await hashing.aset_password(instance, self.cleaned_data.get('password'))
+        
+        if self.cleaned_data.get('role') == 'instructor':
+            instructor = Instruktur(
+                keahlian=self.cleaned_data.get('keahlian'),
+                username=instance.username,
+                email=instance.email,
+                first_name=instance.first_name,
+                last_name=instance.last_name,
+                password=instance.password,
+            )
+            instructor._password = instance._password
+            await instructor.asave()
+            return instructor
+        
+        await instance.asave()
+        return instance
\ No newline at end of file
@@ -0,0 +1,138 @@
+"""
+PBKDF2 hasher with per-host calibrated iterations.
+
+`manage.py calibrate_hasher` measures PBKDF2 on the host and writes the
+iteration count that hashes in PASSWORD_HASH_TARGET_MS to
+PASSWORD_HASHER_CALIBRATION_FILE. CalibratedPBKDF2PasswordHasher reads it
+(re-reading when the file changes, so running workers pick up a new
+calibration) and falls back to Django's default without one.
+
+Stored hashes more than PASSWORD_HASH_REHASH_TOLERANCE away from the
+calibrated count are re-encoded on the next successful login, upwards or
+downwards, by the existing upgrade path in authentication.hashing. The
+tolerance keeps nodes with similar calibrations from rewriting each
+other's hashes on every login.
+"""
+import json
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, must_update_salt
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.crypto import get_random_string, pbkdf2
+
+PROBE_ITERATIONS = 100_000
+
+
+class Calibration:
+    """
+    The calibration file's contents, reloaded when its mtime changes.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._path = None
+        self._mtime = None
+        self._data = {}
+
+    def get(self):
+        path = settings.PASSWORD_HASHER_CALIBRATION_FILE
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except (OSError, TypeError):
+            return {}
+        if path == self._path and mtime == self._mtime:
+            return self._data
+        with self._lock:
+            try:
+                with open(path) as stream:
+                    data = json.load(stream)
+            except (OSError, ValueError):
+                data = {}
+            self._path, self._mtime, self._data = path, mtime, data
+            return data
+
+    def reset(self):
+        with self._lock:
+            self._path = self._mtime = None
+            self._data = {}
+
+
+calibration = Calibration()
+
+
+@receiver(setting_changed)
+def _reset_calibration(setting, **kwargs):
+    if setting == 'PASSWORD_HASHER_CALIBRATION_FILE':
+        calibration.reset()
+
+
+class CalibratedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    pbkdf2_sha256 with the iteration count from the host calibration.
+    Shares the algorithm name with Django's hasher, so existing hashes verify.
+    """
+    @property
+    def iterations(self):
+        return calibration.get().get('iterations') or PBKDF2PasswordHasher.iterations
+
+    def must_update(self, encoded):
+        decoded = self.decode(encoded)
+        target = self.iterations
+        tolerance = settings.PASSWORD_HASH_REHASH_TOLERANCE
+        return (
+            abs(decoded['iterations'] - target) > target * tolerance
+            or must_update_salt(decoded['salt'], self.salt_entropy)
+        )
+
+
+def _time_pbkdf2(iterations):
+    salt = get_random_string(22)
+    started = time.perf_counter()
+    pbkdf2('calibration-probe', salt, iterations, digest=PBKDF2PasswordHasher.digest)
+    return time.perf_counter() - started
+
+
+def measure(iterations, workers=1, samples=5):
+    """
+    Median seconds per hash with `workers` hashes running at once,
+    like a loaded PASSWORD_HASHING_WORKERS pool.
+    """
+    if workers <= 1:
+        return statistics.median(_time_pbkdf2(iterations) for _ in range(samples))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return statistics.median(pool.map(_time_pbkdf2, [iterations] * workers * samples))
+
+
+def calibrate(target_ms, min_iterations, workers=1, samples=5):
+    """
+    Return the calibration dict for hashes of about target_ms on this host.
+    """
+    per_iteration = measure(PROBE_ITERATIONS, workers, samples) / PROBE_ITERATIONS
+    iterations = target_ms / 1000 / per_iteration
+    # Correct once at full size, where caches and clocks behave as in production
+    iterations *= target_ms / 1000 / measure(int(iterations), workers, samples)
+    iterations = max(int(round(iterations, -4)), min_iterations)
+    return {
+        'algorithm': CalibratedPBKDF2PasswordHasher.algorithm,
+        'iterations': iterations,
+        'target_ms': target_ms,
+        'measured_ms': round(measure(iterations, workers, samples) * 1000, 1),
+        'workers': workers,
+        'cpu_count': os.cpu_count(),
+        'calibrated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+
+
+def write_calibration(data, path):
+    # Write and rename, so running workers never read a partial file
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as stream:
+        json.dump(data, stream, indent=2)
+    os.replace(tmp_path, path)
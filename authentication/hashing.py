@@ -0,0 +1,282 @@
+"""
+Password hashing executor.
+
+PBKDF2 runs take hundreds of milliseconds of CPU. Instead of running them on
+the request worker, hashes are submitted to a bounded process pool. When the
+pool and its queue are full the request is rejected straight away with
+HashingSaturated, which HashingSaturationMiddleware turns into a
+503 response with a Retry-After header.
+
+Setting PASSWORD_HASHING_WORKERS to 0 hashes inline in the request worker.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from auth_service import metrics as request_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class HashingSaturated(Exception):
+    """
+    Raised when the hashing pool cannot accept more work.
+    """
+    def __init__(self, retry_after):
+        super().__init__('Password hashing capacity exhausted')
+        self.retry_after = retry_after
+
+
+def _init_worker():
+    # Spawned/forkserver workers start without configured apps
+    django.setup()
+
+
+def _make_password(password, submitted_at):
+    started_at = time.time()
+    encoded = hashers.make_password(password)
+    return encoded, started_at - submitted_at, time.time() - started_at
+
+
+def _check_password(password, encoded, submitted_at):
+    started_at = time.time()
+    upgraded = []
+    valid = hashers.check_password(
+        password, encoded, setter=lambda raw: upgraded.append(hashers.make_password(raw))
+    )
+    upgraded = upgraded[0] if upgraded else None
+    return (valid, upgraded), started_at - submitted_at, time.time() - started_at
+
+
+class HashingMetrics:
+    """
+    Running totals for hash latency and queue wait, in seconds.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hashes = 0
+        self.rejected = 0
+        self.hash_seconds = 0.0
+        self.hash_seconds_max = 0.0
+        self.queue_wait_seconds = 0.0
+        self.queue_wait_seconds_max = 0.0
+
+    def record(self, queue_wait, hash_time):
+        queue_wait = max(queue_wait, 0.0)
+        with self._lock:
+            self.hashes += 1
+            self.hash_seconds += hash_time
+            self.hash_seconds_max = max(self.hash_seconds_max, hash_time)
+            self.queue_wait_seconds += queue_wait
+            self.queue_wait_seconds_max = max(self.queue_wait_seconds_max, queue_wait)
+        request_metrics.count('hash_seconds', queue_wait + hash_time)
+        logger.debug('password hash took %.3fs after %.3fs in queue', hash_time, queue_wait)
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'hashes': self.hashes,
+                'rejected': self.rejected,
+                'hash_seconds': self.hash_seconds,
+                'hash_seconds_max': self.hash_seconds_max,
+                'queue_wait_seconds': self.queue_wait_seconds,
+                'queue_wait_seconds_max': self.queue_wait_seconds_max,
+            }
+
+
+class HashingExecutor:
+    """
+    Bounded process pool for password hashing.
+
+    At most `workers` hashes run at once and at most `max_queue` more wait
+    for a free worker; anything beyond that raises HashingSaturated.
+    """
+    def __init__(self, workers, max_queue, timeout, retry_after):
+        self.workers = workers
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.metrics = HashingMetrics()
+        self._slots = threading.BoundedSemaphore(workers + max_queue) if workers else None
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            return self._pool
+
+    def _submit(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            self.metrics.reject()
+            raise HashingSaturated(self.retry_after)
+        try:
+            future = self._get_pool().submit(func, *args, time.time())
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def _run(self, func, *args):
+        if not self.workers:
+            result, queue_wait, hash_time = func(*args, time.time())
+            self.metrics.record(queue_wait, hash_time)
+            return result
+
+        future = self._submit(func, *args)
+        try:
+            result, queue_wait, hash_time = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self.metrics.reject()
+            raise HashingSaturated(self.retry_after)
+        self.metrics.record(queue_wait, hash_time)
+        return result
+
+    async def _arun(self, func, *args):
+        # Inline mode still leaves the event loop free by hashing on a thread
+        if not self.workers:
+            result, queue_wait, hash_time = await asyncio.to_thread(func, *args, time.time())
+            self.metrics.record(queue_wait, hash_time)
+            return result
+
+        future = self._submit(func, *args)
+        try:
+            result, queue_wait, hash_time = await asyncio.wait_for(
+                asyncio.wrap_future(future), self.timeout
+            )
+        except asyncio.TimeoutError:
+            future.cancel()
+            self.metrics.reject()
+            raise HashingSaturated(self.retry_after)
+        self.metrics.record(queue_wait, hash_time)
+        return result
+
+    def make_password(self, password):
+        return self._run(_make_password, password)
+
+    def check_password(self, password, encoded):
+        """
+        Return (valid, upgraded) where upgraded is a re-encoded hash when the
+        stored one uses outdated hasher parameters, or None.
+        """
+        if encoded is None or not hashers.is_password_usable(encoded):
+            # Nothing to verify; still hash once to keep timing uniform.
+            self.make_password(password)
+            return False, None
+        return self._run(_check_password, password, encoded)
+
+    async def amake_password(self, password):
+        return await self._arun(_make_password, password)
+
+    async def acheck_password(self, password, encoded):
+        """See check_password()."""
+        if encoded is None or not hashers.is_password_usable(encoded):
+            await self.amake_password(password)
+            return False, None
+        return await self._arun(_check_password, password, encoded)
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = HashingExecutor(
+                workers=settings.PASSWORD_HASHING_WORKERS,
+                max_queue=settings.PASSWORD_HASHING_MAX_QUEUE,
+                timeout=settings.PASSWORD_HASHING_TIMEOUT,
+                retry_after=settings.PASSWORD_HASHING_RETRY_AFTER,
+            )
+        return _executor
+
+
+@receiver(setting_changed)
+def _reset_executor(setting, **kwargs):
+    global _executor
+    if setting.startswith('PASSWORD_HASHING_') or setting == 'PASSWORD_HASHERS':
+        with _executor_lock:
+            if _executor is not None:
+                _executor.shutdown()
+            _executor = None
+
+
+def bulk_pool(workers=None):
+    """
+    Process pool for batch jobs such as user imports. It is separate from
+    the request pool, so batch jobs never trip its queue limit.
+    """
+    return ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_init_worker)
+
+
+def make_password(password):
+    """
+    Hash a raw password on the hashing pool.
+    """
+    return get_executor().make_password(password)
+
+
+def set_password(user, raw_password):
+    """
+    Pool-backed equivalent of user.set_password().
+    """
+    user.password = make_password(raw_password)
+    user._password = raw_password
+
+
+def check_password(user, raw_password):
+    """
+    Pool-backed equivalent of user.check_password(), including the
+    transparent upgrade of hashes with outdated parameters.
+    """
+    valid, upgraded = get_executor().check_password(raw_password, user.password)
+    if valid and upgraded:
+        user.password = upgraded
+        # Password hash upgrades shouldn't be considered password changes.
+        user._password = None
+        user.save(update_fields=['password'])
+    return valid
+
+
+async def amake_password(password):
+    """See make_password()."""
+    return await get_executor().amake_password(password)
+
+
+async def aset_password(user, raw_password):
+    """See set_password()."""
+    user.password = await amake_password(raw_password)
+    user._password = raw_password
+
+
+async def acheck_password(user, raw_password):
+    """See check_password()."""
+    valid, upgraded = await get_executor().acheck_password(raw_password, user.password)
+    if valid and upgraded:
+        user.password = upgraded
+        user._password = None
+        await user.asave(update_fields=['password'])
+    return valid
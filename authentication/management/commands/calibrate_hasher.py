@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from authentication.hashers import calibrate, write_calibration
+
+
+class Command(BaseCommand):
+    help = 'Measure PBKDF2 on this host and store the iteration count that meets the hashing latency target'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-ms', type=int, default=settings.PASSWORD_HASH_TARGET_MS,
+                            help='Wanted time per password hash in milliseconds')
+        parser.add_argument('--workers', type=int, default=max(settings.PASSWORD_HASHING_WORKERS, 1),
+                            help='Hashes measured at once (default: the hashing pool size)')
+        parser.add_argument('--samples', type=int, default=5, help='Measurements per step')
+        parser.add_argument('--output', default=settings.PASSWORD_HASHER_CALIBRATION_FILE,
+                            help='Calibration file to write')
+        parser.add_argument('--dry-run', action='store_true', help='Print the calibration without writing it')
+
+    def handle(self, *args, **options):
+        data = calibrate(
+            options['target_ms'], settings.PASSWORD_HASH_MIN_ITERATIONS,
+            workers=options['workers'], samples=options['samples'],
+        )
+        self.stdout.write(
+            f"{data['iterations']} iterations hash in {data['measured_ms']}ms "
+            f"with {data['workers']} concurrent hashes (target {data['target_ms']}ms)"
+        )
+        if data['iterations'] == settings.PASSWORD_HASH_MIN_ITERATIONS and data['measured_ms'] > data['target_ms']:
+            self.stderr.write(self.style.WARNING(
+                f"This host cannot meet the target above PASSWORD_HASH_MIN_ITERATIONS "
+                f"({settings.PASSWORD_HASH_MIN_ITERATIONS})."
+            ))
+        if not options['dry_run']:
+            write_calibration(data, options['output'])
+            self.stdout.write(self.style.SUCCESS(f"Calibration written to {options['output']}"))
@@ -0,0 +1,21 @@
+from django.http import JsonResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from .hashing import HashingSaturated
+
+
+class HashingSaturationMiddleware(MiddlewareMixin):
+    """
+    Turn HashingSaturated into a 503 with Retry-After instead of a 500.
+    DRF re-raises non-API exceptions, so this covers the API views as well.
+    MiddlewareMixin keeps it usable in both WSGI and ASGI middleware chains.
+    """
+    def process_exception(self, request, exception):
+        if not isinstance(exception, HashingSaturated):
+            return None
+        response = JsonResponse(
+            {'status': 'error', 'message': 'Server is busy, please try again shortly.'},
+            status=503,
+        )
+        response['Retry-After'] = str(exception.retry_after)
+        return response
@@ -1,3 +1,21 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class RefreshToken(models.Model):
+    """
+    Rotating refresh token.
+    Only the SHA-256 digest of the token is stored; tokens issued from the
+    same login share a family so a replayed token can revoke all of them.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    # No database constraint: with sharding, users live on other databases
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='refresh_tokens', db_constraint=False,
+    )
+    family = models.UUIDField(db_index=True)
+    expires_at = models.DateTimeField()
+    revoked = models.BooleanField(default=False)
+
+    def __str__(self):
+        return f"{self.user_id} - {self.family}"
@@ -0,0 +1,68 @@
+"""
+JSON payloads of the session views for clients sending Accept: application/json.
+Shapes follow the README; see auth_service.negotiation for the encoder.
+"""
+from auth_service.negotiation import ObjectEncoder, json_response
+
+USER_ENCODER = ObjectEncoder('id', 'username', 'email', 'role', 'instructor_id', 'keahlian')
+TOKENS_ENCODER = ObjectEncoder('access', 'refresh')
+RESPONSE_ENCODER = ObjectEncoder('status', 'message', 'user', 'tokens', 'errors')
+
+LOGGED_OUT = RESPONSE_ENCODER.encode({'status': 'success', 'message': 'User logged out successfully'})
+REGISTERED_MESSAGES = {
+    'student': 'Student registered successfully',
+    'instructor': 'Instructor registered successfully',
+}
+
+
+def user_payload(user, detail=False):
+    data = {'id': str(user.user_id), 'username': user.username, 'role': user.role}
+    if detail:
+        data['email'] = user.email
+        if hasattr(user, 'instruktur_id'):
+            data['instructor_id'] = str(user.instruktur_id)
+            data['keahlian'] = user.keahlian
+    return USER_ENCODER.encode(data)
+
+
+def login_response(user, tokens):
+    return json_response(RESPONSE_ENCODER.encode({
+        'status': 'success',
+        'user': user_payload(user),
+        'tokens': TOKENS_ENCODER.encode(tokens),
+    }))
+
+
+def register_response(user, tokens):
+    return json_response(RESPONSE_ENCODER.encode({
+        'status': 'success',
+        'message': REGISTERED_MESSAGES.get(user.role, 'User registered successfully'),
+        'user': user_payload(user, detail=True),
+        'tokens': TOKENS_ENCODER.encode(tokens),
+    }), status=201)
+
+
+def error_response(message, status):
+    return json_response(RESPONSE_ENCODER.encode({'status': 'error', 'message': message}), status=status)
+
+
+def form_error_response(form, status=400):
+    """
+    Field errors as {"status": "error", "errors": {field: [messages]}}.
+    """
+    errors = {field: list(messages) for field, messages in form.errors.items()}
+    return json_response(RESPONSE_ENCODER.encode({'status': 'error', 'errors': errors}), status=status)
+
+
+def login_error_response(form):
+    # Bad credentials are a 401 like the token login; malformed input a 400
+    non_field_errors = form.non_field_errors()
+    if non_field_errors:
+        return error_response(non_field_errors[0], 401)
+    return form_error_response(form)
+
+
+def method_not_allowed(request, allowed):
+    response = error_response(f'Method "{request.method}" not allowed.', 405)
+    response['Allow'] = ', '.join(allowed)
+    return response
@@ -1,9 +1,27 @@
-from django.test import TestCase
-from django.urls import reverse
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.test import TestCase, RequestFactory, override_settings
+from django.urls import clear_url_caches, reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 from user_management.models import Pengguna, Instruktur
+import importlib
 import json
+import os
+import sys
+import tempfile
+from io import StringIO
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.management import call_command
+from auth_service.negotiation import ObjectEncoder, _prefers_json
+from .forms import LoginForm
+from .hashers import write_calibration
+from .hashing import HashingExecutor, HashingSaturated, get_executor, set_password
+from .middleware import HashingSaturationMiddleware
+from .throttling import LocalStore, get_store, parse_rate
+from .models import RefreshToken
+from .tokens import AccessTokenAuthentication, InvalidToken, decode_access_token, encode_access_token, issue_tokens
 
 class RegisterViewTest(TestCase):
     """Test suite for RegisterView functionality"""
@@ -155,3 +173,402 @@ class RegisterViewTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data['status'], 'error')
         self.assertIn('keahlian', response.data['errors'])
+
+
+class HashingExecutorTest(TestCase):
+    """Test suite for the password hashing pool"""
+    
+    def setUp(self):
+        self.executor = HashingExecutor(workers=1, max_queue=0, timeout=30, retry_after=3)
+        self.addCleanup(self.executor.shutdown)
+    
+    def test_pool_round_trip(self):
+        """Test hashes made on the pool verify on the pool"""
+        encoded = self.executor.make_password('TestPass123!')
+        self.assertEqual(self.executor.check_password('TestPass123!', encoded), (True, None))
+        self.assertEqual(self.executor.check_password('wrong', encoded), (False, None))
+        self.assertEqual(self.executor.metrics.snapshot()['hashes'], 3)
+    
+    def test_saturated_pool_rejects(self):
+        """Test work beyond workers + queue is rejected without hashing"""
+        self.executor._slots.acquire()
+        with self.assertRaises(HashingSaturated) as ctx:
+            self.executor.make_password('TestPass123!')
+        self.assertEqual(ctx.exception.retry_after, 3)
+        self.assertEqual(self.executor.metrics.snapshot()['rejected'], 1)
+    
+    def test_saturation_returns_503(self):
+        """Test the middleware answers saturation with 503 and Retry-After"""
+        middleware = HashingSaturationMiddleware(lambda request: None)
+        request = RequestFactory().post('/auth/login/')
+        response = middleware.process_exception(request, HashingSaturated(3))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '3')
+    
+    def test_login_uses_pool(self):
+        """Test authenticate() checks passwords through the hashing pool"""
+        user = Pengguna(username='pooluser')
+        set_password(user, 'TestPass123!')
+        user.save()
+        self.assertEqual(authenticate(username='pooluser', password='TestPass123!'), user)
+        self.assertIsNone(authenticate(username='pooluser', password='wrong'))
+        self.assertGreaterEqual(get_executor().metrics.snapshot()['hashes'], 3)
+
+
+class TokenAuthTest(TestCase):
+    """Test suite for the access/refresh token API"""
+    
+    def setUp(self):
+        # Every test logs in as the same user; start each with empty throttle buckets
+        get_store().clear()
+        self.addCleanup(get_store().clear)
+        self.client = APIClient()
+        self.user = Pengguna.objects.create_user(username='tokenuser', password='TestPass123!')
+        response = self.client.post(
+            reverse('authentication_api:login'),
+            {'username': 'tokenuser', 'password': 'TestPass123!'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.tokens = response.data['tokens']
+    
+    def test_access_token_verified_without_queries(self):
+        """Test access tokens authenticate without touching the database"""
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+        with self.assertNumQueries(0):
+            user, claims = AccessTokenAuthentication().authenticate(request)
+        self.assertEqual(user.user_id, self.user.user_id)
+        self.assertEqual(claims['role'], 'student')
+    
+    def test_tampered_token_rejected(self):
+        """Test a modified access token is rejected"""
+        header, payload, signature = self.tokens['access'].split('.')
+        forged = '.'.join([header, payload, signature[::-1]])
+        with self.assertRaises(InvalidToken):
+            decode_access_token(forged)
+    
+    def test_refresh_rotates_and_detects_reuse(self):
+        """Test refresh tokens are single use and replay revokes the family"""
+        url = reverse('authentication_api:token_refresh')
+        response = self.client.post(url, {'refresh': self.tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rotated = response.data['tokens']['refresh']
+        
+        response = self.client.post(url, {'refresh': self.tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post(url, {'refresh': rotated}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_logout_blacklists_refresh_token(self):
+        """Test logout revokes the refresh token"""
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+        response = self.client.post(
+            reverse('authentication_api:logout'), {'refresh': self.tokens['refresh']}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['message'], 'User logged out successfully')
+        response = self.client.post(
+            reverse('authentication_api:token_refresh'), {'refresh': self.tokens['refresh']}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_profile_with_bearer_token(self):
+        """Test bearer tokens authenticate the profile endpoint"""
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+        response = self.client.get(reverse('user_management:profile'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.context['user']['username'], 'tokenuser')
+    
+    def test_change_password_with_bearer_token(self):
+        """Test a bearer-token password change stores the new hash"""
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.tokens['access']}")
+        response = self.client.post(reverse('user_management:change_password'), {
+            'old_password': 'TestPass123!', 'new_password1': 'NewPass456!x', 'new_password2': 'NewPass456!x',
+        }, format='json', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('NewPass456!x'))
+        self.assertFalse(self.user.check_password('TestPass123!'))
+
+
+class CredentialThrottleTest(TestCase):
+    """Test suite for login throttling"""
+    
+    def setUp(self):
+        get_store().clear()
+        self.addCleanup(get_store().clear)
+        self.client = APIClient()
+        self.login_url = reverse('authentication:login')
+    
+    def test_token_bucket_wait(self):
+        """Test the bucket reports the time until the next token"""
+        store = LocalStore()
+        capacity, refill_rate = parse_rate('2/min')
+        self.assertEqual(store.take('k', capacity, refill_rate), 0)
+        self.assertEqual(store.take('k', capacity, refill_rate), 0)
+        self.assertAlmostEqual(store.take('k', capacity, refill_rate), 30, delta=1)
+    
+    def test_login_throttled_before_hashing(self):
+        """Test over-limit attempts get 429 and Retry-After without hashing"""
+        data = {'username': 'victim', 'password': 'wrong'}
+        for _ in range(5):
+            self.assertNotEqual(self.client.post(self.login_url, data).status_code, 429)
+        
+        hashes = get_executor().metrics.snapshot()['hashes']
+        response = self.client.post(self.login_url, data)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        self.assertEqual(get_executor().metrics.snapshot()['hashes'], hashes)
+    
+    def test_other_usernames_unaffected(self):
+        """Test the IP+username bucket does not block other accounts"""
+        for _ in range(6):
+            self.client.post(self.login_url, {'username': 'victim', 'password': 'wrong'})
+        response = self.client.post(self.login_url, {'username': 'someone', 'password': 'wrong'})
+        self.assertNotEqual(response.status_code, 429)
+    
+    def test_forwarded_for_ignored_without_proxies(self):
+        """Test clients can't escape the IP bucket with their own X-Forwarded-For"""
+        url = reverse('authentication:register')
+        for index in range(10):
+            response = self.client.post(url, {'username': f'user{index}'}, headers={'X-Forwarded-For': f'10.0.0.{index}'})
+            self.assertNotEqual(response.status_code, 429)
+        response = self.client.post(url, {'username': 'user10'}, headers={'X-Forwarded-For': '10.0.0.10'})
+        self.assertEqual(response.status_code, 429)
+    
+    def test_forwarded_for_behind_proxy(self):
+        """Test the address added by a trusted proxy picks the IP bucket"""
+        url = reverse('authentication:register')
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            for index in range(10):
+                self.client.post(url, {'username': f'user{index}'}, headers={'X-Forwarded-For': '1.2.3.4, 10.0.0.1'})
+            spoofed = self.client.post(url, {'username': 'user10'}, headers={'X-Forwarded-For': '9.9.9.9, 10.0.0.1'})
+            other = self.client.post(url, {'username': 'user11'}, headers={'X-Forwarded-For': '10.0.0.2'})
+        self.assertEqual(spoofed.status_code, 429)
+        self.assertNotEqual(other.status_code, 429)
+
+
+class JSONNegotiationTest(TestCase):
+    """Test suite for Accept: application/json on the session views"""
+    
+    def setUp(self):
+        get_store().clear()
+        self.user = Pengguna.objects.create_user(username='jsonuser', password='TestPass123!')
+    
+    def test_prefers_json(self):
+        """Test JSON is chosen only when preferred over HTML"""
+        self.assertTrue(_prefers_json('application/json'))
+        self.assertTrue(_prefers_json('application/json, text/plain, */*'))
+        self.assertTrue(_prefers_json('text/html;q=0.5, application/json'))
+        self.assertFalse(_prefers_json('text/html,application/xhtml+xml,application/json;q=0.9,*/*;q=0.8'))
+        self.assertFalse(_prefers_json(''))
+    
+    def test_encoder_matches_json_dumps(self):
+        """Test the precomputed encoder produces standard JSON"""
+        encoder = ObjectEncoder('name', 'count', 'active', 'missing', 'nested')
+        data = {'name': 'caf\u00e9 "x"', 'count': 3, 'active': False, 'nested': encoder.encode({'count': None})}
+        self.assertEqual(
+            json.loads(encoder.encode(data)),
+            {'name': 'caf\u00e9 "x"', 'count': 3, 'active': False, 'nested': {'count': None}},
+        )
+    
+    def test_html_responses_vary_on_accept(self):
+        """Test HTML pages and redirects of the negotiated views carry Vary: Accept"""
+        responses = [
+            self.client.get(reverse('authentication:login')),
+            self.client.post(reverse('authentication:login'), {'username': 'jsonuser', 'password': 'TestPass123!'}),
+            self.client.get(reverse('user_management:profile')),
+            self.client.get(reverse('authentication:logout')),
+        ]
+        self.assertEqual([response.status_code for response in responses], [200, 302, 200, 200])
+        for response in responses:
+            self.assertIn('Accept', [header.strip() for header in response['Vary'].split(',')])
+    
+    def test_login_returns_tokens(self):
+        """Test JSON login returns the README payload without rendering a template"""
+        response = self.client.post(
+            reverse('authentication:login'),
+            {'username': 'jsonuser', 'password': 'TestPass123!'},
+            headers={'Accept': 'application/json'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.templates or None)
+        self.assertEqual(response['Vary'], 'Accept, Cookie')
+        data = response.json()
+        self.assertEqual(data['user'], {'id': str(self.user.user_id), 'username': 'jsonuser', 'role': 'student'})
+        self.assertEqual(decode_access_token(data['tokens']['access'])['user_id'], str(self.user.user_id))
+    
+    def test_invalid_login(self):
+        """Test JSON login failures are 401 errors"""
+        response = self.client.post(
+            reverse('authentication:login'),
+            {'username': 'jsonuser', 'password': 'wrong'},
+            headers={'Accept': 'application/json'},
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['message'], 'Unable to log in with provided credentials.')
+    
+    def test_register_json_body(self):
+        """Test JSON registration accepts a JSON body and reports field errors"""
+        data = {
+            'username': 'jsoninstructor', 'password': 'TestPass123!', 'password2': 'TestPass123!',
+            'email': 'i@test.com', 'first_name': 'Json', 'last_name': 'Instructor',
+            'role': 'instructor', 'keahlian': 5,
+        }
+        response = self.client.post(
+            reverse('authentication:register'), data,
+            content_type='application/json', headers={'Accept': 'application/json'},
+        )
+        self.assertEqual(response.status_code, 201)
+        body = response.json()
+        self.assertEqual(body['message'], 'Instructor registered successfully')
+        self.assertEqual(body['user']['keahlian'], 5)
+        self.assertIn('instructor_id', body['user'])
+        self.assertIn('refresh', body['tokens'])
+        
+        response = self.client.post(
+            reverse('authentication:register'), dict(data, role='admin'),
+            content_type='application/json', headers={'Accept': 'application/json'},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('role', response.json()['errors'])
+
+
+class AsyncViewsTest(TestCase):
+    """Test suite for the native async views served under ASGI"""
+    
+    def setUp(self):
+        get_store().clear()
+        # URLconfs pick the view classes at import time
+        async_settings = override_settings(ASYNC_VIEWS=True)
+        async_settings.enable()
+        self._reload_urls()
+        self.addCleanup(self._reload_urls)
+        self.addCleanup(async_settings.disable)
+        self.user = Instruktur(username='asyncuser', first_name='Async', keahlian=6)
+        self.user.set_password('TestPass123!')
+        self.user.save()
+    
+    def _reload_urls(self):
+        for module in ('authentication.urls', 'user_management.urls', 'auth_service.urls'):
+            importlib.reload(sys.modules[module])
+        clear_url_caches()
+    
+    async def test_login_and_profile(self):
+        """Test async login creates a session used by the async profile view"""
+        response = await self.async_client.post(
+            reverse('authentication:login'), {'username': 'asyncuser', 'password': 'TestPass123!'}
+        )
+        self.assertRedirects(response, '/users/profile/', fetch_redirect_response=False)
+        
+        response = await self.async_client.get(reverse('user_management:profile'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['user']['keahlian'], 6)
+        self.assertIn('Accept', response['Vary'])
+    
+    async def test_invalid_login(self):
+        """Test async login re-renders the form with the credentials error"""
+        response = await self.async_client.post(
+            reverse('authentication:login'), {'username': 'asyncuser', 'password': 'wrong'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Unable to log in with provided credentials.', response.context['form'].non_field_errors())
+    
+    async def test_register_instructor(self):
+        """Test async registration creates the instructor child row"""
+        response = await self.async_client.post(reverse('authentication:register'), {
+            'username': 'newasync', 'password': 'TestPass123!', 'password2': 'TestPass123!',
+            'email': 'new@test.com', 'first_name': 'New', 'last_name': 'Async',
+            'role': 'instructor', 'keahlian': 4,
+        })
+        self.assertEqual(response.status_code, 302)
+        instructor = await Instruktur.objects.aget(username='newasync')
+        self.assertEqual(instructor.keahlian, 4)
+    
+    async def test_change_password_with_bearer_token(self):
+        """Test async password change with a bearer token revokes the user's refresh tokens"""
+        access = encode_access_token(self.user)
+        await sync_to_async(issue_tokens)(self.user)
+        response = await self.async_client.post(
+            reverse('user_management:change_password'),
+            {'old_password': 'TestPass123!', 'new_password1': 'NewPass456!x', 'new_password2': 'NewPass456!x'},
+            headers={'Authorization': f'Bearer {access}'},
+        )
+        self.assertEqual(response.status_code, 302)
+        user = await Pengguna.objects.aget(pk=self.user.pk)
+        self.assertTrue(user.check_password('NewPass456!x'))
+        self.assertFalse(await RefreshToken.objects.filter(user_id=self.user.pk, revoked=False).aexists())
+    
+    async def test_json_login_and_profile(self):
+        """Test async views answer JSON clients with the README payloads"""
+        headers = {'Accept': 'application/json'}
+        response = await self.async_client.post(
+            reverse('authentication:login'), {'username': 'asyncuser', 'password': 'TestPass123!'}, headers=headers
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['user']['role'], 'instructor')
+        
+        response = await self.async_client.get(reverse('user_management:profile'), headers=headers)
+        self.assertEqual(response.json()['keahlian'], 6)
+    
+    async def test_profile_requires_login(self):
+        """Test anonymous requests are rejected with 401"""
+        response = await self.async_client.get(reverse('user_management:profile'))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['status'], 'error')
+
+
+@override_settings(PASSWORD_HASHING_WORKERS=0)
+class CalibratedHasherTest(TestCase):
+    """Test suite for the calibrated PBKDF2 hasher"""
+    
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'calibration.json')
+        write_calibration({'iterations': 20000}, self.path)
+        calibration_file = override_settings(PASSWORD_HASHER_CALIBRATION_FILE=self.path)
+        calibration_file.enable()
+        self.addCleanup(calibration_file.disable)
+    
+    def login_with_iterations(self, iterations):
+        user = Pengguna.objects.create_user(username='student', password='TestPass123!')
+        user.password = PBKDF2PasswordHasher().encode('TestPass123!', PBKDF2PasswordHasher().salt(), iterations)
+        user.save()
+        form = LoginForm(data={'username': 'student', 'password': 'TestPass123!'})
+        self.assertTrue(form.is_valid())
+        return int(Pengguna.objects.get(pk=user.pk).password.split('$')[1])
+    
+    def test_new_hashes_use_calibration(self):
+        """Test new passwords are hashed with the calibrated iteration count"""
+        user = Pengguna.objects.create_user(username='student', password='TestPass123!')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$20000$'))
+    
+    def test_login_downgrades_and_upgrades(self):
+        """Test a successful login re-encodes hashes far from the calibration"""
+        self.assertEqual(self.login_with_iterations(1000000), 20000)
+        Pengguna.objects.all().delete()
+        self.assertEqual(self.login_with_iterations(5000), 20000)
+    
+    def test_login_keeps_hashes_within_tolerance(self):
+        """Test hashes close to the calibration are left alone"""
+        self.assertEqual(self.login_with_iterations(22000), 22000)
+    
+    def test_calibrate_command(self):
+        """Test calibrate_hasher writes a calibration the hasher picks up"""
+        with override_settings(PASSWORD_HASH_MIN_ITERATIONS=1000):
+            call_command('calibrate_hasher', target_ms=5, workers=1, samples=1, output=self.path, stdout=StringIO())
+        with open(self.path) as stream:
+            data = json.load(stream)
+        self.assertGreaterEqual(data['iterations'], 1000)
+        self.assertEqual(data['target_ms'], 5)
+        user = Pengguna.objects.create_user(username='student', password='TestPass123!')
+        self.assertTrue(user.password.startswith(f"pbkdf2_sha256${data['iterations']}$"))
+    
+    def test_calibration_directory_is_created(self):
+        """Test the calibration can be written to a state directory that doesn't exist yet"""
+        path = os.path.join(os.path.dirname(self.path), 'state', 'auth_service', 'calibration.json')
+        write_calibration({'iterations': 30000}, path)
+        with open(path) as stream:
+            self.assertEqual(json.load(stream), {'iterations': 30000})
+
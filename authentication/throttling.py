@@ -0,0 +1,154 @@
+"""
+Token-bucket throttling for endpoints that check credentials.
+
+Every credential check costs a full password hash, so attempts are limited
+per client IP, per username and per IP+username pair. The throttles run in
+DRF's initial(), before the view validates a form or touches a hasher.
+The client IP is REMOTE_ADDR, or the address added to X-Forwarded-For by the
+outermost of REST_FRAMEWORK['NUM_PROXIES'] trusted proxies.
+
+Buckets live in THROTTLE_STORE: LocalStore keeps them in process memory,
+CacheStore keeps them in a shared Django cache so limits hold across workers.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """
+    Parse 'number/period' (e.g. '5/min') into (capacity, refill per second).
+    """
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+class LocalStore:
+    """
+    In-process token buckets, bounded to `max_entries` keys.
+    """
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, refill_rate):
+        """
+        Take one token from the bucket at key.
+        Return 0 when allowed, otherwise the seconds until a token is available.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill_rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / refill_rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheStore:
+    """
+    Token buckets kept in a shared Django cache.
+    The read-modify-write is not atomic, so concurrent attempts on one key
+    can occasionally both pass; limits still hold to within a few requests.
+    """
+    def __init__(self, alias='default'):
+        self.alias = alias
+
+    def take(self, key, capacity, refill_rate):
+        cache = caches[self.alias]
+        now = time.time()
+        tokens, updated = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill_rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / refill_rate
+        cache.set(key, (tokens, now), timeout=math.ceil(capacity / refill_rate))
+        return wait
+
+    def clear(self):
+        caches[self.alias].clear()
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = import_string(getattr(settings, 'THROTTLE_STORE', 'authentication.throttling.LocalStore'))()
+    return _store
+
+
+class CredentialThrottle(BaseThrottle):
+    """
+    Throttle POSTs by client IP, username and IP+username.
+    Rates come from CREDENTIAL_THROTTLE_RATES[scope].
+    """
+    scope = None
+
+    def get_username(self, request):
+        # DRF requests expose parsed bodies as .data, plain Django requests as .POST
+        data = getattr(request, 'data', request.POST)
+        username = data.get('username') if hasattr(data, 'get') else None
+        return str(username).lower() if username else ''
+
+    def allow_request(self, request, view):
+        self.wait_seconds = 0.0
+        if request.method != 'POST':
+            return True
+
+        ident = self.get_ident(request) or ''
+        username = self.get_username(request)
+        keys = {
+            'ip': ident,
+            'username': username,
+            'ip_username': f'{ident}|{username}' if username else '',
+        }
+        store = get_store()
+        for kind, rate in settings.CREDENTIAL_THROTTLE_RATES.get(self.scope, {}).items():
+            if not keys[kind]:
+                continue
+            capacity, refill_rate = parse_rate(rate)
+            wait = store.take(f'throttle:{self.scope}:{kind}:{keys[kind]}', capacity, refill_rate)
+            self.wait_seconds = max(self.wait_seconds, wait)
+        return self.wait_seconds == 0
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class LoginThrottle(CredentialThrottle):
+    scope = 'login'
+
+
+class RegisterThrottle(CredentialThrottle):
+    scope = 'register'
+
+
+class PasswordChangeThrottle(CredentialThrottle):
+    scope = 'password_change'
+
+    def get_username(self, request):
+        return request.user.username.lower() if request.user.is_authenticated else ''
@@ -0,0 +1,221 @@
+"""
+Access/refresh token authentication for the API.
+
+Access tokens are short-lived HS256 JWTs carrying `user_id` and `role`, so
+verifying one is a signature check with no database access. Refresh tokens
+are opaque random strings stored as digests in RefreshToken and rotated on
+every use; presenting an already-rotated token revokes its whole family.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from user_management.cache import get_cached_user
+from user_management.models import Pengguna
+from .models import RefreshToken
+
+
+class InvalidToken(Exception):
+    """
+    Raised for malformed, tampered, expired or revoked tokens.
+    """
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b'=')
+
+
+def _b64decode(value):
+    return base64.urlsafe_b64decode(value + b'=' * (-len(value) % 4))
+
+
+# Only HS256 tokens are ever issued, so the header is a constant.
+_HEADER = _b64encode(b'{"alg":"HS256","typ":"JWT"}')
+
+
+def _signature(signing_input):
+    key = force_bytes(getattr(settings, 'TOKEN_SIGNING_KEY', settings.SECRET_KEY))
+    return hmac.new(key, signing_input, hashlib.sha256).digest()
+
+
+def encode_access_token(user):
+    """
+    Return a signed access token for user.
+    """
+    now = int(time.time())
+    payload = {
+        'user_id': str(user.user_id),
+        'role': user.role,
+        'iat': now,
+        'exp': now + settings.ACCESS_TOKEN_LIFETIME,
+        'type': 'access',
+    }
+    signing_input = _HEADER + b'.' + _b64encode(json.dumps(payload, separators=(',', ':')).encode())
+    return (signing_input + b'.' + _b64encode(_signature(signing_input))).decode()
+
+
+def decode_access_token(token):
+    """
+    Verify an access token and return its claims.
+    """
+    try:
+        header, payload, signature = force_bytes(token).split(b'.')
+    except ValueError:
+        raise InvalidToken('Malformed token')
+    if header != _HEADER:
+        raise InvalidToken('Unsupported token header')
+    try:
+        valid = hmac.compare_digest(_b64decode(signature), _signature(header + b'.' + payload))
+        claims = json.loads(_b64decode(payload)) if valid else None
+    except ValueError:
+        raise InvalidToken('Malformed token')
+    if claims is None:
+        raise InvalidToken('Invalid token signature')
+    if not isinstance(claims, dict) or claims.get('type') != 'access':
+        raise InvalidToken('Not an access token')
+    if claims.get('exp', 0) <= time.time():
+        raise InvalidToken('Token has expired')
+    return claims
+
+
+def _digest(raw):
+    return hashlib.sha256(force_bytes(raw)).hexdigest()
+
+
+def issue_tokens(user, family=None):
+    """
+    Issue an access token and a new refresh token for user.
+    """
+    raw = secrets.token_urlsafe(32)
+    RefreshToken.objects.create(
+        user=user,
+        digest=_digest(raw),
+        family=family or uuid.uuid4(),
+        expires_at=timezone.now() + timedelta(seconds=settings.REFRESH_TOKEN_LIFETIME),
+    )
+    return {'access': encode_access_token(user), 'refresh': raw}
+
+
+def rotate_refresh_token(raw):
+    """
+    Exchange a refresh token for a new token pair.
+    The presented token is revoked with a conditional UPDATE, so two
+    concurrent refreshes with the same token cannot both succeed.
+    """
+    try:
+        token = RefreshToken.objects.get(digest=_digest(raw))
+    except RefreshToken.DoesNotExist:
+        raise InvalidToken('Unknown refresh token')
+
+    if token.expires_at <= timezone.now():
+        raise InvalidToken('Refresh token has expired')
+    # Users may live on another database shard, so no join on token.user
+    try:
+        user = get_cached_user(token.user_id)
+    except Pengguna.DoesNotExist:
+        raise InvalidToken('User not found')
+    if not user.is_active:
+        raise InvalidToken('User account is disabled')
+
+    with transaction.atomic():
+        rotated = RefreshToken.objects.filter(pk=token.pk, revoked=False).update(revoked=True)
+        if rotated:
+            return issue_tokens(user, family=token.family)
+
+    # Replay of a rotated token: assume it leaked and end the whole login.
+    RefreshToken.objects.filter(family=token.family).update(revoked=True)
+    raise InvalidToken('Refresh token has been revoked')
+
+
+def revoke_refresh_token(raw, user=None):
+    """
+    Revoke every token in the family of a refresh token (logout).
+    Return False when the token is unknown or belongs to someone else.
+    """
+    tokens = RefreshToken.objects.filter(digest=_digest(raw))
+    if user is not None:
+        tokens = tokens.filter(user_id=user.pk)
+    family = tokens.values_list('family', flat=True).first()
+    if family is None:
+        return False
+    RefreshToken.objects.filter(family=family).update(revoked=True)
+    return True
+
+
+def revoke_user_tokens(user):
+    """
+    Revoke every refresh token of user, e.g. to log them out everywhere.
+    """
+    return RefreshToken.objects.filter(user_id=user.pk, revoked=False).update(revoked=True)
+
+
+class TokenUser:
+    """
+    request.user for token-authenticated requests.
+    `user_id` and `role` come from the token; any other attribute loads
+    the full role subclass instance on first use.
+    """
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, claims):
+        self.user_id = uuid.UUID(claims['user_id'])
+        self.role = claims['role']
+        self._user = None
+
+    def _load(self):
+        if self._user is None:
+            try:
+                self._user = Pengguna.objects.locate(user_id=self.user_id).select_subclasses().get(user_id=self.user_id)
+            except Pengguna.DoesNotExist:
+                raise exceptions.AuthenticationFailed('User not found.')
+        return self._user
+
+    def __getattr__(self, name):
+        if name.startswith('__') or name == '_user':
+            raise AttributeError(name)
+        return getattr(self._load(), name)
+
+    def __setattr__(self, name, value):
+        # Writes go to the loaded user, so user.password = ...; user.save() works
+        if name in ('user_id', 'role', '_user'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._load(), name, value)
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class AccessTokenAuthentication(BaseAuthentication):
+    """
+    DRF authentication for `Authorization: Bearer <access-token>`.
+    """
+    keyword = b'bearer'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword:
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid Authorization header.')
+        try:
+            claims = decode_access_token(auth[1])
+        except InvalidToken as e:
+            raise exceptions.AuthenticationFailed(str(e))
+        return TokenUser(claims), claims
+
+    def authenticate_header(self, request):
+        return 'Bearer'
@@ -1,11 +1,15 @@
+from django.conf import settings
 from django.urls import path
-from .views import LoginView, LogoutView, RegisterView
+from . import async_views, views
 
 app_name = 'authentication'
 
+# ASGI deployments serve the native async versions of the credential views
+_views = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
-    path('login/', LoginView.as_view(), name='login'),
-    path('logout/', LogoutView.as_view(), name='logout'),
-    path('register/', RegisterView.as_view(), name='register'),
+    path('login/', _views.LoginView.as_view(), name='login'),
+    path('logout/', views.LogoutView.as_view(), name='logout'),
+    path('register/', _views.RegisterView.as_view(), name='register'),
     # Removed token refresh endpoint as we're using Django sessions now
 ]
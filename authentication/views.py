@@ -1,16 +1,28 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout
 from django.contrib import messages
+from rest_framework import status
+from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 
+from auth_service.negotiation import json_response, negotiated, wants_json
+from . import payloads
 from .forms import LoginForm, RegisterForm
+from .throttling import LoginThrottle, RegisterThrottle
+from .tokens import AccessTokenAuthentication, InvalidToken, issue_tokens, revoke_refresh_token, rotate_refresh_token
 
+@negotiated
 class LoginView(APIView):
     """
     Handle user login using Django session authentication
     """
+    throttle_classes = [LoginThrottle]
+    
     def get(self, request):
+        if wants_json(request):
+            return payloads.method_not_allowed(request, ['POST'])
+        
         # If user is already logged in, redirect to profile
         if request.user.is_authenticated:
             return redirect('/users/profile/')
@@ -20,7 +32,7 @@ class LoginView(APIView):
         return render(request, 'authentication/login.html', {'form': form})
     
     def post(self, request):
-        form = LoginForm(request.POST)
+        form = LoginForm(request.data)
         
         if form.is_valid():
             user = form.cleaned_data['user']
@@ -28,15 +40,22 @@ class LoginView(APIView):
             # Create Django session
             login(request, user)
             
+            if wants_json(request):
+                return payloads.login_response(user, issue_tokens(user))
+            
             # Set success message
             messages.success(request, f'Welcome back, {user.first_name}!')
             
             # Redirect to profile page
             return redirect('/users/profile/')
         
+        if wants_json(request):
+            return payloads.login_error_response(form)
+        
         # Authentication failed - form.errors will contain the error messages
         return render(request, 'authentication/login.html', {'form': form})
 
+@negotiated
 class LogoutView(APIView):
     """
     Handle user logout using Django session authentication
@@ -44,6 +63,9 @@ class LogoutView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
+        if wants_json(request):
+            return payloads.method_not_allowed(request, ['POST'])
+        
         # Show logout confirmation page
         return render(request, 'authentication/logout_confirm.html')
     
@@ -51,19 +73,27 @@ class LogoutView(APIView):
         # End Django session
         logout(request)
         
+        if wants_json(request):
+            return json_response(payloads.LOGGED_OUT)
+        
         # Set success message
         messages.success(request, 'You have been successfully logged out.')
         
         # Redirect to login page
         return redirect('/auth/login/')
 
+@negotiated
 class RegisterView(APIView):
     """
     Handle user registration for students and instructors only
     """
     permission_classes = [AllowAny]
+    throttle_classes = [RegisterThrottle]
     
     def get(self, request):
+        if wants_json(request):
+            return payloads.method_not_allowed(request, ['POST'])
+        
         # If user is already logged in, redirect to profile
         if request.user.is_authenticated:
             return redirect('/users/profile/')
@@ -73,7 +103,7 @@ class RegisterView(APIView):
         return render(request, 'authentication/register.html', {'form': form})
     
     def post(self, request):
-        form = RegisterForm(request.POST)
+        form = RegisterForm(request.data)
         if form.is_valid():
             # Create the user (form handles student vs instructor logic)
             user = form.save()
@@ -81,11 +111,85 @@ class RegisterView(APIView):
             # Automatically log in the new user
             login(request, user)
             
+            if wants_json(request):
+                return payloads.register_response(user, issue_tokens(user))
+            
             # Set success message
             messages.success(request, f'Welcome to InsightED, {user.first_name}! Your account has been created.')
             
             # Redirect to profile page
             return redirect('/users/profile/')
         
+        if wants_json(request):
+            return payloads.form_error_response(form)
+        
         # Re-render the registration form with errors
         return render(request, 'authentication/register.html', {'form': form})
+
+
+class TokenLoginView(APIView):
+    """
+    Authenticate user and issue access and refresh tokens
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = [LoginThrottle]
+    
+    def post(self, request):
+        form = LoginForm(request.data)
+        if not form.is_valid():
+            return Response(
+                {'status': 'error', 'message': form.non_field_errors()[0]},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        
+        user = form.cleaned_data['user']
+        return Response({
+            'status': 'success',
+            'user': {
+                'id': str(user.user_id),
+                'username': user.username,
+                'role': user.role,
+            },
+            'tokens': issue_tokens(user),
+        })
+
+class TokenRefreshView(APIView):
+    """
+    Exchange a refresh token for a new access and refresh token pair
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    
+    def post(self, request):
+        refresh = request.data.get('refresh')
+        if not refresh:
+            return Response(
+                {'status': 'error', 'message': 'Refresh token is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            tokens = rotate_refresh_token(refresh)
+        except InvalidToken as e:
+            return Response(
+                {'status': 'error', 'message': str(e)},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        return Response({'status': 'success', 'tokens': tokens})
+
+class TokenLogoutView(APIView):
+    """
+    Blacklist the refresh token of the current login.
+    Access tokens are not stored and stay valid until they expire.
+    """
+    authentication_classes = [AccessTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request):
+        refresh = request.data.get('refresh')
+        if not refresh or not revoke_refresh_token(refresh, user=request.user):
+            return Response(
+                {'status': 'error', 'message': 'Invalid refresh token'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'status': 'success', 'message': 'User logged out successfully'})
@@ -1,3 +1,12 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import UserSession
+
+
+@admin.register(UserSession)
+class UserSessionAdmin(admin.ModelAdmin):
+    list_display = ('user', 'created_at', 'ip_address', 'user_agent')
+    # Users may live on another shard, so no join or lookup on user
+    raw_id_fields = ('user',)
+    exclude = ('session_key',)
+    ordering = ('-created_at',)
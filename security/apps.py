@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class SecurityConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'security'
+
+    def ready(self):
+        # Connect the session registry's login, logout and user deletion signals,
+        # and start the session reaper thread on the first request
+        from . import reaper, sessions  # noqa: F401
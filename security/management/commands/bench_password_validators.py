@@ -0,0 +1,75 @@
+import random
+import string
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import password_validation as stock
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from security import passwords, validators
+from security.passwords import read_lines
+from user_management.models import Pengguna
+
+
+def rejects(validator, password, user=None):
+    try:
+        validator.validate(password, user)
+    except ValidationError:
+        return True
+    return False
+
+
+def timed(func):
+    started = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = "Compare the security app's password validators with Django's"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--passwords', type=int, default=20000, help='Passwords validated per validator')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        common = list(read_lines(validators.DJANGO_PASSWORD_LIST))
+        alphabet = string.ascii_letters + string.digits + '!@#$%'
+        samples = [
+            rng.choice(common) if rng.random() < 0.5 else ''.join(rng.choices(alphabet, k=rng.randint(8, 20)))
+            for _ in range(options['passwords'])
+        ]
+        user = Pengguna(username='siti.rahma', first_name='Siti', last_name='Rahmawati',
+                        email='siti.rahma@example.com')
+        # Half the samples resemble the user, so both similarity outcomes are exercised
+        similar = [rng.choice(['siti.rahma', 'rahmawati', 'sitirahma']) + str(rng.randint(0, 99)) for _ in samples]
+        similarity_samples = [p for pair in zip(samples, similar) for p in pair][:len(samples)]
+
+        passwords._sets.pop(settings.PASSWORD_LIST_FILE, None)
+        rows = [
+            self.measure('common (django)', stock.CommonPasswordValidator, samples),
+            self.measure('common (security)', validators.CommonPasswordValidator, samples),
+            self.measure('similarity (django)', stock.UserAttributeSimilarityValidator, similarity_samples, user),
+            self.measure('similarity (security)', validators.UserAttributeSimilarityValidator, similarity_samples, user),
+        ]
+        self.stdout.write(f"{'validator':<24}{'first use ms':>14}{'memory KiB':>12}{'per check us':>14}{'rejected':>10}")
+        for name, first_use, memory, per_check, rejected in rows:
+            self.stdout.write(
+                f'{name:<24}{first_use * 1000:>14.2f}{memory / 1024:>12.1f}{per_check * 1e6:>14.2f}{rejected:>10}'
+            )
+        for stock_row, security_row in (rows[0:2], rows[2:4]):
+            if stock_row[4] != security_row[4]:
+                self.stderr.write(self.style.ERROR(f'{security_row[0]} disagrees with {stock_row[0]}'))
+
+    def measure(self, name, validator_class, samples, user=None):
+        # First use includes loading the list, as in a fresh worker;
+        # mapped file pages are shared between workers and not counted as memory
+        tracemalloc.start()
+        validator, first_use = timed(lambda: validator_class())
+        _, warmup = timed(lambda: rejects(validator, samples[0], user))
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results, elapsed = timed(lambda: [rejects(validator, password, user) for password in samples])
+        return name, first_use + warmup, memory, elapsed / len(samples), sum(results)
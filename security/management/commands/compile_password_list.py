@@ -0,0 +1,39 @@
+import itertools
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from security.passwords import compile_set, keys_from_file
+from security.validators import DJANGO_PASSWORD_LIST
+
+
+class Command(BaseCommand):
+    help = 'Compile password lists into the memory-mapped set used by CommonPasswordValidator'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*',
+                            help='Password lists, plain or gzipped (default: Django\'s common password list)')
+        parser.add_argument('--format', choices=['text', 'sha1'], default='text',
+                            help="One password per line, or one hex SHA-1 per line as in Have I Been Pwned's list")
+        parser.add_argument('--include-default', action='store_true',
+                            help="Also include Django's common password list")
+        parser.add_argument('--output', default=settings.PASSWORD_LIST_FILE, help='Set file to write')
+
+    def handle(self, *args, **options):
+        sources = [(path, options['format']) for path in options['paths']]
+        if options['include_default'] or not sources:
+            sources.append((DJANGO_PASSWORD_LIST, 'text'))
+        for path, _ in sources:
+            if not os.path.exists(path):
+                raise CommandError(f'{path} does not exist')
+
+        os.makedirs(os.path.dirname(os.path.abspath(options['output'])), exist_ok=True)
+        count = compile_set(
+            itertools.chain.from_iterable(keys_from_file(path, fmt) for path, fmt in sources),
+            options['output'],
+            exact_case=any(fmt == 'sha1' for _, fmt in sources),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Compiled {count} passwords into {options['output']} ({os.path.getsize(options['output'])} bytes). "
+            f"Restart workers to use it."
+        ))
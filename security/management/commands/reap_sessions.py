@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from security.reaper import SessionReaper
+
+
+class Command(BaseCommand):
+    help = 'Delete expired sessions in small batches, without locking the session table for long'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.SESSION_REAPER_BATCH_SIZE,
+                            help='Sessions deleted per statement')
+        parser.add_argument('--pause', type=float, default=settings.SESSION_REAPER_PAUSE,
+                            help='Seconds to wait between batches')
+        parser.add_argument('--time-budget', type=float, default=settings.SESSION_REAPER_TIME_BUDGET,
+                            help='Seconds to run before stopping; the next run carries on')
+
+    def progress(self, reaper):
+        self.stdout.write(f'Deleted {reaper.deleted} expired sessions in {reaper.batches} batches')
+
+    def handle(self, *args, **options):
+        reaper = SessionReaper(options['batch_size'], options['pause'], options['time_budget'])
+        summary = reaper.run(self.progress if options['verbosity'] > 1 else None)
+        if summary is None:
+            self.stdout.write(self.style.WARNING('Another session cleanup is running; nothing done.'))
+            return
+        message = (
+            f"Deleted {summary['deleted']} expired sessions in {summary['batches']} batches, "
+            f"{summary['seconds']}s ({summary['rows_per_second']} rows/s)."
+        )
+        if summary['finished']:
+            self.stdout.write(self.style.SUCCESS(message))
+        else:
+            self.stdout.write(self.style.WARNING(f'{message} Time budget spent; run again to continue.'))
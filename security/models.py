@@ -1,3 +1,27 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class UserSession(models.Model):
+    """
+    A user's logged-in session, kept in step with the session store on
+    login, logout and revocation (see security.sessions).
+    The session key itself is never sent to clients; they refer to a
+    session by id.
+    """
+    session_key = models.CharField(max_length=40, unique=True)
+    # No database constraint: with sharding, users live on other databases
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sessions', db_constraint=False,
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    user_agent = models.CharField(max_length=256, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='usersession_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.created_at:%Y-%m-%d %H:%M}"
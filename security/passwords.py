@@ -0,0 +1,155 @@
+"""
+Compiled, memory-mapped password sets.
+
+A set file holds the sorted 64-bit prefixes of the SHA-1 digests of its
+passwords behind a 16-byte header:
+
+    b'PWSET' + flags byte + 2 bytes byte order ('le'/'be') + uint64 count
+    followed by count native uint64 keys
+
+Lookups are a binary search over the mapped file, so opening a set costs
+nothing, its pages are shared by every worker through the page cache, and
+sets of millions of passwords (such as the Have I Been Pwned SHA-1 list)
+take 8 bytes per entry. Two different passwords share a prefix with a
+probability of about n / 2**64, i.e. never in practice.
+
+Plain lists are lowercased when compiled, like Django's common password
+list; SHA-1 lists are hashes of the exact password. contains() checks the
+lowercased password, and for sets flagged EXACT_CASE also the password as
+typed.
+"""
+import bisect
+import gzip
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+
+MAGIC = b'PWSET'
+HEADER = struct.Struct('=5sB2sQ')
+BYTE_ORDER = {'little': b'le', 'big': b'be'}[sys.byteorder]
+KEY = struct.Struct('>Q')
+
+# Header flag: some keys hash passwords as typed rather than lowercased
+EXACT_CASE = 1
+
+
+def password_key(password):
+    return KEY.unpack_from(hashlib.sha1(password.encode()).digest())[0]
+
+
+def sha1_key(hex_digest):
+    return int(hex_digest[:16], 16)
+
+
+def read_lines(path):
+    """
+    Yield the stripped lines of a plain or gzipped text file.
+    """
+    with open(path, 'rb') as probe:
+        gzipped = probe.read(2) == b'\x1f\x8b'
+    opener = gzip.open if gzipped else open
+    with opener(path, 'rt', encoding='utf-8', errors='replace') as stream:
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def keys_from_file(path, fmt='text'):
+    """
+    Yield set keys from a password list: one password per line ('text'),
+    or one hex SHA-1 per line with an optional ':count' suffix ('sha1').
+    """
+    for line in read_lines(path):
+        if fmt == 'sha1':
+            yield sha1_key(line.split(':', 1)[0])
+        else:
+            yield password_key(line.lower())
+
+
+def compile_set(keys, path, exact_case=False):
+    """
+    Write the keys as a set file and return the number of distinct entries.
+    exact_case marks sets that include keys of passwords as typed.
+    The file is written next to path and renamed, so readers never see it half done.
+    """
+    values = array('Q', sorted(set(keys)))
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as stream:
+        stream.write(HEADER.pack(MAGIC, EXACT_CASE if exact_case else 0, BYTE_ORDER, len(values)))
+        values.tofile(stream)
+    os.replace(tmp_path, path)
+    return len(values)
+
+
+class PasswordSet:
+    """
+    Read-only membership test over a compiled set file.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as stream:
+            self._map = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, flags, byte_order, count = HEADER.unpack_from(self._map)
+        if magic != MAGIC or byte_order != BYTE_ORDER:
+            self._map.close()
+            raise ValueError(f'{path} is not a password set compiled on this platform')
+        self.exact_case = bool(flags & EXACT_CASE)
+        self._keys = memoryview(self._map)[HEADER.size:HEADER.size + count * 8].cast('Q')
+
+    @classmethod
+    def from_keys(cls, keys, exact_case=False):
+        """
+        Build a set in this process's memory, for when no file can be written.
+        """
+        password_set = cls.__new__(cls)
+        password_set.path = None
+        password_set.exact_case = exact_case
+        password_set._keys = array('Q', sorted(set(keys)))
+        return password_set
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _has_key(self, key):
+        index = bisect.bisect_left(self._keys, key)
+        return index < len(self._keys) and self._keys[index] == key
+
+    def contains(self, password):
+        password = password.strip()
+        lowered = password.lower()
+        return self._has_key(password_key(lowered)) or (
+            self.exact_case and lowered != password and self._has_key(password_key(password))
+        )
+
+
+_sets = {}
+_sets_lock = threading.Lock()
+
+
+def get_set(path, build_from=None):
+    """
+    Return the process-wide PasswordSet for path, compiling it from the
+    plain list build_from first if the file does not exist yet. When the
+    file cannot be written or read (e.g. a read-only deploy), the set is
+    built in memory from build_from instead.
+    """
+    password_set = _sets.get(path)
+    if password_set is not None:
+        return password_set
+    with _sets_lock:
+        if path not in _sets:
+            try:
+                if build_from is not None and not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    compile_set(keys_from_file(build_from), path)
+                _sets[path] = PasswordSet(path)
+            except OSError:
+                if build_from is None:
+                    raise
+                _sets[path] = PasswordSet.from_keys(keys_from_file(build_from))
+        return _sets[path]
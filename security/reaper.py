@@ -0,0 +1,183 @@
+"""
+Expired session cleanup in small batches.
+
+Django's clearsessions deletes every expired row in one statement, which
+holds locks on django_session for as long as it runs and stalls logins.
+SessionReaper deletes them a batch at a time instead:
+
+    SELECT session_key, expire_date FROM django_session
+    WHERE expire_date >= :last AND expire_date < :cutoff
+    ORDER BY expire_date LIMIT n
+
+then DELETE ... WHERE session_key IN (...) AND expire_date < :cutoff, each
+in its own short transaction. Batches walk the expire_date index from the
+last batch's expiry, pausing SESSION_REAPER_PAUSE seconds between them, and
+a run stops once SESSION_REAPER_TIME_BUDGET seconds have passed; the next
+run carries on. The cutoff is fixed when a run starts, and a session renewed
+meanwhile no longer matches the DELETE. Registry rows (security.UserSession)
+of the deleted sessions go with them.
+
+Runs come from `manage.py reap_sessions` (e.g. from cron) or, with
+SESSION_REAPER_INTERVAL set, from a daemon thread in each serving process,
+started on its first request. A cache lock keeps the processes sharing
+CACHES['default'] from running at the same time. Progress is added to the
+auth_session_reaper_* counters on /metrics.
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db import connections, router, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from auth_service import metrics
+from .models import UserSession
+from .sessions import session_store
+
+LOCK_KEY = 'session-reaper:lock'
+
+logger = logging.getLogger(__name__)
+
+
+class SessionReaper:
+    """
+    Deletes expired sessions batch by batch and counts its progress.
+    """
+    def __init__(self, batch_size=None, pause=None, time_budget=None):
+        self.batch_size = batch_size or settings.SESSION_REAPER_BATCH_SIZE
+        self.pause = settings.SESSION_REAPER_PAUSE if pause is None else pause
+        self.time_budget = time_budget or settings.SESSION_REAPER_TIME_BUDGET
+        self.model = session_store().get_model_class()
+        self.deleted = 0
+        self.batches = 0
+        self.started_at = None
+        self.finished = False
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            'deleted': self.deleted,
+            'batches': self.batches,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(self.deleted / elapsed, 1) if elapsed else 0.0,
+            'finished': self.finished,
+        }
+
+    def _delete_batch(self, using, last, cutoff):
+        """
+        Delete one batch of sessions expiring in [last, cutoff).
+        Return the batch's last expire_date, or None when there are no more.
+        """
+        expired = self.model.objects.using(using).filter(expire_date__lt=cutoff)
+        if last is not None:
+            expired = expired.filter(expire_date__gte=last)
+        batch = list(expired.order_by('expire_date').values_list('session_key', 'expire_date')[:self.batch_size])
+        if not batch:
+            return None
+        session_keys = [session_key for session_key, _ in batch]
+        with transaction.atomic(using=using):
+            deleted, _ = self.model.objects.using(using).filter(
+                session_key__in=session_keys, expire_date__lt=cutoff,
+            ).delete()
+        UserSession.objects.filter(session_key__in=session_keys).delete()
+        self.deleted += deleted
+        self.batches += 1
+        metrics.registry.add('auth_session_reaper_batches_total')
+        metrics.registry.add('auth_session_reaper_deleted_total', deleted)
+        return batch[-1][1] if len(batch) == self.batch_size else None
+
+    def run_batches(self):
+        """
+        Delete batches until none are left or the time budget is spent,
+        yielding after each batch so callers can report progress.
+        """
+        self.started_at = time.monotonic()
+        deadline = self.started_at + self.time_budget
+        using = router.db_for_write(self.model)
+        cutoff = timezone.now()
+        last = None
+        metrics.registry.add('auth_session_reaper_runs_total')
+        try:
+            while True:
+                last = self._delete_batch(using, last, cutoff)
+                if last is None:
+                    self.finished = True
+                    return
+                yield self
+                if time.monotonic() + self.pause >= deadline:
+                    metrics.registry.add('auth_session_reaper_budget_exhausted_total')
+                    return
+                time.sleep(self.pause)
+        finally:
+            metrics.registry.add('auth_session_reaper_seconds_total', time.monotonic() - self.started_at)
+
+    def run(self, progress=None):
+        """
+        Run once, unless another process holds the lock, calling progress(self)
+        after each batch. Return summary(), or None when locked out.
+        """
+        if not cache.add(LOCK_KEY, os.getpid(), timeout=self.time_budget + 60):
+            return None
+        try:
+            for _ in self.run_batches():
+                if progress is not None:
+                    progress(self)
+        finally:
+            cache.delete(LOCK_KEY)
+        return self.summary()
+
+
+class ReaperThread(threading.Thread):
+    """
+    Runs a SessionReaper every SESSION_REAPER_INTERVAL seconds.
+    """
+    def __init__(self, interval):
+        super().__init__(name='session-reaper', daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                SessionReaper().run()
+            except Exception:
+                # The next interval tries again
+                logger.exception('expired session cleanup failed')
+            finally:
+                # Connections of this thread are not closed by request_finished
+                connections.close_all()
+
+    def stop(self):
+        self.stopped.set()
+
+
+_thread = None
+_thread_pid = None
+_thread_lock = threading.Lock()
+
+
+def start_thread():
+    """
+    Start this process's reaper thread if SESSION_REAPER_INTERVAL is set.
+    Forked workers start their own.
+    """
+    global _thread, _thread_pid
+    interval = settings.SESSION_REAPER_INTERVAL
+    if not interval or (_thread_pid == os.getpid() and _thread.is_alive()):
+        return _thread
+    with _thread_lock:
+        if _thread_pid != os.getpid() or not _thread.is_alive():
+            _thread = ReaperThread(interval)
+            _thread.start()
+            _thread_pid = os.getpid()
+    return _thread
+
+
+@receiver(request_started)
+def _request_started(sender, **kwargs):
+    start_thread()
@@ -0,0 +1,170 @@
+"""
+Per-user session registry.
+
+django_session keeps the user id inside the encoded session data, so a
+user's sessions cannot be found without decoding the whole table.
+UserSession rows map each logged-in session to its user, indexed on
+(user, created_at), and are kept in step with the session store:
+
+- login registers the new session; past SECURITY_MAX_SESSIONS_PER_USER
+  the user's oldest sessions are revoked
+- logout drops the row of the ending session
+- deleting a user revokes all of their sessions
+
+Listing and revoking are bounded index scans over one user's rows, plus
+one primary key query on django_session, whatever the size of the table.
+Revoked sessions are deleted from the store, but other workers may serve
+them from their local cache for up to SESSION_LOCAL_CACHE_TIMEOUT seconds.
+"""
+import ipaddress
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.signals import user_logged_in, user_logged_out
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from authentication.tokens import revoke_user_tokens
+from user_management.models import Pengguna
+from .models import UserSession
+
+
+def session_store():
+    return import_module(settings.SESSION_ENGINE).SessionStore
+
+
+def _delete_sessions(session_keys):
+    store = session_store()
+    if hasattr(store, 'delete_many'):
+        store.delete_many(session_keys)
+    else:
+        for session_key in session_keys:
+            store().delete(session_key)
+
+
+def _client_ip(request):
+    try:
+        return str(ipaddress.ip_address(request.META.get('REMOTE_ADDR', '')))
+    except ValueError:
+        return None
+
+
+def register(request, user):
+    """
+    Record request's session as one of user's sessions.
+    """
+    session_key = request.session.session_key
+    if session_key is None:
+        return None
+    # Logins cycle the session key, so this is a plain INSERT with no read
+    # first; ignore_conflicts covers a repeat login on an unchanged session
+    entry = UserSession(
+        session_key=session_key,
+        user_id=user.pk,
+        ip_address=_client_ip(request),
+        user_agent=request.META.get('HTTP_USER_AGENT', '')[:256],
+    )
+    UserSession.objects.bulk_create([entry], ignore_conflicts=True)
+    # Keep the newest sessions only, so every user's rows stay few
+    oldest = list(
+        UserSession.objects.filter(user_id=user.pk).order_by('-created_at', '-pk')
+        .values_list('pk', 'session_key')[settings.SECURITY_MAX_SESSIONS_PER_USER:]
+    )
+    if oldest:
+        _revoke([pk for pk, _ in oldest], [key for _, key in oldest])
+    return entry
+
+
+def _revoke(pks, session_keys):
+    _delete_sessions(session_keys)
+    UserSession.objects.filter(pk__in=pks).delete()
+
+
+def list_sessions(user, current_key=None):
+    """
+    Return user's live sessions, newest first, as dicts without session keys.
+    Rows whose session has ended are dropped on the way.
+    """
+    entries = list(
+        UserSession.objects.filter(user_id=user.pk).order_by('-created_at', '-pk')
+        [:settings.SECURITY_MAX_SESSIONS_PER_USER]
+    )
+    live = dict(
+        session_store().get_model_class().objects
+        .filter(session_key__in=[entry.session_key for entry in entries], expire_date__gt=timezone.now())
+        .values_list('session_key', 'expire_date')
+    )
+    stale = [entry.pk for entry in entries if entry.session_key not in live]
+    if stale:
+        UserSession.objects.filter(pk__in=stale).delete()
+    return [
+        {
+            'id': entry.pk,
+            'created_at': entry.created_at,
+            'expires_at': live[entry.session_key],
+            'ip_address': entry.ip_address,
+            'user_agent': entry.user_agent,
+            'current': entry.session_key == current_key,
+        }
+        for entry in entries if entry.session_key in live
+    ]
+
+
+def get_session(user, session_id):
+    """
+    Return user's UserSession with id session_id, or None.
+    """
+    return UserSession.objects.filter(user_id=user.pk, pk=session_id).first()
+
+
+def revoke_session(entry):
+    _revoke([entry.pk], [entry.session_key])
+
+
+def revoke_all(user, except_key=None):
+    """
+    End every session of user except the one with except_key.
+    Return the number of sessions revoked.
+    """
+    entries = UserSession.objects.filter(user_id=user.pk)
+    if except_key is not None:
+        entries = entries.exclude(session_key=except_key)
+    entries = list(entries.values_list('pk', 'session_key'))
+    if entries:
+        _revoke([pk for pk, _ in entries], [key for _, key in entries])
+    return len(entries)
+
+
+def logout_other_sessions(request, user):
+    """
+    Revoke user's other sessions and all of their refresh tokens after a
+    password change. Call after update_session_auth_hash(), which gives the
+    current session a new key.
+    """
+    # Bearer-token requests carry an anonymous session, which is not kept
+    own_session = request.session.get(SESSION_KEY) == str(user.pk)
+    revoked = revoke_all(user, except_key=request.session.session_key if own_session else None)
+    revoke_user_tokens(user)
+    if own_session:
+        register(request, user)
+    return revoked
+
+
+@receiver(user_logged_in)
+def _logged_in(sender, request, user, **kwargs):
+    if request is not None and hasattr(request, 'session'):
+        register(request, user)
+
+
+@receiver(user_logged_out)
+def _logged_out(sender, request, user, **kwargs):
+    session_key = getattr(getattr(request, 'session', None), 'session_key', None)
+    if session_key is not None:
+        UserSession.objects.filter(session_key=session_key).delete()
+
+
+@receiver(pre_delete, sender=Pengguna)
+def _user_deleted(sender, instance, **kwargs):
+    revoke_all(instance)
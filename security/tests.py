@@ -1,3 +1,287 @@
-from django.test import TestCase
+import os
+import random
+import string
+import tempfile
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import password_validation as stock
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from datetime import timedelta
+
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from auth_service import metrics
+from authentication.models import RefreshToken
+from authentication.tokens import issue_tokens
+from user_management.models import Pengguna
+from . import sessions
+from .models import UserSession
+from .passwords import PasswordSet, compile_set, keys_from_file
+from .reaper import LOCK_KEY, SessionReaper
+from .validators import CommonPasswordValidator, UserAttributeSimilarityValidator
+
+
+def rejects(validator, password, user=None):
+    try:
+        validator.validate(password, user)
+    except ValidationError:
+        return True
+    return False
+
+
+class PasswordSetTest(SimpleTestCase):
+    """Test suite for compiled password sets"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as stream:
+            stream.write('\n'.join(lines) + '\n')
+        return path
+
+    def test_plain_list_is_case_insensitive(self):
+        """Test plain lists match regardless of case and surrounding spaces"""
+        path = os.path.join(self.directory, 'set.pwset')
+        count = compile_set(keys_from_file(self.write('list.txt', ['Dragon', 'letmein', 'letmein'])), path)
+        passwords = PasswordSet(path)
+        self.assertEqual((count, len(passwords)), (2, 2))
+        self.assertTrue(passwords.contains('DRAGON '))
+        self.assertTrue(passwords.contains('LetMeIn'))
+        self.assertFalse(passwords.contains('correct horse battery'))
+
+    def test_sha1_list_matches_exact_password(self):
+        """Test SHA-1 lists (Have I Been Pwned format) match the password as typed"""
+        # SHA-1 of 'P@ssw0rd', with a breach count suffix
+        path = self.write('pwned.txt', ['21BD12DC183F740EE76F27B78EB39C8AD972A757:52'])
+        output = os.path.join(self.directory, 'pwned.pwset')
+        call_command('compile_password_list', path, format='sha1', output=output, stdout=StringIO())
+        passwords = PasswordSet(output)
+        self.assertTrue(passwords.exact_case)
+        self.assertTrue(passwords.contains('P@ssw0rd'))
+        self.assertFalse(passwords.contains('p@ssw0rd'))
+
+    def test_default_list_compiled_on_first_use(self):
+        """Test the validator compiles Django's list when PASSWORD_LIST_FILE is missing"""
+        path = os.path.join(self.directory, 'data', 'passwords.pwset')
+        with override_settings(PASSWORD_LIST_FILE=path):
+            validator = CommonPasswordValidator()
+            self.assertTrue(rejects(validator, 'Password123'))
+            self.assertFalse(rejects(validator, 'xq8#Lm2!vR7z'))
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(len(PasswordSet(path)), len(stock.CommonPasswordValidator().passwords))
+
+    def test_unwritable_location_falls_back_to_memory(self):
+        """Test the validator still works when PASSWORD_LIST_FILE cannot be written"""
+        blocker = self.write('not-a-directory', ['x'])
+        with override_settings(PASSWORD_LIST_FILE=os.path.join(blocker, 'passwords.pwset')):
+            validator = CommonPasswordValidator()
+            self.assertTrue(rejects(validator, 'Password123'))
+            self.assertFalse(rejects(validator, 'xq8#Lm2!vR7z'))
+        self.assertIsNone(validator.passwords.path)
+        self.assertEqual(len(validator.passwords), len(stock.CommonPasswordValidator().passwords))
+
+
+class SimilarityValidatorTest(SimpleTestCase):
+    """Test suite for the faster attribute similarity validator"""
+
+    def test_matches_django(self):
+        """Test results agree with Django's validator on similar and unrelated passwords"""
+        rng = random.Random(7)
+        user = Pengguna(username='siti.rahma', first_name='Siti', last_name='Rahmawati', email='siti.rahma@example.com')
+        samples = ['', 'siti', 'Rahmawati1', 'example', 'siti.rahma@example.com']
+        samples += [''.join(rng.choices('sitrahmwexpl.@' + string.digits, k=rng.randint(4, 24))) for _ in range(500)]
+        for max_similarity in (0.5, 0.7, 1.0):
+            ours = UserAttributeSimilarityValidator(max_similarity=max_similarity)
+            django = stock.UserAttributeSimilarityValidator(max_similarity=max_similarity)
+            for password in samples:
+                self.assertEqual(rejects(ours, password, user), rejects(django, password, user), password)
+
+
+class SessionRegistryTest(TestCase):
+    """Test suite for the per-user session registry"""
+
+    def setUp(self):
+        self.user = Pengguna.objects.create_user(username='alice', password='TestPass123!', role='student')
+        self.other = Pengguna.objects.create_user(username='bob', password='TestPass123!', role='student')
+
+    def logged_in(self, user=None):
+        client = Client()
+        client.force_login(user or self.user)
+        return client
+
+    def test_login_and_logout_maintain_registry(self):
+        """Test logging in registers the session and logging out drops it"""
+        client = self.logged_in()
+        entry = UserSession.objects.get(user=self.user)
+        self.assertEqual(entry.session_key, client.session.session_key)
+        client.logout()
+        self.assertFalse(UserSession.objects.filter(user=self.user).exists())
+
+    def test_list_marks_current_session_without_keys(self):
+        """Test listing returns the user's live sessions, flags the current one and hides session keys"""
+        client = self.logged_in()
+        self.logged_in()
+        self.logged_in(self.other)
+        with self.assertNumQueries(3):
+            # The user, the registry rows and their django_session rows
+            response = client.get(reverse('security:sessions'))
+        listed = response.json()['sessions']
+        self.assertEqual(len(listed), 2)
+        self.assertEqual([entry['current'] for entry in listed].count(True), 1)
+        self.assertNotIn(client.session.session_key, response.content.decode())
+
+    def test_list_prunes_ended_sessions(self):
+        """Test rows whose session is gone are dropped when listing"""
+        client = self.logged_in()
+        gone = self.logged_in()
+        Session.objects.filter(session_key=gone.session.session_key).delete()
+        response = client.get(reverse('security:sessions'))
+        self.assertEqual(len(response.json()['sessions']), 1)
+        self.assertEqual(UserSession.objects.filter(user=self.user).count(), 1)
+
+    def test_revoke_one_session(self):
+        """Test revoking a session ends it; other users' sessions cannot be revoked"""
+        client = self.logged_in()
+        victim = self.logged_in()
+        bob = self.logged_in(self.other)
+        entry = UserSession.objects.get(session_key=victim.session.session_key)
+        bobs = UserSession.objects.get(user=self.other)
+
+        self.assertEqual(client.delete(reverse('security:revoke_session', args=[bobs.pk])).status_code, 404)
+        self.assertEqual(client.delete(reverse('security:revoke_session', args=[entry.pk])).status_code, 200)
+        self.assertFalse(Session.objects.filter(session_key=entry.session_key).exists())
+        self.assertTrue(Session.objects.filter(session_key=bob.session.session_key).exists())
+        self.assertEqual(client.get(reverse('security:sessions')).status_code, 200)
+
+    def test_revoke_all_keeps_current_session(self):
+        """Test log out everywhere ends every other session and revokes refresh tokens"""
+        client = self.logged_in()
+        others = [self.logged_in() for _ in range(3)]
+        issue_tokens(self.user)
+        response = client.post(reverse('security:revoke_all_sessions'))
+        self.assertEqual(response.json()['revoked'], 3)
+        for other in others:
+            self.assertFalse(Session.objects.filter(session_key=other.session.session_key).exists())
+        self.assertFalse(RefreshToken.objects.filter(user=self.user, revoked=False).exists())
+        self.assertEqual(UserSession.objects.get(user=self.user).session_key, client.session.session_key)
+
+    @override_settings(SECURITY_MAX_SESSIONS_PER_USER=2)
+    def test_oldest_sessions_revoked_past_limit(self):
+        """Test logging in past the per-user limit revokes the oldest session"""
+        first = self.logged_in()
+        self.logged_in()
+        self.logged_in()
+        self.assertEqual(UserSession.objects.filter(user=self.user).count(), 2)
+        self.assertFalse(Session.objects.filter(session_key=first.session.session_key).exists())
+
+    def test_password_change_logs_out_other_sessions(self):
+        """Test changing the password keeps the current session and ends the others"""
+        client = self.logged_in()
+        other = self.logged_in()
+        response = client.post(reverse('user_management:change_password'), {
+            'old_password': 'TestPass123!', 'new_password1': 'N3w-Secret-Pass!', 'new_password2': 'N3w-Secret-Pass!',
+        }, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Session.objects.filter(session_key=other.session.session_key).exists())
+        entry = UserSession.objects.get(user=self.user)
+        self.assertEqual(entry.session_key, client.session.session_key)
+        self.assertEqual(client.get(reverse('security:sessions')).status_code, 200)
+
+    def test_password_change_revokes_refresh_tokens(self):
+        """Test a bearer-token password change saves the password and ends every session and refresh token"""
+        other = self.logged_in()
+        tokens = issue_tokens(self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        response = client.post(reverse('user_management:change_password'), {
+            'old_password': 'TestPass123!', 'new_password1': 'N3w-Secret-Pass!', 'new_password2': 'N3w-Secret-Pass!',
+        }, format='json', HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('N3w-Secret-Pass!'))
+        self.assertFalse(Session.objects.filter(session_key=other.session.session_key).exists())
+        self.assertFalse(RefreshToken.objects.filter(user=self.user, revoked=False).exists())
+        self.assertFalse(UserSession.objects.filter(user=self.user).exists())
+
+    def test_repeat_login_on_same_session(self):
+        """Test logging in again on an unchanged session key keeps one registry row"""
+        client = self.logged_in()
+        request = RequestFactory().get('/')
+        request.session = client.session
+        sessions.register(request, self.user)
+        self.assertEqual(UserSession.objects.filter(user=self.user).count(), 1)
+        self.assertIsNotNone(UserSession.objects.get(user=self.user).created_at)
+
+    def test_deleting_user_revokes_sessions(self):
+        """Test deleting a user ends their sessions and drops their registry rows"""
+        client = self.logged_in()
+        self.logged_in(self.other)
+        key = client.session.session_key
+        self.user.delete()
+        self.assertFalse(Session.objects.filter(session_key=key).exists())
+        self.assertFalse(UserSession.objects.filter(session_key=key).exists())
+        self.assertEqual(sessions.revoke_all(self.other), 1)
+
+
+class SessionReaperTest(TestCase):
+    """Test suite for batched expired session cleanup"""
+
+    def setUp(self):
+        cache.delete(LOCK_KEY)
+        metrics.registry.reset()
+        self.user = Pengguna.objects.create_user(username='alice', password='TestPass123!', role='student')
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f'expired{i:02d}', session_data='', expire_date=now - timedelta(minutes=i + 1))
+             for i in range(7)]
+            + [Session(session_key=f'live{i:02d}', session_data='', expire_date=now + timedelta(minutes=i + 1))
+               for i in range(3)]
+        )
+        UserSession.objects.bulk_create([
+            UserSession(session_key='expired00', user=self.user),
+            UserSession(session_key='live00', user=self.user),
+        ])
+
+    def test_deletes_expired_sessions_in_batches(self):
+        """Test only expired sessions and their registry rows are deleted, a batch per statement"""
+        reaper = SessionReaper(batch_size=3, pause=0)
+        summary = reaper.run()
+        self.assertEqual((summary['deleted'], summary['batches'], summary['finished']), (7, 3, True))
+        self.assertEqual(sorted(Session.objects.values_list('session_key', flat=True)), ['live00', 'live01', 'live02'])
+        self.assertEqual(list(UserSession.objects.values_list('session_key', flat=True)), ['live00'])
+        self.assertIsNone(cache.get(LOCK_KEY))
+
+        text = metrics.render({}, metrics.registry.counters())
+        self.assertIn('auth_session_reaper_deleted_total 7', text)
+        self.assertIn('auth_session_reaper_batches_total 3', text)
+
+    def test_time_budget_stops_run(self):
+        """Test a run stops after its time budget and the next run carries on"""
+        summary = SessionReaper(batch_size=2, pause=0.05, time_budget=0.01).run()
+        self.assertEqual((summary['deleted'], summary['finished']), (2, False))
+        self.assertEqual(metrics.registry.counters()['auth_session_reaper_budget_exhausted_total'], 1)
+        self.assertEqual(SessionReaper(batch_size=10, pause=0).run()['deleted'], 5)
+
+    def test_locked_run_is_skipped(self):
+        """Test a run is skipped while another process holds the lock"""
+        cache.add(LOCK_KEY, 0, timeout=60)
+        self.addCleanup(cache.delete, LOCK_KEY)
+        self.assertIsNone(SessionReaper(pause=0).run())
+        self.assertEqual(Session.objects.count(), 10)
+
+    def test_command_reports_progress(self):
+        """Test reap_sessions deletes expired sessions and reports each batch"""
+        out = StringIO()
+        call_command('reap_sessions', '--batch-size', '4', '--pause', '0', verbosity=2, stdout=out)
+        self.assertIn('Deleted 4 expired sessions in 1 batches', out.getvalue())
+        self.assertIn('Deleted 7 expired sessions in 2 batches,', out.getvalue())
+        self.assertEqual(Session.objects.count(), 3)
@@ -0,0 +1,10 @@
+from django.urls import path
+from . import views
+
+app_name = 'security'
+
+urlpatterns = [
+    path('sessions/', views.SessionListView.as_view(), name='sessions'),
+    path('sessions/revoke-all/', views.SessionRevokeAllView.as_view(), name='revoke_all_sessions'),
+    path('sessions/<int:session_id>/', views.SessionRevokeView.as_view(), name='revoke_session'),
+]
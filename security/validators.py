@@ -0,0 +1,96 @@
+"""
+Drop-in replacements for Django's common-password and similarity validators.
+
+CommonPasswordValidator looks passwords up in a compiled, memory-mapped
+set (see security.passwords) instead of building a Python set from the
+gzipped list in every worker. Without a compiled file at
+PASSWORD_LIST_FILE, Django's own list is compiled there on first use.
+
+UserAttributeSimilarityValidator gives the same results as Django's, which
+compares character counts with SequenceMatcher.quick_ratio(). It counts the
+password's characters once instead of building a SequenceMatcher per
+attribute part, and skips parts whose length alone rules out a match.
+"""
+import re
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import password_validation
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.utils.functional import cached_property
+
+from .passwords import get_set
+
+DJANGO_PASSWORD_LIST = Path(password_validation.__file__).resolve().parent / 'common-passwords.txt.gz'
+
+
+class CommonPasswordValidator(password_validation.CommonPasswordValidator):
+    """
+    Reject passwords found in the compiled set at password_list_path.
+    """
+    def __init__(self, password_list_path=None):
+        self.password_list_path = password_list_path or settings.PASSWORD_LIST_FILE
+
+    @cached_property
+    def passwords(self):
+        build_from = DJANGO_PASSWORD_LIST if self.password_list_path == settings.PASSWORD_LIST_FILE else None
+        return get_set(self.password_list_path, build_from=build_from)
+
+    def validate(self, password, user=None):
+        if self.passwords.contains(password):
+            raise ValidationError(self.get_error_message(), code='password_too_common')
+
+
+WORD_SEPARATORS = re.compile(r'\W+')
+
+
+def similarity(counts, length, value):
+    """
+    SequenceMatcher(a=password, b=value).quick_ratio(), where counts are the
+    (character, count) pairs of the password.
+    """
+    total = length + len(value)
+    if not total:
+        return 1.0
+    matches = 0
+    for char, count in counts:
+        found = value.count(char)
+        matches += count if count < found else found
+    return 2.0 * matches / total
+
+
+class UserAttributeSimilarityValidator(password_validation.UserAttributeSimilarityValidator):
+    """
+    Django's similarity check with the password's character counts shared
+    across all attribute parts.
+    """
+    def validate(self, password, user=None):
+        if not user:
+            return
+
+        password = password.lower()
+        length = len(password)
+        counts = None
+        for attribute_name in self.user_attributes:
+            value = getattr(user, attribute_name, None)
+            if not value or not isinstance(value, str):
+                continue
+            value_lower = value.lower()
+            for value_part in WORD_SEPARATORS.split(value_lower) + [value_lower]:
+                # Upper bound of the ratio (SequenceMatcher.real_quick_ratio())
+                shortest = min(length, len(value_part))
+                if length + len(value_part) and 2.0 * shortest / (length + len(value_part)) < self.max_similarity:
+                    continue
+                if counts is None:
+                    counts = tuple(Counter(password).items())
+                if similarity(counts, length, value_part) >= self.max_similarity:
+                    try:
+                        verbose_name = str(user._meta.get_field(attribute_name).verbose_name)
+                    except FieldDoesNotExist:
+                        verbose_name = attribute_name
+                    raise ValidationError(
+                        self.get_error_message(),
+                        code='password_too_similar',
+                        params={'verbose_name': verbose_name},
+                    )
@@ -1,3 +1,57 @@
-from django.shortcuts import render
+from django.contrib.auth import logout
+from django.http import JsonResponse
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
 
-# Create your views here.
+from authentication.tokens import revoke_user_tokens
+from . import sessions
+
+
+def _session_key(request):
+    session = getattr(request, 'session', None)
+    return session.session_key if session is not None else None
+
+
+class SessionListView(APIView):
+    """
+    The current user's active sessions, newest first.
+    Sessions are identified by id; session keys are never returned.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return JsonResponse({
+            'status': 'success',
+            'sessions': sessions.list_sessions(request.user, _session_key(request)),
+        })
+
+
+class SessionRevokeView(APIView):
+    """
+    End one of the current user's sessions. Revoking the current session
+    logs the user out.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def delete(self, request, session_id):
+        entry = sessions.get_session(request.user, session_id)
+        if entry is None:
+            return JsonResponse({'status': 'error', 'message': 'Session not found'}, status=404)
+        if entry.session_key == _session_key(request):
+            logout(request)
+        else:
+            sessions.revoke_session(entry)
+        return JsonResponse({'status': 'success', 'message': 'Session revoked'})
+
+
+class SessionRevokeAllView(APIView):
+    """
+    Log the current user out everywhere else: every other session and all
+    refresh tokens are revoked.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        revoked = sessions.revoke_all(request.user, except_key=_session_key(request))
+        revoke_user_tokens(request.user)
+        return JsonResponse({'status': 'success', 'message': 'Logged out of other sessions', 'revoked': revoked})
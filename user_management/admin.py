@@ -1,3 +1,96 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.forms import UserChangeForm, UserCreationForm
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
 
-# Register your models here.
+from .directory import search
+from .exporter import UserExporter
+from .models import Pengguna, Admin, Instruktur
+from .views import export_response
+
+
+class PenggunaCreationForm(UserCreationForm):
+    class Meta(UserCreationForm.Meta):
+        model = Pengguna
+
+
+class PenggunaChangeForm(UserChangeForm):
+    class Meta(UserChangeForm.Meta):
+        model = Pengguna
+
+
+class CappedCountPaginator(Paginator):
+    """
+    Counts at most count_limit rows, so the changelist never runs a full
+    COUNT(*) over the user table. Pages past the limit are browsed through
+    the directory API (see user_management.directory).
+    """
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        return self.object_list[:self.count_limit].count()
+
+
+@admin.register(Pengguna)
+class PenggunaAdmin(UserAdmin):
+    form = PenggunaChangeForm
+    add_form = PenggunaCreationForm
+    list_display = ('username', 'email', 'first_name', 'last_name', 'role', 'role_keahlian', 'is_active', 'date_joined')
+    list_filter = ('role', 'is_active', 'is_staff', 'date_joined')
+    # The role columns come from the same query as the users
+    list_select_related = ('instruktur', 'admin')
+    # Served by the (role, id) index, like the directory
+    ordering = ('role', 'id')
+    search_fields = ('username', 'first_name', 'last_name', 'email')
+    search_help_text = 'Usernames, names and emails starting with each word'
+    paginator = CappedCountPaginator
+    show_full_result_count = False
+    readonly_fields = ('user_id',)
+    fieldsets = UserAdmin.fieldsets + (('Role', {'fields': ('role', 'user_id')}),)
+    actions = ['export_csv', 'export_jsonl']
+
+    @admin.display(description='Keahlian')
+    def role_keahlian(self, obj):
+        return getattr(obj.as_role(), 'keahlian', None)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Prefix search over the LOWER() indexes instead of icontains scans
+        return search(queryset, search_term), False
+
+    def _export(self, queryset, fmt):
+        # Export through Pengguna so the role columns join the same way for every admin
+        users = Pengguna.objects.filter(pk__in=queryset.values('pk'))
+        return export_response(UserExporter(fmt, queryset=users), 'users')
+
+    @admin.action(description='Export selected users as CSV')
+    def export_csv(self, request, queryset):
+        return self._export(queryset, 'csv')
+
+    @admin.action(description='Export selected users as JSONL')
+    def export_jsonl(self, request, queryset):
+        return self._export(queryset, 'jsonl')
+
+
+@admin.register(Instruktur)
+class InstrukturAdmin(PenggunaAdmin):
+    list_display = ('username', 'email', 'first_name', 'last_name', 'keahlian', 'is_active')
+    list_filter = ('is_active', 'date_joined')
+    list_select_related = False
+    ordering = ('id',)
+    readonly_fields = ('user_id', 'instruktur_id')
+    fieldsets = UserAdmin.fieldsets + (('Instructor', {'fields': ('keahlian', 'user_id', 'instruktur_id')}),)
+    add_fieldsets = (
+        (None, {'classes': ('wide',), 'fields': ('username', 'password1', 'password2', 'keahlian')}),
+    )
+
+
+@admin.register(Admin)
+class AdminAdmin(PenggunaAdmin):
+    list_display = ('username', 'email', 'first_name', 'last_name', 'is_active')
+    list_filter = ('is_active', 'date_joined')
+    list_select_related = False
+    ordering = ('id',)
+    readonly_fields = ('user_id', 'admin_id')
+    fieldsets = UserAdmin.fieldsets + (('Admin', {'fields': ('user_id', 'admin_id')}),)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UserManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user_management'
+
+    def ready(self):
+        # Connect the user cache, lookup cache and role permission invalidation signals
+        from . import cache, lookup, roles  # noqa: F401
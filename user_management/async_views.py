@@ -0,0 +1,137 @@
+"""
+Native async profile views for the ASGI deployment.
+See authentication.async_views for the shared base view.
+"""
+from django.contrib import messages
+from django.contrib.auth import aupdate_session_auth_hash
+from django.shortcuts import render, redirect
+from asgiref.sync import sync_to_async
+
+from auth_service.negotiation import json_response, negotiated, wants_json
+from authentication.async_views import AsyncAPIView
+from authentication.throttling import PasswordChangeThrottle
+from security.sessions import logout_other_sessions
+from .forms import PasswordChangeForm
+from . import profiles
+from .profiles import get_profile_data
+
+
+@negotiated
+class UserProfileView(AsyncAPIView):
+    login_required = True
+
+    async def get(self, request):
+        """
+        - Retrieve user profile details
+        - Include user metadata
+        - Handle privacy settings
+        """
+        as_json = wants_json(request)
+        etag, response = profiles.conditional_get(request, as_json)
+        if response is not None:
+            return response
+
+        data = get_profile_data(request.user)
+        if as_json:
+            response = json_response(profiles.PROFILE_ENCODER.encode(data))
+        else:
+            response = render(request, 'user_management/profile.html', {'user': data})
+        response['ETag'] = etag
+        return response
+
+    async def post(self, request):
+        """
+        - Validate profile update data
+        - Apply profile changes
+        - Honour If-Match with an optimistic conditional update
+        """
+        user = request.user
+
+        try:
+            # The conditional updates run in one transaction, which needs a sync thread
+            user = await sync_to_async(profiles.update_profile)(
+                user, request.data, profiles.if_match_version(request, user)
+            )
+
+        except profiles.ProfileConflict:
+            if wants_json(request):
+                return json_response(profiles.PROFILE_CONFLICT, status=412)
+            messages.error(request, profiles.PROFILE_CONFLICT_MESSAGE)
+            return redirect('user_management:profile')
+
+        except profiles.UsernameTaken:
+            if wants_json(request):
+                return json_response(profiles.USERNAME_TAKEN, status=400)
+            messages.error(request, 'Username already taken')
+            return redirect('user_management:profile')
+
+        except profiles.EmailTaken:
+            if wants_json(request):
+                return json_response(profiles.EMAIL_TAKEN, status=400)
+            messages.error(request, 'Email already taken')
+            return redirect('user_management:profile')
+
+        except Exception as e:
+            if wants_json(request):
+                return json_response(profiles.result_payload(False, f'Error updating profile: {str(e)}'), status=400)
+            messages.error(request, f'Error updating profile: {str(e)}')
+            return redirect('user_management:profile')
+
+        if wants_json(request):
+            response = json_response(profiles.PROFILE_UPDATED)
+            response['ETag'] = profiles.profile_etag(user, 'json')
+            return response
+        messages.success(request, 'Profile updated successfully')
+        return redirect('user_management:profile')
+
+    async def delete(self, request):
+        """
+        - Delete the user account
+        - Return success/failure response
+        """
+        try:
+            await request.user.adelete()
+
+            if wants_json(request):
+                return json_response(profiles.ACCOUNT_DELETED)
+            messages.success(request, 'Your account has been deleted successfully')
+            return redirect('authentication:login')
+
+        except Exception as e:
+            if wants_json(request):
+                return json_response(profiles.result_payload(False, f'Error deleting account: {str(e)}'), status=400)
+            messages.error(request, f'Error deleting account: {str(e)}')
+            return redirect('user_management:profile')
+
+
+@negotiated
+class ChangePasswordView(AsyncAPIView):
+    login_required = True
+    throttle_classes = [PasswordChangeThrottle]
+
+    async def post(self, request):
+        """
+        Change user password
+        """
+        user = request.user
+        form = PasswordChangeForm(user=user, data=request.data)
+        if await form.ais_valid():
+            user = await form.asave()
+            await aupdate_session_auth_hash(request, user)
+            await sync_to_async(logout_other_sessions)(request, user)
+
+            if wants_json(request):
+                return json_response(profiles.PASSWORD_UPDATED)
+            messages.success(request, 'Your password was successfully updated!')
+            return redirect('user_management:profile')
+
+        if wants_json(request):
+            return json_response(profiles.result_payload(
+                False, 'Password change failed. Please correct the errors below.', form.errors
+            ), status=400)
+        messages.error(request, 'Password change failed. Please correct the errors below.')
+        return render(request, 'user_management/profile.html', {
+            'user': get_profile_data(user),
+            'password_form': form,
+            'active_tab': 'security'
+        })
@@ -0,0 +1,83 @@
+from django.contrib.auth.backends import ModelBackend
+from authentication import hashing
+from .cache import aget_cached_user, get_cached_user
+from .models import Pengguna
+from .roles import role_permissions
+
+
+class RoleModelBackend(ModelBackend):
+    """
+    ModelBackend that loads request.user as its role subclass.
+    AuthenticationMiddleware resolves the Admin/Instruktur columns in the
+    same joined query, so views can read role fields straight off request.user,
+    and repeat lookups are served from the per-process user cache.
+    Users log in with their username or email, in any case; both are
+    looked up through their case-insensitive indexes. Usernames may not
+    contain '@', but when an older one equals another user's email the
+    password is checked against both accounts.
+    Password checks run on the hashing pool instead of the request worker.
+    Permissions come from the user's role (see user_management.roles) and
+    cost no queries.
+    """
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(Pengguna.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            users = Pengguna._default_manager.get_by_login(username)
+        except Pengguna.DoesNotExist:
+            # Run the hasher once to reduce the timing difference
+            # between an existing and a nonexistent user.
+            hashing.make_password(password)
+            return None
+        for user in users:
+            if hashing.check_password(user, password) and self.user_can_authenticate(user):
+                return user
+        return None
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(Pengguna.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            users = await Pengguna._default_manager.aget_by_login(username)
+        except Pengguna.DoesNotExist:
+            await hashing.amake_password(password)
+            return None
+        for user in users:
+            if await hashing.acheck_password(user, password) and self.user_can_authenticate(user):
+                return user
+        return None
+
+    def get_user_permissions(self, user_obj, obj=None):
+        return set()
+
+    def get_group_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        return set(role_permissions.permissions(user_obj.role))
+
+    def get_all_permissions(self, user_obj, obj=None):
+        return self.get_group_permissions(user_obj, obj)
+
+    def has_perm(self, user_obj, perm, obj=None):
+        return user_obj.is_active and obj is None and role_permissions.has_perm(user_obj.role, perm)
+
+    def has_module_perms(self, user_obj, app_label):
+        return user_obj.is_active and role_permissions.has_module_perms(user_obj.role, app_label)
+
+    def get_user(self, user_id):
+        try:
+            user = get_cached_user(user_id)
+        except Pengguna.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        try:
+            user = await aget_cached_user(user_id)
+        except Pengguna.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
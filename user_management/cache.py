@@ -0,0 +1,159 @@
+"""
+Per-process cache of authenticated users.
+
+RoleModelBackend.get_user() serves request.user from here, so steady-state
+authenticated requests issue no user queries. Entries hold the resolved
+role subclass instance and are dropped on any save or delete of Pengguna,
+Instruktur or Admin, which includes password hash changes.
+
+Other workers learn about changes through the invalidation channel
+(USER_CACHE_INVALIDATION = 'cache', the default), which keeps a per-user
+version in CACHES[USER_CACHE_ALIAS]. That cache must be shared by every
+worker serving the same users. With USER_CACHE_INVALIDATION = 'local'
+other workers only catch up within USER_CACHE_TIMEOUT.
+"""
+import copy
+import random
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from auth_service.lru import LRUCache
+from .models import Pengguna, Admin, Instruktur
+
+
+class LocalChannel:
+    """
+    No cross-worker invalidation; every entry has version 0.
+    """
+    def version(self, pk):
+        return 0
+
+    def publish(self, pk):
+        pass
+
+
+class CacheChannel:
+    """
+    Per-user versions kept in a shared Django cache.
+    Every worker compares the version stored with its entry against the
+    current one, so a publish from any worker invalidates all of them.
+    Missing versions start at a random number, so a version the cache
+    evicted never matches the entries cached under it again.
+    """
+    key_prefix = 'user-cache-version:'
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @staticmethod
+    def _initial():
+        return random.getrandbits(48)
+
+    def version(self, pk):
+        key = f'{self.key_prefix}{pk}'
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, self._initial(), timeout=None)
+            version = self.cache.get(key)
+        return version
+
+    def publish(self, pk):
+        key = f'{self.key_prefix}{pk}'
+        if not self.cache.add(key, self._initial(), timeout=None):
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, self._initial(), timeout=None)
+
+
+class UserCache:
+    """
+    LRU+TTL map of user pk -> (channel version, role subclass instance).
+    """
+    def __init__(self, max_entries, timeout, channel):
+        self.entries = LRUCache(max_entries, timeout)
+        self.channel = channel
+
+    def get(self, pk):
+        entry = self.entries.get(pk)
+        if entry is None:
+            return None
+        version, user = entry
+        if version != self.channel.version(pk):
+            self.entries.delete(pk)
+            return None
+        # Callers may mutate request.user, so never hand out the shared instance.
+        return copy.copy(user)
+
+    def set(self, pk, user):
+        self.entries.set(pk, (self.channel.version(pk), copy.copy(user)))
+
+    def invalidate(self, pk):
+        self.entries.delete(pk)
+        self.channel.publish(pk)
+
+    def clear(self):
+        self.entries.clear()
+
+
+def _build_channel():
+    if getattr(settings, 'USER_CACHE_INVALIDATION', 'cache') == 'local':
+        return LocalChannel()
+    return CacheChannel(getattr(settings, 'USER_CACHE_ALIAS', 'default'))
+
+
+user_cache = UserCache(
+    max_entries=getattr(settings, 'USER_CACHE_SIZE', 10000),
+    timeout=getattr(settings, 'USER_CACHE_TIMEOUT', 60),
+    channel=_build_channel(),
+)
+
+
+def get_cached_user(pk):
+    """
+    Return the role subclass instance for pk, loading it on a cache miss.
+    """
+    user = user_cache.get(pk)
+    if user is None:
+        user = Pengguna.objects.locate(pk=pk).select_subclasses().get(pk=pk)
+        user_cache.set(pk, user)
+    return user
+
+
+async def aget_cached_user(pk):
+    """See get_cached_user()."""
+    user = user_cache.get(pk)
+    if user is None:
+        users = await Pengguna.objects.alocate(pk=pk)
+        user = await users.select_subclasses().aget(pk=pk)
+        user_cache.set(pk, user)
+    return user
+
+
+@receiver(post_save, sender=Pengguna)
+@receiver(post_save, sender=Admin)
+@receiver(post_save, sender=Instruktur)
+@receiver(post_delete, sender=Pengguna)
+@receiver(post_delete, sender=Admin)
+@receiver(post_delete, sender=Instruktur)
+def invalidate_cached_user(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+def invalidate_user(pk):
+    """
+    Drop pk from every worker's cache.
+    Call this after queryset.update(), which sends no signals.
+    """
+    user_cache.invalidate(pk)
+    # A concurrent request may re-cache the old row before this transaction
+    # commits, so drop the entry again once the change is visible.
+    transaction.on_commit(lambda: user_cache.invalidate(pk))
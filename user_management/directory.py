@@ -0,0 +1,172 @@
+"""
+User directory for admins and instructors: keyset pagination and prefix search.
+
+Pages are ordered by (role, id) and continue after the last row of the
+previous page, which the opaque cursor encodes, instead of an OFFSET:
+
+    WHERE role = :role AND id > :id ORDER BY id LIMIT n
+    then, if the role runs out, WHERE role > :role ORDER BY role, id LIMIT n - found
+
+Both are range scans on the (role, id) index, so page 10,000 costs the same
+as page 1. With sharding every shard is asked for a page and the pages are
+merged.
+
+Search terms match the start of the username, first name, last name or
+email, case-insensitively; every term must match one of them. Each term
+is a range over the LOWER() index of each column:
+
+    LOWER(col) >= :term AND LOWER(col) < :term || U+10FFFF
+
+On PostgreSQL, migration 0006 adds pg_trgm GIN indexes over the same
+expressions and terms are matched with LIKE 'term%', which those indexes
+serve under any collation.
+"""
+import base64
+import binascii
+import heapq
+import json
+from datetime import datetime, time
+
+from django.db import connections, router
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from auth_service.negotiation import ObjectEncoder
+from . import sharding
+from .models import Pengguna
+
+SEARCH_FIELDS = ('username', 'first_name', 'last_name', 'email')
+PREFIX_END = '\U0010ffff'
+
+DIRECTORY_ENCODER = ObjectEncoder(
+    'id', 'user_id', 'username', 'email', 'first_name', 'last_name', 'role', 'is_active',
+    'date_joined', 'instruktur_id', 'keahlian', 'admin_id',
+)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(user):
+    return base64.urlsafe_b64encode(json.dumps([user.role, user.pk]).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Return (role, id) from a cursor made by encode_cursor().
+    """
+    try:
+        role, pk = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(role, str) or not isinstance(pk, int):
+        raise InvalidCursor('Invalid cursor')
+    return role, pk
+
+
+def parse_joined(value):
+    """
+    Parse a date_joined bound given as an ISO date or datetime.
+    """
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            moment = None if day is None else datetime.combine(day, time.min)
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise ValueError(f'Invalid date: {value}')
+    return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+
+def _prefix(field, term, vendor):
+    if vendor == 'postgresql':
+        match = Q(**{f'{field}_lower__startswith': term})
+    else:
+        match = Q(**{f'{field}_lower__gte': term, f'{field}_lower__lt': term + PREFIX_END})
+    # The email index leaves out empty emails; repeat its condition so it is used
+    return match & ~Q(email='') if field == 'email' else match
+
+
+def search(queryset, text):
+    """
+    Filter queryset to users matching every whitespace-separated term in text.
+    """
+    terms = text.lower().split()
+    if not terms:
+        return queryset
+    vendor = connections[queryset.db].vendor
+    queryset = queryset.alias(**{f'{field}_lower': Lower(field) for field in SEARCH_FIELDS})
+    for term in terms:
+        matches = Q()
+        for field in SEARCH_FIELDS:
+            matches |= _prefix(field, term, vendor)
+        queryset = queryset.filter(matches)
+    return queryset
+
+
+def filter_users(queryset, role=None, joined_after=None, joined_before=None, q=None):
+    if role:
+        queryset = queryset.filter(role=role)
+    if joined_after:
+        queryset = queryset.filter(date_joined__gte=joined_after)
+    if joined_before:
+        queryset = queryset.filter(date_joined__lt=joined_before)
+    if q:
+        queryset = search(queryset, q)
+    return queryset
+
+
+def _page(queryset, after, size):
+    """
+    Up to size users of queryset after the (role, id) key, in (role, id) order.
+    """
+    queryset = queryset.select_subclasses()
+    if after is None:
+        return list(queryset.order_by('role', 'pk')[:size])
+    role, pk = after
+    users = list(queryset.filter(role=role, pk__gt=pk).order_by('pk')[:size])
+    if len(users) < size:
+        users += queryset.filter(role__gt=role).order_by('role', 'pk')[:size - len(users)]
+    return users
+
+
+def directory_page(cursor=None, size=50, **filters):
+    """
+    Return (users, next cursor or None) for one page of the directory.
+    Users are role subclass instances with their role columns loaded.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    shards = sharding.shard_aliases()
+    databases = shards or [router.db_for_read(Pengguna)]
+    # One extra row tells whether there is a next page
+    pages = [_page(filter_users(Pengguna.objects.using(db), **filters), after, size + 1) for db in databases]
+    users = pages[0] if len(pages) == 1 else list(heapq.merge(*pages, key=lambda user: (user.role, user.pk)))
+    users = users[:size + 1]
+    if len(users) > size:
+        return users[:size], encode_cursor(users[size - 1])
+    return users, None
+
+
+def directory_entry(user):
+    data = {
+        'id': user.pk,
+        'user_id': str(user.user_id),
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'role': user.role,
+        'is_active': user.is_active,
+        'date_joined': user.date_joined.isoformat(),
+    }
+    if hasattr(user, 'instruktur_id'):
+        data['instruktur_id'] = str(user.instruktur_id)
+        data['keahlian'] = user.keahlian
+    if hasattr(user, 'admin_id'):
+        data['admin_id'] = str(user.admin_id)
+    return DIRECTORY_ENCODER.encode(data)
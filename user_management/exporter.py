@@ -0,0 +1,146 @@
+"""
+Streaming user export to CSV or JSONL.
+
+Users are read in keyset batches over the primary key (WHERE id > last
+ORDER BY id LIMIT n), each batch through QuerySet.iterator() so backends
+with server-side cursors fetch it in chunks. Memory stays bounded by one
+batch whatever the number of users, and no batch gets slower as the
+export goes on, unlike OFFSET paging. Rows come back as tuples with the
+Instruktur and Admin columns joined in, so no model instances are built.
+
+With sharding, each shard is read the same way and the streams are
+merged by id.
+"""
+import csv
+import heapq
+import json
+import time
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from . import sharding
+from .models import Pengguna
+
+# Export column -> Pengguna lookup. Role columns are empty for other roles.
+EXPORT_COLUMNS = {
+    'id': 'id',
+    'user_id': 'user_id',
+    'username': 'username',
+    'email': 'email',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'role': 'role',
+    'is_active': 'is_active',
+    'is_staff': 'is_staff',
+    'date_joined': 'date_joined',
+    'last_login': 'last_login',
+    'instruktur_id': 'instruktur__instruktur_id',
+    'keahlian': 'instruktur__keahlian',
+    'admin_id': 'admin__admin_id',
+}
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+# Spreadsheets evaluate CSV cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _Echo:
+    """
+    File-like object that hands back what csv.writer writes to it.
+    """
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # Names and emails are user input; keep them text, not formulas
+        return "'" + value
+    return value
+
+
+class UserExporter:
+    """
+    Streams users as text chunks of one batch each and counts them.
+    """
+    def __init__(self, fmt='csv', batch_size=2000, queryset=None):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        if batch_size < 1:
+            raise ValueError('The batch size must be at least 1.')
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.queryset = queryset
+        self.exported = 0
+        self.started_at = None
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            'exported': self.exported,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(self.exported / elapsed, 1) if elapsed else 0.0,
+        }
+
+    def _batches(self, queryset):
+        """
+        Yield lists of value tuples in id order, batch_size rows at a time.
+        """
+        queryset = queryset.order_by('pk').values_list(*EXPORT_COLUMNS.values())
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:self.batch_size].iterator(chunk_size=self.batch_size))
+            if not batch:
+                return
+            yield batch
+            if len(batch) < self.batch_size:
+                return
+            last_pk = batch[-1][0]
+
+    def batches(self):
+        if self.queryset is not None:
+            return self._batches(self.queryset)
+        shards = sharding.shard_aliases()
+        if not shards:
+            return self._batches(Pengguna.objects.all())
+        # Merge the shards' id-ordered rows back into batches
+        rows = heapq.merge(
+            *((row for batch in self._batches(Pengguna.objects.using(shard)) for row in batch) for shard in shards),
+            key=lambda row: row[0],
+        )
+        return self._regroup(rows)
+
+    def _regroup(self, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def chunks(self):
+        """
+        Yield the export as text, the header first and then one chunk per batch.
+        """
+        self.started_at = time.monotonic()
+        names = list(EXPORT_COLUMNS)
+        if self.fmt == 'csv':
+            writer = csv.writer(_Echo())
+            yield writer.writerow(names)
+        for batch in self.batches():
+            if self.fmt == 'csv':
+                chunk = ''.join(writer.writerow([_csv_value(value) for value in row]) for row in batch)
+            else:
+                chunk = ''.join(
+                    json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + '\n' for row in batch
+                )
+            self.exported += len(batch)
+            yield chunk
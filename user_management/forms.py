@@ -0,0 +1,43 @@
+from django.contrib.auth import forms as auth_forms
+from django.core.exceptions import ValidationError
+from authentication import hashing
+
+
+class PasswordChangeForm(auth_forms.PasswordChangeForm):
+    """
+    PasswordChangeForm that verifies and hashes on the hashing pool
+    """
+    # Set by ais_valid(), which checks the old password before validation runs
+    old_password_valid = None
+
+    async def ais_valid(self):
+        """
+        Async is_valid(): the old password is verified on the hashing pool
+        without holding a thread; the remaining validation is CPU only.
+        """
+        old_password = self.data.get('old_password')
+        self.old_password_valid = bool(old_password) and await hashing.acheck_password(self.user, old_password)
+        return self.is_valid()
+
+    def clean_old_password(self):
+        old_password = self.cleaned_data['old_password']
+        valid = self.old_password_valid
+        if valid is None:
+            valid = hashing.check_password(self.user, old_password)
+        if not valid:
+            raise ValidationError(
+                self.error_messages['password_incorrect'],
+                code='password_incorrect',
+            )
+        return old_password
+
+    def save(self, commit=True):
+        hashing.set_password(self.user, self.cleaned_data['new_password1'])
+        if commit:
+            self.user.save()
+        return self.user
+
+    async def asave(self):
+        await hashing.aset_password(self.user, self.cleaned_data['new_password1'])
+        await self.user.asave()
+        return self.user
@@ -0,0 +1,259 @@
+"""
+Bulk user import from CSV or JSONL.
+
+Rows are validated with the RegisterForm rules, hashed in parallel on a
+process pool and written with bulk inserts, one transaction per chunk.
+"""
+import csv
+import io
+import json
+import os
+import time
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, router, transaction
+from authentication import hashing
+from authentication.forms import RegisterForm
+from django.contrib.auth import hashers
+from . import sharding
+from .models import EMAIL_TAKEN_MESSAGE, Pengguna, Instruktur, ShardIndex
+
+IMPORT_FIELDS = ('username', 'password', 'email', 'first_name', 'last_name', 'role', 'keahlian')
+
+
+class ImportRowForm(RegisterForm):
+    """
+    RegisterForm without the per-row uniqueness queries.
+    Usernames and emails are checked for a whole chunk at once by UserImporter.
+    """
+    def clean_username(self):
+        username = self.cleaned_data.get('username')
+        Pengguna.username_validator(username)
+        return username
+
+    def clean_email(self):
+        return self.cleaned_data.get('email')
+
+
+def read_rows(stream, fmt):
+    """
+    Yield (line_number, row) pairs from a text stream of CSV or JSONL.
+    Malformed JSONL lines are yielded as (line_number, None).
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def text_stream(binary_stream):
+    """
+    Wrap an uploaded file or stdin buffer as a text stream for read_rows().
+    """
+    return io.TextIOWrapper(binary_stream, encoding='utf-8-sig', newline='')
+
+
+class UserImporter:
+    """
+    Imports users in chunks and reports per-row errors and throughput.
+    """
+    def __init__(self, chunk_size=1000, workers=None):
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.pool_size = workers or os.cpu_count()
+        self.created = 0
+        self.failed = 0
+        self.started_at = None
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(self.created / elapsed, 1) if elapsed else 0.0,
+        }
+
+    def run(self, rows):
+        """
+        Import (line_number, row) pairs and yield an error dict for each
+        rejected row, followed by one progress dict per committed chunk.
+        """
+        self.started_at = time.monotonic()
+        pool = hashing.bulk_pool(self.workers) if self.workers != 0 else None
+        try:
+            chunk = []
+            for line_number, row in rows:
+                chunk.append((line_number, row))
+                if len(chunk) >= self.chunk_size:
+                    yield from self._import_chunk(chunk, pool)
+                    chunk = []
+            if chunk:
+                yield from self._import_chunk(chunk, pool)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+    def _error(self, line_number, errors):
+        self.failed += 1
+        return {'line': line_number, 'errors': errors}
+
+    def _import_chunk(self, chunk, pool):
+        valid = []
+        seen, seen_emails = set(), set()
+        for line_number, row in chunk:
+            if row is None:
+                yield self._error(line_number, {'__all__': ['Malformed row.']})
+                continue
+            data = {field: row.get(field) for field in IMPORT_FIELDS if row.get(field) not in (None, '')}
+            data['password2'] = row.get('password2') or data.get('password')
+            form = ImportRowForm(data=data)
+            if not form.is_valid():
+                yield self._error(line_number, {field: list(errors) for field, errors in form.errors.items()})
+                continue
+            # Usernames and emails are unique regardless of case
+            username, email = form.cleaned_data['username'].lower(), form.cleaned_data['email'].lower()
+            if username in seen:
+                yield self._error(line_number, {'username': ['Duplicate username in import.']})
+                continue
+            if email in seen_emails:
+                yield self._error(line_number, {'email': ['Duplicate email in import.']})
+                continue
+            seen.add(username)
+            seen_emails.add(email)
+            valid.append((line_number, form.cleaned_data))
+        if not valid:
+            return
+
+        # With sharding, the global index is the only place to see every username
+        shards = sharding.shard_aliases()
+        directory = ShardIndex.objects if shards else Pengguna.objects
+        taken = directory.usernames_taken([data['username'] for _, data in valid])
+        emails = [data['email'] for _, data in valid]
+        taken_emails = set().union(*(
+            Pengguna.objects.using(shard).emails_taken(emails) for shard in shards
+        )) if shards else Pengguna.objects.emails_taken(emails)
+        if taken or taken_emails:
+            accepted = []
+            for line_number, data in valid:
+                if data['username'].lower() in taken:
+                    yield self._error(line_number, {'username': ['A user with that username already exists.']})
+                elif data['email'].lower() in taken_emails:
+                    yield self._error(line_number, {'email': [EMAIL_TAKEN_MESSAGE]})
+                else:
+                    accepted.append((line_number, data))
+            valid = accepted
+        if not valid:
+            return
+
+        passwords = [data['password'] for _, data in valid]
+        if pool is None:
+            encoded = [hashers.make_password(password) for password in passwords]
+        else:
+            chunksize = max(1, len(passwords) // (self.pool_size * 4))
+            encoded = list(pool.map(hashers.make_password, passwords, chunksize=chunksize))
+
+        users = [
+            Pengguna(
+                username=data['username'],
+                email=data['email'],
+                first_name=data['first_name'],
+                last_name=data['last_name'],
+                role=data['role'],
+                password=password,
+            )
+            for (_, data), password in zip(valid, encoded)
+        ]
+        keahlian = [data['keahlian'] if data['role'] == 'instructor' else None for _, data in valid]
+        try:
+            if sharding.shard_aliases():
+                self._insert_sharded(users, keahlian)
+            else:
+                using = router.db_for_write(Pengguna)
+                with transaction.atomic(using=using):
+                    self._insert(users, keahlian, using)
+        except IntegrityError as e:
+            for line_number, _ in valid:
+                yield self._error(line_number, {'__all__': [f'Chunk rejected: {e}']})
+            return
+
+        self.created += len(users)
+        yield {'progress': self.summary()}
+
+    def _insert(self, users, keahlian, using):
+        """
+        Bulk insert users, and Instruktur rows where keahlian is set, on one database.
+        """
+        Pengguna.objects.using(using).bulk_create(users)
+        if any(user.pk is None for user in users):
+            # Backends that cannot return ids from bulk inserts
+            pks = dict(
+                Pengguna.objects.using(using).filter(username__in=[user.username for user in users])
+                .values_list('username', 'pk')
+            )
+            for user in users:
+                user.pk = pks[user.username]
+        instructors = [
+            Instruktur(pengguna_ptr_id=user.pk, keahlian=level)
+            for user, level in zip(users, keahlian)
+            if level is not None
+        ]
+        if instructors:
+            # bulk_create() refuses multi-table inherited models, so insert
+            # only the child table rows for the parents created above.
+            fields = Instruktur._meta.local_concrete_fields
+            batch_size = connections[using].ops.bulk_batch_size(fields, instructors)
+            for start in range(0, len(instructors), batch_size):
+                Instruktur._base_manager._insert(
+                    instructors[start:start + batch_size], fields=fields, using=using
+                )
+
+    def _insert_sharded(self, users, keahlian):
+        """
+        Allocate pks in ShardIndex, then insert each shard's users.
+        Databases have no two-phase commit: each shard commits in turn inside
+        the default database's transaction, which commits last. If a later
+        shard or the index fails to commit, the users already committed to
+        shards are deleted again so no shard keeps rows the index lacks.
+        """
+        entries = [
+            ShardIndex(username=user.username, user_id=user.user_id, shard=sharding.shard_for(user.user_id))
+            for user in users
+        ]
+        by_shard = {}
+        committed = []
+        try:
+            with transaction.atomic(using=DEFAULT_DB_ALIAS):
+                ShardIndex.objects.bulk_create(entries)
+                if any(entry.pk is None for entry in entries):
+                    pks = dict(
+                        ShardIndex.objects.filter(username__in=[entry.username for entry in entries])
+                        .values_list('username', 'pk')
+                    )
+                    for entry in entries:
+                        entry.pk = pks[entry.username]
+                for user, entry, level in zip(users, entries, keahlian):
+                    user.pk = entry.pk
+                    shard_users, shard_keahlian = by_shard.setdefault(entry.shard, ([], []))
+                    shard_users.append(user)
+                    shard_keahlian.append(level)
+                for shard, (shard_users, shard_keahlian) in by_shard.items():
+                    with transaction.atomic(using=shard):
+                        self._insert(shard_users, shard_keahlian, shard)
+                    committed.append(shard)
+        except Exception:
+            for shard in committed:
+                shard_users, _ = by_shard[shard]
+                Pengguna.objects.using(shard).filter(pk__in=[user.pk for user in shard_users]).delete()
+            raise
@@ -0,0 +1,207 @@
+"""
+Batch lookup of public user profiles for other services.
+
+lookup() resolves up to USER_LOOKUP_MAX_IDS user_ids at once:
+
+- profiles are cached, already encoded, in CACHES[USER_LOOKUP_CACHE_ALIAS]
+  for USER_LOOKUP_CACHE_TIMEOUT seconds (unknown ids too), and dropped
+  when the user is saved or deleted
+- the misses are read with one IN query per database, the role child
+  table joined in; with sharding, user_ids map to their shard directly
+- when several requests in a process miss on the same ids at once, one of
+  them queries and the others wait for its result
+
+Each profile is encoded once for every response format:
+
+- JSON: {"users": [profile, ...], "missing": [user_id, ...]}
+- NDJSON: one profile per line
+- binary: b'USRS' + uint32 count, then per user the 16 user_id bytes, an
+  int32 keahlian (-1 when not an instructor) and username, first_name,
+  last_name and role as uint16 length-prefixed UTF-8, all big-endian
+
+Users come back in request order, each once.
+"""
+import struct
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from auth_service.negotiation import ObjectEncoder
+from . import sharding
+from .models import Pengguna, Admin, Instruktur
+
+PUBLIC_FIELDS = ('user_id', 'username', 'first_name', 'last_name', 'role', 'instruktur__keahlian')
+PUBLIC_ENCODER = ObjectEncoder('user_id', 'username', 'first_name', 'last_name', 'role', 'keahlian')
+
+BINARY_MAGIC = b'USRS'
+BINARY_HEADER = struct.Struct('>4sI')
+BINARY_RECORD = struct.Struct('>16siHHHH')
+
+KEY_PREFIX = 'user-lookup:'
+# Cached for ids with no user, so repeated misses skip the database
+MISSING = b''
+
+
+class TooManyIds(ValueError):
+    pass
+
+
+def parse_ids(values):
+    """
+    Return the distinct UUIDs in values, in order.
+    Raises ValueError for malformed ids and TooManyIds past USER_LOOKUP_MAX_IDS.
+    """
+    if not isinstance(values, list):
+        raise ValueError('user_ids must be a list')
+    ids = list(dict.fromkeys(uuid.UUID(str(value)) for value in values))
+    if len(ids) > settings.USER_LOOKUP_MAX_IDS:
+        raise TooManyIds(f'At most {settings.USER_LOOKUP_MAX_IDS} user_ids per request')
+    return ids
+
+
+def encode_profile(user_id, username, first_name, last_name, role, keahlian):
+    """
+    Return (JSON object, binary record) for one user.
+    """
+    data = {'user_id': str(user_id), 'username': username, 'first_name': first_name,
+            'last_name': last_name, 'role': role}
+    if keahlian is not None:
+        data['keahlian'] = keahlian
+    strings = [value.encode() for value in (username, first_name, last_name, role)]
+    record = BINARY_RECORD.pack(
+        user_id.bytes, -1 if keahlian is None else keahlian, *(len(value) for value in strings)
+    ) + b''.join(strings)
+    return str(PUBLIC_ENCODER.encode(data)), record
+
+
+def _cache_key(user_id):
+    return f'{KEY_PREFIX}{user_id.hex}'
+
+
+class InFlight:
+    """
+    Ids being loaded by some thread of this process, each with an event
+    set when its result is in the cache.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def claim(self, ids):
+        """
+        Return (ids this caller must load, events of ids loaded elsewhere).
+        """
+        owned, waiting = [], []
+        with self._lock:
+            for user_id in ids:
+                event = self._pending.get(user_id)
+                if event is None:
+                    self._pending[user_id] = threading.Event()
+                    owned.append(user_id)
+                else:
+                    waiting.append(event)
+        return owned, waiting
+
+    def release(self, ids):
+        with self._lock:
+            for user_id in ids:
+                self._pending.pop(user_id).set()
+
+
+in_flight = InFlight()
+
+
+def _query(ids):
+    """
+    Load and encode the profiles of ids, one IN query per database.
+    """
+    shards = sharding.shard_aliases()
+    if shards:
+        by_shard = {}
+        for user_id in ids:
+            by_shard.setdefault(sharding.shard_for(user_id), []).append(user_id)
+        querysets = [Pengguna.objects.using(shard).filter(user_id__in=shard_ids)
+                     for shard, shard_ids in by_shard.items()]
+    else:
+        querysets = [Pengguna.objects.filter(user_id__in=ids)]
+    profiles = dict.fromkeys(ids, MISSING)
+    for queryset in querysets:
+        for row in queryset.values_list(*PUBLIC_FIELDS):
+            profiles[row[0]] = encode_profile(*row)
+    return profiles
+
+
+def _load(ids, cache):
+    found = {}
+    owned, waiting = in_flight.claim(ids)
+    if owned:
+        try:
+            found = _query(owned)
+            cache.set_many(
+                {_cache_key(user_id): profile for user_id, profile in found.items()},
+                settings.USER_LOOKUP_CACHE_TIMEOUT,
+            )
+        finally:
+            in_flight.release(owned)
+    if waiting:
+        for event in waiting:
+            event.wait(settings.USER_LOOKUP_WAIT_SECONDS)
+        rest = [user_id for user_id in ids if user_id not in found]
+        cached = cache.get_many([_cache_key(user_id) for user_id in rest])
+        for user_id in rest:
+            profile = cached.get(_cache_key(user_id))
+            # The loading request failed or its entry is gone already
+            found[user_id] = profile if profile is not None else _query([user_id])[user_id]
+    return found
+
+
+def lookup(ids):
+    """
+    Return {user_id: (JSON object, binary record) or MISSING} for ids.
+    """
+    cache = caches[settings.USER_LOOKUP_CACHE_ALIAS]
+    cached = cache.get_many([_cache_key(user_id) for user_id in ids])
+    profiles = {user_id: cached.get(_cache_key(user_id)) for user_id in ids}
+    misses = [user_id for user_id, profile in profiles.items() if profile is None]
+    if misses:
+        profiles.update(_load(misses, cache))
+    return profiles
+
+
+def render_json(profiles):
+    users = [profile[0] for profile in profiles.values() if profile]
+    missing = [f'"{user_id}"' for user_id, profile in profiles.items() if not profile]
+    return '{"users":[' + ','.join(users) + '],"missing":[' + ','.join(missing) + ']}'
+
+
+def render_ndjson(profiles):
+    return ''.join(profile[0] + '\n' for profile in profiles.values() if profile)
+
+
+def render_binary(profiles):
+    records = [profile[1] for profile in profiles.values() if profile]
+    return BINARY_HEADER.pack(BINARY_MAGIC, len(records)) + b''.join(records)
+
+
+def invalidate_profile(user_id):
+    """
+    Drop a user's cached public profile, now and once the change commits.
+    """
+    cache = caches[settings.USER_LOOKUP_CACHE_ALIAS]
+    cache.delete(_cache_key(user_id))
+    transaction.on_commit(lambda: cache.delete(_cache_key(user_id)))
+
+
+@receiver(post_save, sender=Pengguna)
+@receiver(post_save, sender=Admin)
+@receiver(post_save, sender=Instruktur)
+@receiver(post_delete, sender=Pengguna)
+@receiver(post_delete, sender=Admin)
+@receiver(post_delete, sender=Instruktur)
+def _user_changed(sender, instance, **kwargs):
+    invalidate_profile(instance.user_id)
@@ -0,0 +1,64 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from auth_service.bench import DEFAULT_MIX, Bench, bench_environment, environment_summary, load_replay
+
+
+class Command(BaseCommand):
+    help = 'Replay auth and profile traffic in-process through WSGI and ASGI and report latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--replay', help='JSONL request stream (defaults to a built-in mix)')
+        parser.add_argument('--users', type=int, default=20, help='Users seeded per role')
+        parser.add_argument('--requests', type=int, default=None,
+                            help='Requests per stack, cycling the stream (defaults to its length)')
+        parser.add_argument('--concurrency', type=int, default=8,
+                            help='Threads (WSGI) or requests in flight (ASGI)')
+        parser.add_argument('--stack', choices=('wsgi', 'asgi', 'both'), default='both')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        skipped = 0
+        if options['replay']:
+            try:
+                records, skipped = load_replay(options['replay'])
+            except OSError as e:
+                raise CommandError(str(e))
+            if not records:
+                raise CommandError(f"{options['replay']} has no replayable requests ({skipped} lines skipped).")
+        else:
+            records = list(DEFAULT_MIX)
+        if options['users'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--users and --concurrency must be at least 1.')
+
+        stacks = ('wsgi', 'asgi') if options['stack'] == 'both' else (options['stack'],)
+        report = {
+            'environment': environment_summary(),
+            'replay': options['replay'],
+            'skipped_lines': skipped,
+            'users_per_role': options['users'],
+            'concurrency': options['concurrency'],
+            'stacks': [],
+        }
+        for stack in stacks:
+            # Fresh databases per stack so neither inherits the other's writes
+            with bench_environment():
+                bench = Bench(records, options['users'], options['concurrency'], options['requests'])
+                bench.seed()
+                result = bench.run_wsgi() if stack == 'wsgi' else bench.run_asgi()
+            report['stacks'].append(result)
+            self.stdout.write(
+                f"{stack}: {result['requests']} requests, {result['requests_per_second']} req/s, "
+                f"p50 {result.get('p50_ms')}ms p95 {result.get('p95_ms')}ms p99 {result.get('p99_ms')}ms, "
+                f"{result['queries_per_request']} queries/request"
+            )
+            for endpoint, stats in result['endpoints'].items():
+                self.stdout.write(
+                    f"  {endpoint}: {stats['requests']} requests, p50 {stats['p50_ms']}ms "
+                    f"p99 {stats['p99_ms']}ms, {stats['queries_per_request']} queries, {stats['statuses']}"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                json.dump(report, stream, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from django.core.cache import CacheHandler
+from django.core.management.base import BaseCommand
+
+
+def cache_configs(directory, max_entries):
+    options = {'MAX_ENTRIES': max_entries}
+    return {
+        'locmem': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'OPTIONS': options},
+        'filebased': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(directory, 'filebased'),
+            'OPTIONS': options,
+        },
+        'shared memory': {
+            'BACKEND': 'auth_service.shmcache.SharedMemoryCache',
+            'LOCATION': os.path.join(directory, 'shm'),
+            'OPTIONS': options,
+        },
+    }
+
+
+def worker(config, seed, operations, keys, write_ratio, results):
+    """
+    Cache-aside traffic over a skewed key space, like session and user lookups.
+    """
+    cache = CacheHandler({'default': config})['default']
+    rng = random.Random(seed)
+    value = {'user_id': seed, 'role': 'student', 'data': 'x' * 200}
+    hits = misses = 0
+    started = time.perf_counter()
+    for _ in range(operations):
+        key = f'user:{min(int(rng.paretovariate(1.2)), keys)}'
+        if rng.random() < write_ratio:
+            cache.set(key, value, 300)
+        elif cache.get(key) is None:
+            misses += 1
+            cache.set(key, value, 300)
+        else:
+            hits += 1
+    results.put((hits, misses, time.perf_counter() - started))
+
+
+class Command(BaseCommand):
+    help = 'Compare the shared-memory cache with LocMem and file-based caches across worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Processes, like gunicorn workers')
+        parser.add_argument('--operations', type=int, default=20000, help='Operations per worker')
+        parser.add_argument('--keys', type=int, default=5000, help='Distinct keys')
+        parser.add_argument('--max-entries', type=int, default=16384)
+        parser.add_argument('--write-ratio', type=float, default=0.05)
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp(prefix='bench-cache-')
+        context = multiprocessing.get_context('fork')
+        self.stdout.write(f"{'backend':<16}{'ops/s':>12}{'hit rate':>10}{'us/op':>10}")
+        try:
+            for name, config in cache_configs(directory, options['max_entries']).items():
+                results = context.Queue()
+                processes = [
+                    context.Process(target=worker, args=(
+                        config, seed, options['operations'], options['keys'], options['write_ratio'], results,
+                    ))
+                    for seed in range(options['workers'])
+                ]
+                started = time.perf_counter()
+                for process in processes:
+                    process.start()
+                outcomes = [results.get() for _ in processes]
+                for process in processes:
+                    process.join()
+                elapsed = time.perf_counter() - started
+
+                hits = sum(outcome[0] for outcome in outcomes)
+                lookups = hits + sum(outcome[1] for outcome in outcomes)
+                total = options['workers'] * options['operations']
+                per_op = sum(outcome[2] for outcome in outcomes) / total
+                self.stdout.write(
+                    f'{name:<16}{total / elapsed:>12.0f}{hits / lookups if lookups else 0:>10.1%}{per_op * 1e6:>10.1f}'
+                )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from user_management.exporter import EXPORT_FORMATS, UserExporter
+
+
+class Command(BaseCommand):
+    help = 'Export all users to CSV or JSONL, streaming in constant memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help="Output file, or '-' for stdout (default)")
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS),
+                            help='Output format (default: guessed from the file extension, csv for stdout)')
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Users read per keyset batch')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1.')
+        exporter = UserExporter(fmt, batch_size=options['batch_size'])
+
+        if path == '-':
+            for chunk in exporter.chunks():
+                self.stdout.write(chunk, ending='')
+        else:
+            try:
+                stream = open(path, 'w', encoding='utf-8', newline='')
+            except OSError as e:
+                raise CommandError(f'Cannot open {path}: {e}')
+            with stream:
+                for chunk in exporter.chunks():
+                    stream.write(chunk)
+
+        summary = exporter.summary()
+        self.stderr.write(self.style.SUCCESS(
+            f"Exported {summary['exported']} users in {summary['seconds']}s ({summary['rows_per_second']} rows/s)"
+        ))
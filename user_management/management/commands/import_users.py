@@ -0,0 +1,48 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from user_management.importer import UserImporter, read_rows, text_stream
+
+
+class Command(BaseCommand):
+    help = 'Import students and instructors from a CSV or JSONL file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Input format (default: guessed from the file extension)')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Rows hashed and inserted per transaction')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Hashing processes (default: all cores, 0 hashes inline)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        importer = UserImporter(chunk_size=options['chunk_size'], workers=options['workers'])
+
+        if path == '-':
+            stream = text_stream(sys.stdin.buffer)
+        else:
+            try:
+                stream = open(path, encoding='utf-8-sig', newline='')
+            except OSError as e:
+                raise CommandError(f'Cannot open {path}: {e}')
+
+        with stream:
+            for event in importer.run(read_rows(stream, fmt)):
+                if 'progress' in event:
+                    progress = event['progress']
+                    self.stdout.write(
+                        f"{progress['created']} created, {progress['failed']} failed "
+                        f"({progress['rows_per_second']} rows/s)"
+                    )
+                else:
+                    self.stderr.write(f"line {event['line']}: {json.dumps(event['errors'])}")
+
+        summary = importer.summary()
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {summary['created']} users in {summary['seconds']}s "
+            f"({summary['rows_per_second']} rows/s), {summary['failed']} rows rejected"
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from user_management.rebalance import ShardRebalancer
+
+
+class Command(BaseCommand):
+    help = 'Move users to the shard their user_id hashes to under the current USER_SHARDS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Index rows scanned per batch')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Count the users that would move without moving them')
+
+    def handle(self, *args, **options):
+        rebalancer = ShardRebalancer(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        verb = 'would move' if options['dry_run'] else 'moved'
+        try:
+            for event in rebalancer.run():
+                progress = event['progress']
+                self.stdout.write(f"{progress['scanned']} scanned, {progress['moved']} {verb}")
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        summary = rebalancer.summary()
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {summary['scanned']} users, {verb} {summary['moved']} "
+            f"in {summary['seconds']}s ({summary['users_per_second']} users/s)"
+        ))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:09
+
+import user_management.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_management', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='admin',
+            managers=[
+                ('objects', user_management.models.PenggunaManager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='instruktur',
+            managers=[
+                ('objects', user_management.models.PenggunaManager()),
+            ],
+        ),
+        migrations.AlterModelManagers(
+            name='pengguna',
+            managers=[
+                ('objects', user_management.models.PenggunaManager()),
+            ],
+        ),
+    ]
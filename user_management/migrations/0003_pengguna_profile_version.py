@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_management', '0002_pengguna_managers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pengguna',
+            name='profile_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_management', '0003_pengguna_profile_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShardIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(max_length=150, unique=True)),
+                ('user_id', models.UUIDField(unique=True)),
+                ('shard', models.CharField(max_length=100)),
+            ],
+        ),
+    ]
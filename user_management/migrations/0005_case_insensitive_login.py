@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:10
+
+import django.db.models.functions.text
+from django.db import migrations, models, router
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_duplicates(apps, schema_editor):
+    """
+    Refuse to migrate while usernames or non-empty emails differ only in
+    case, with a list of them, instead of failing on the unique index.
+    """
+    alias = schema_editor.connection.alias
+    problems = []
+    for model_name, field in (('Pengguna', 'username'), ('Pengguna', 'email'), ('ShardIndex', 'username')):
+        model = apps.get_model('user_management', model_name)
+        if not router.allow_migrate_model(alias, model):
+            # ShardIndex only lives on the default database
+            continue
+        rows = model.objects.using(alias)
+        if field == 'email':
+            rows = rows.exclude(email='')
+        duplicates = list(
+            rows.values(lowered=Lower(field)).annotate(count=Count('pk')).filter(count__gt=1)
+            .values_list('lowered', flat=True)[:20]
+        )
+        if duplicates:
+            problems.append(f"{model_name}.{field}: {', '.join(duplicates)}")
+    if problems:
+        raise RuntimeError(
+            f'Database {alias!r} has values that differ only in case, which the new case-insensitive '
+            'unique indexes do not allow. Merge or rename these accounts (or clear the duplicate '
+            'emails) and migrate again:\n  ' + '\n  '.join(problems)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('user_management', '0004_shardindex'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='pengguna',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('username'), name='pengguna_username_ci_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='pengguna',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('email', ''), _negated=True), name='pengguna_email_ci_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='shardindex',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('username'), name='shardindex_username_ci_unique'),
+        ),
+    ]
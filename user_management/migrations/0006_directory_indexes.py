@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:15
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+TRIGRAM_COLUMNS = ('username', 'first_name', 'last_name', 'email')
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # PostgreSQL only: GIN trigram indexes serve LIKE 'term%' on lower(column)
+    # under any collation; other databases search the btree LOWER() indexes
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in TRIGRAM_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS pengguna_{column}_trgm_idx ON user_management_pengguna '
+            f'USING gin (lower({column}) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in TRIGRAM_COLUMNS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS pengguna_{column}_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('user_management', '0005_case_insensitive_login'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pengguna',
+            index=models.Index(fields=['role', 'id'], name='pengguna_role_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pengguna',
+            index=models.Index(django.db.models.functions.text.Lower('first_name'), name='pengguna_first_name_ci_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pengguna',
+            index=models.Index(django.db.models.functions.text.Lower('last_name'), name='pengguna_last_name_ci_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:49
+
+import user_management.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user_management', '0006_directory_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pengguna',
+            name='username',
+            field=models.CharField(error_messages={'unique': 'A user with that username already exists.'}, help_text='Required. 150 characters or fewer. Letters, digits and ./+/-/_ only.', max_length=150, unique=True, validators=[user_management.models.LoginUsernameValidator()], verbose_name='username'),
+        ),
+    ]
@@ -1,24 +1,293 @@
 import uuid
-from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.db import models, transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.db.models.query import ModelIterable
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import Q, Value
+from django.db.models.functions import Lower
+from django.utils.translation import gettext_lazy as _
+from . import sharding
+
+# Maps Pengguna.role to the reverse one-to-one accessor of its subclass table.
+# Students have no child table and are served by the base model.
+ROLE_SUBCLASSES = {
+    'admin': 'admin',
+    'instructor': 'instruktur',
+}
+
+
+class LoginUsernameValidator(UnicodeUsernameValidator):
+    """
+    Django's username characters without '@': users also log in by email,
+    and a username shaped like someone's address would shadow it.
+    """
+    regex = r'^[\w.+-]+\Z'
+    message = _(
+        'Enter a valid username. This value may contain only letters, '
+        'numbers, and ./+/-/_ characters.'
+    )
+
+
+class RoleModelIterable(ModelIterable):
+    """
+    Yields the role subclass instance for every row instead of the base model.
+    """
+    def __iter__(self):
+        for obj in super().__iter__():
+            yield obj.as_role()
+
+
+def iexact(field, value):
+    """
+    Q matching LOWER(field) = LOWER(value), which the database answers from
+    the case-insensitive index on field (aliased as field_lower).
+    """
+    return Q(**{f'{field}_lower': Lower(Value(value))})
+
+
+def iexact_in(field, values):
+    """
+    iexact() for several values at once.
+    """
+    return Q(**{f'{field}_lower__in': [Lower(Value(value)) for value in values]})
+
+
+def email_iexact(value):
+    # Repeats the email index's condition so the partial index can be used
+    return iexact('email', value) & ~Q(email='')
+
+
+class PenggunaQuerySet(models.QuerySet):
+    """
+    QuerySet that can resolve users to their role subclass in a single query.
+    """
+    def identified_by(self, identifier):
+        """
+        Users whose username, or email when identifier contains '@', matches
+        identifier case-insensitively. At most one of each.
+        """
+        clone = self.alias(username_lower=Lower('username'))
+        if '@' not in identifier:
+            return clone.filter(iexact('username', identifier))
+        return clone.alias(email_lower=Lower('email')).filter(
+            iexact('username', identifier) | email_iexact(identifier)
+        )
+
+    def username_taken(self, username, exclude_pk=None):
+        return self.alias(username_lower=Lower('username')).filter(
+            iexact('username', username)
+        ).exclude(pk=exclude_pk).exists()
+
+    def usernames_taken(self, usernames):
+        """
+        The lowercased usernames among usernames that exist in any case.
+        """
+        return {username.lower() for username in self.alias(username_lower=Lower('username')).filter(
+            iexact_in('username', usernames)
+        ).values_list('username', flat=True)}
+
+    def emails_taken(self, emails):
+        """
+        The lowercased emails among emails that exist in any case.
+        """
+        return {email.lower() for email in self.alias(email_lower=Lower('email')).filter(
+            iexact_in('email', emails), ~Q(email='')
+        ).values_list('email', flat=True)}
+
+    def email_taken(self, email, exclude_pk=None):
+        return self.alias(email_lower=Lower('email')).filter(email_iexact(email)).exclude(pk=exclude_pk).exists()
+
+    def select_subclasses(self):
+        """
+        Join the role child tables so each row comes back as Admin/Instruktur/Pengguna.
+        Subclass querysets are already concrete, so this is a no-op for them.
+        """
+        if self.model is not Pengguna:
+            return self
+        clone = self.select_related(*ROLE_SUBCLASSES.values())
+        clone._iterable_class = RoleModelIterable
+        return clone
+
+    def locate(self, pk=None, username=None, user_id=None):
+        """
+        Point the queryset at the shard holding one user, given any of its keys.
+        Unchanged while sharding is off; looks up ShardIndex for pk and username.
+        """
+        if not sharding.shard_aliases():
+            return self
+        if user_id is not None:
+            return self.using(sharding.shard_for(user_id))
+        shard = ShardIndex.objects.shard_of(pk=pk, username=username)
+        return self.none() if shard is None else self.using(shard)
+
+    async def alocate(self, pk=None, username=None, user_id=None):
+        """
+        Async locate().
+        """
+        if not sharding.shard_aliases() or user_id is not None:
+            return self.locate(user_id=user_id)
+        shard = await ShardIndex.objects.ashard_of(pk=pk, username=username)
+        return self.none() if shard is None else self.using(shard)
+
+
+class PenggunaManager(UserManager.from_queryset(PenggunaQuerySet)):
+    """
+    User manager whose natural-key lookups return the role subclass,
+    so authenticate() hands out fully loaded Instruktur/Admin instances.
+    """
+    def get_by_natural_key(self, username):
+        queryset = self.get_queryset().locate(username=username)
+        return queryset.select_subclasses().get(**{self.model.USERNAME_FIELD: username})
+
+    async def aget_by_natural_key(self, username):
+        queryset = await self.get_queryset().alocate(username=username)
+        return await queryset.select_subclasses().aget(**{self.model.USERNAME_FIELD: username})
+
+    def _login_querysets(self, identifier):
+        queryset = self.get_queryset()
+        shards = sharding.shard_aliases()
+        if shards and '@' in identifier:
+            # Emails are not in the shard index; probe each shard's email index
+            return [queryset.using(shard) for shard in shards]
+        return [queryset.locate(username=identifier)]
+
+    @staticmethod
+    def _order_logins(users, identifier):
+        # The username match first, then the user with that email
+        users = sorted(users, key=lambda user: user.username.lower() != identifier.lower())
+        if not users:
+            raise Pengguna.DoesNotExist()
+        return users
+
+    def get_by_login(self, identifier):
+        """
+        Return the role subclass instances of the users logging in with
+        identifier, a username or an email in any case: at most two, when
+        an older username equals another user's email, username match first.
+        The caller checks the password against each.
+        """
+        users = []
+        for queryset in self._login_querysets(identifier):
+            users.extend(queryset.select_subclasses().identified_by(identifier)[:2])
+        return self._order_logins(users, identifier)
+
+    async def aget_by_login(self, identifier):
+        """Async get_by_login()."""
+        shards = sharding.shard_aliases()
+        if shards and '@' in identifier:
+            querysets = [self.get_queryset().using(shard) for shard in shards]
+        else:
+            querysets = [await self.get_queryset().alocate(username=identifier)]
+        users = []
+        for queryset in querysets:
+            users.extend([user async for user in queryset.select_subclasses().identified_by(identifier)[:2]])
+        return self._order_logins(users, identifier)
+
 
 class Pengguna(AbstractUser):
     """
     Base user model.
     Extends Django's AbstractUser for built-in authentication.
     """
+    username_validator = LoginUsernameValidator()
+
+    # AbstractUser's username without '@', so usernames and emails can't collide
+    username = models.CharField(
+        _('username'),
+        max_length=150,
+        unique=True,
+        help_text=_('Required. 150 characters or fewer. Letters, digits and ./+/-/_ only.'),
+        validators=[username_validator],
+        error_messages={
+            'unique': _('A user with that username already exists.'),
+        },
+    )
     user_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     role = models.CharField(max_length=50, default='student')
+    # Bumped on every profile change; the profile view serves it as the ETag
+    profile_version = models.PositiveIntegerField(default=0, editable=False)
     
     # AbstractUser already provides:
-    # - username
     # - password (properly hashed)
     # - first_name, last_name, email
     # - is_active, is_staff, etc.
+
+    objects = PenggunaManager()
+
+    class Meta(AbstractUser.Meta):
+        # Usernames and emails are unique regardless of case, and these indexes
+        # serve every login and uniqueness lookup (see PenggunaQuerySet.identified_by)
+        constraints = [
+            models.UniqueConstraint(Lower('username'), name='pengguna_username_ci_unique'),
+            models.UniqueConstraint(Lower('email'), condition=~Q(email=''), name='pengguna_email_ci_unique'),
+        ]
+        # Directory pages and name search (see user_management.directory)
+        indexes = [
+            models.Index(fields=['role', 'id'], name='pengguna_role_id_idx'),
+            models.Index(Lower('first_name'), name='pengguna_first_name_ci_idx'),
+            models.Index(Lower('last_name'), name='pengguna_last_name_ci_idx'),
+        ]
     
     def __str__(self):
         return self.username
 
+    def save(self, *args, **kwargs):
+        # Full saves may change any profile field; update_fields saves
+        # (last_login, password upgrades) leave the profile untouched
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            self.profile_version += 1
+        indexed = False
+        if sharding.shard_aliases():
+            if self._state.adding and self.pk is None:
+                # New users get their pk and shard from the global index
+                self.pk = ShardIndex.objects.create(
+                    username=self.username, user_id=self.user_id, shard=sharding.shard_for(self.user_id),
+                ).pk
+                indexed = True
+            elif kwargs.get('update_fields') is None or 'username' in kwargs['update_fields']:
+                ShardIndex.objects.filter(pk=self.pk).exclude(username=self.username).update(username=self.username)
+        try:
+            super().save(*args, **kwargs)
+        except BaseException:
+            # The index row is not in the shard's transaction; drop it unless
+            # a failed transaction on the default database takes it anyway
+            if indexed:
+                if not transaction.get_connection().needs_rollback:
+                    ShardIndex.objects.filter(pk=self.pk).delete()
+                self.pk = None
+            raise
+
+    def as_role(self):
+        """
+        Return the subclass instance matching this user's role.
+        Uses the joined row when loaded through select_subclasses(),
+        otherwise falls back to one lookup on the child table.
+        """
+        accessor = ROLE_SUBCLASSES.get(self.role)
+        if accessor is None or type(self) is not Pengguna:
+            return self
+        try:
+            return getattr(self, accessor)
+        except ObjectDoesNotExist:
+            return self
+
+EMAIL_TAKEN_MESSAGE = 'A user with that email already exists.'
+
+
+def email_taken(email, exclude_pk=None):
+    """
+    True when another user has email, in any case, on any shard.
+    """
+    shards = sharding.shard_aliases()
+    if not shards:
+        return Pengguna.objects.email_taken(email, exclude_pk)
+    # Emails are only unique per shard in the database, so check them all
+    return any(Pengguna.objects.using(shard).email_taken(email, exclude_pk) for shard in shards)
+
+
 class Admin(Pengguna):
     """
     Admin user model for system administration.
@@ -47,3 +316,51 @@ class Instruktur(Pengguna):
     
     def __str__(self):
         return f"{self.username} - Instructor"
+
+
+class ShardIndexQuerySet(models.QuerySet):
+    def _lookup(self, pk, username):
+        if pk is not None:
+            return self.filter(pk=pk)
+        return self.alias(username_lower=Lower('username')).filter(iexact('username', username))
+
+    def username_taken(self, username):
+        return self._lookup(None, username).exists()
+
+    def usernames_taken(self, usernames):
+        return {username.lower() for username in self.alias(username_lower=Lower('username')).filter(
+            iexact_in('username', usernames)
+        ).values_list('username', flat=True)}
+
+    def shard_of(self, pk=None, username=None):
+        return self._lookup(pk, username).values_list('shard', flat=True).first()
+
+    async def ashard_of(self, pk=None, username=None):
+        return await self._lookup(pk, username).values_list('shard', flat=True).afirst()
+
+
+class ShardIndex(models.Model):
+    """
+    Global user directory for sharded deployments, kept on the default database.
+    The id is the user's pk on its shard.
+    """
+    username = models.CharField(max_length=150, unique=True)
+    user_id = models.UUIDField(unique=True)
+    shard = models.CharField(max_length=100)
+
+    objects = ShardIndexQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(Lower('username'), name='shardindex_username_ci_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.username} - {self.shard}"
+
+
+@receiver(post_delete, sender=Pengguna)
+def delete_shard_index(sender, instance, **kwargs):
+    # Subclass deletes also delete the Pengguna row, which sends this
+    if sharding.shard_aliases():
+        ShardIndex.objects.filter(pk=instance.pk).delete()
@@ -0,0 +1,55 @@
+"""
+DRF permission classes backed by role permissions (see user_management.roles).
+
+They read only request.user.role, which token users carry in their claims,
+so a check costs no queries for session or token users.
+
+    class CourseView(APIView):
+        permission_classes = [IsInstructor | HasRolePerm.require('class_management.add_kelas')]
+"""
+from rest_framework.permissions import BasePermission
+
+from .roles import role_permissions
+
+
+class HasRole(BasePermission):
+    """
+    Allow authenticated users whose role is one of `roles`.
+    """
+    roles = ()
+
+    def has_permission(self, request, view):
+        user = request.user
+        return bool(user and user.is_authenticated and user.role in self.roles)
+
+
+class IsStudent(HasRole):
+    roles = ('student',)
+
+
+class IsInstructor(HasRole):
+    roles = ('instructor',)
+
+
+class IsAdminRole(HasRole):
+    roles = ('admin',)
+
+
+class HasRolePerm(BasePermission):
+    """
+    Allow authenticated users whose role has every permission in `perms`,
+    or in the view's `required_perms` when no perms are set. Denies when
+    neither names a permission.
+    """
+    perms = ()
+
+    @classmethod
+    def require(cls, *perms):
+        return type(cls.__name__, (cls,), {'perms': perms})
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not (user and user.is_authenticated):
+            return False
+        perms = self.perms or getattr(view, 'required_perms', ())
+        return bool(perms) and all(role_permissions.has_perm(user.role, perm) for perm in perms)
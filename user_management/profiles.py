@@ -0,0 +1,190 @@
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.middleware.csrf import get_token
+from django.db import IntegrityError, router, transaction
+from django.http import HttpResponseNotModified
+from django.utils.cache import parse_etags, patch_vary_headers
+
+from auth_service.negotiation import ObjectEncoder
+from .cache import invalidate_user
+from .lookup import invalidate_profile
+from . import sharding
+from .models import Pengguna, Instruktur, ShardIndex, email_taken
+
+# Fields a user may change on their own profile, per table
+PROFILE_FIELDS = ('username', 'email', 'first_name', 'last_name')
+ROLE_PROFILE_FIELDS = {Instruktur: ('keahlian',)}
+
+PROFILE_ENCODER = ObjectEncoder(
+    'username', 'email', 'first_name', 'last_name', 'role', 'user_id',
+    'admin_id', 'is_staff', 'is_superuser', 'instruktur_id', 'keahlian',
+)
+RESULT_ENCODER = ObjectEncoder('success', 'message', 'errors')
+
+# JSON bodies of the fixed profile view responses, encoded once
+PROFILE_UPDATED = RESULT_ENCODER.encode({'success': True, 'message': 'Profile updated successfully'})
+USERNAME_TAKEN = RESULT_ENCODER.encode({'success': False, 'message': 'Username already taken'})
+EMAIL_TAKEN = RESULT_ENCODER.encode({'success': False, 'message': 'Email already taken'})
+ACCOUNT_DELETED = RESULT_ENCODER.encode({'success': True, 'message': 'User account deleted successfully'})
+PASSWORD_UPDATED = RESULT_ENCODER.encode({'success': True, 'message': 'Your password was successfully updated!'})
+PROFILE_CONFLICT_MESSAGE = 'Profile was changed by another request. Reload it and try again.'
+PROFILE_CONFLICT = RESULT_ENCODER.encode({'success': False, 'message': PROFILE_CONFLICT_MESSAGE})
+
+
+class ProfileConflict(Exception):
+    """
+    The profile version named by If-Match is no longer current.
+    """
+
+
+class UsernameTaken(Exception):
+    pass
+
+
+class EmailTaken(Exception):
+    pass
+
+
+def get_profile_data(user):
+    """
+    Project a user into the profile payload used by the profile views.
+    Pass request.user; role fields are read from the subclass instance
+    loaded by RoleModelBackend, so no extra queries are issued.
+    """
+    user = user.as_role()
+
+    # Basic user data available for all users
+    data = {
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'role': user.role,
+        'user_id': str(user.user_id),
+    }
+
+    # Add role-specific data
+    if user.role == 'admin' and hasattr(user, 'admin_id'):
+        data['admin_id'] = str(user.admin_id)
+        data['is_staff'] = user.is_staff
+        data['is_superuser'] = user.is_superuser
+
+    elif user.role == 'instructor' and hasattr(user, 'instruktur_id'):
+        data['instruktur_id'] = str(user.instruktur_id)
+        data['keahlian'] = user.keahlian
+
+    return data
+
+
+def result_payload(success, message, errors=None):
+    data = {'success': success, 'message': message}
+    if errors is not None:
+        data['errors'] = {field: list(messages) for field, messages in errors.items()}
+    return RESULT_ENCODER.encode(data)
+
+
+def profile_etag(user, representation, variant=''):
+    """
+    ETag of user's profile page ('html') or payload ('json').
+    """
+    suffix = f'-{variant}' if variant else ''
+    return f'"{user.user_id}-{user.profile_version}-{representation}{suffix}"'
+
+
+def _csrf_variant(request):
+    # The page embeds CSRF tokens, which stop working when the secret rotates
+    # (on every login), so a page cached under an older secret must not get a 304
+    get_token(request)
+    return hashlib.sha256(request.META['CSRF_COOKIE'].encode()).hexdigest()[:16]
+
+
+def conditional_get(request, as_json):
+    """
+    Return (etag, response) for a profile GET by request.user.
+    response is a 304 when If-None-Match names the current version, else None.
+    Pages with queued messages are always rendered so the messages are shown,
+    and page ETags include the CSRF secret the page's forms were rendered with.
+    """
+    if as_json:
+        etag = profile_etag(request.user, 'json')
+    else:
+        etag = profile_etag(request.user, 'html', _csrf_variant(request))
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    if (etag in etags or '*' in etags) and (as_json or not len(get_messages(request))):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Accept',))
+        return etag, response
+    return etag, None
+
+
+def if_match_version(request, user):
+    """
+    Return the profile version named by If-Match, or None when the header
+    is absent or '*'. ETags of another user or format raise ProfileConflict.
+    """
+    header = request.headers.get('If-Match')
+    if not header:
+        return None
+    etags = parse_etags(header)
+    if '*' in etags:
+        return None
+    prefix = f'"{user.user_id}-'
+    for etag in etags:
+        if etag.startswith(prefix):
+            version = etag[len(prefix):].split('-', 1)[0]
+            if version.isdigit():
+                return int(version)
+    raise ProfileConflict()
+
+
+def update_profile(user, data, expected_version=None):
+    """
+    Apply the profile fields in data with conditional UPDATEs.
+
+    The user row is only written while profile_version still holds the
+    version the change was based on, so no row locks are taken. With
+    expected_version (from If-Match) a mismatch raises ProfileConflict;
+    without it the current version is re-read and the write retried, which
+    keeps last-write-wins for clients that don't send If-Match.
+    Case-insensitive username and email uniqueness is enforced by the
+    database and raises UsernameTaken or EmailTaken.
+    """
+    user = user.as_role()
+    changes = {field: data[field] for field in PROFILE_FIELDS if field in data}
+    role_changes = {field: data[field] for field in ROLE_PROFILE_FIELDS.get(type(user), ()) if field in data}
+    version = user.profile_version if expected_version is None else expected_version
+
+    if 'username' in changes:
+        Pengguna.username_validator(changes['username'])
+    if 'email' in changes and sharding.shard_aliases() and email_taken(changes['email'], exclude_pk=user.pk):
+        # The database only sees emails on the user's own shard
+        raise EmailTaken()
+
+    # The primary, or the user's shard
+    db = router.db_for_write(Pengguna, instance=user)
+    try:
+        with transaction.atomic(using=db):
+            users = Pengguna.objects.using(db).filter(pk=user.pk)
+            while not users.filter(profile_version=version).update(profile_version=version + 1, **changes):
+                if expected_version is not None:
+                    raise ProfileConflict()
+                version = users.values_list('profile_version', flat=True).get()
+            if role_changes:
+                type(user)._base_manager.using(db).filter(pk=user.pk).update(**role_changes)
+            if 'username' in changes and sharding.shard_aliases():
+                # Shards only see their own users; the index holds global uniqueness
+                ShardIndex.objects.filter(pk=user.pk).update(username=changes['username'])
+    except IntegrityError:
+        if changes.get('email') and email_taken(changes['email'], exclude_pk=user.pk):
+            raise EmailTaken()
+        raise UsernameTaken()
+
+    # update() sends no post_save, so drop the cached user here
+    invalidate_user(user.pk)
+    invalidate_profile(user.user_id)
+    for field, value in {**changes, **role_changes}.items():
+        setattr(user, field, value)
+    user.profile_version = version + 1
+    return user
@@ -0,0 +1,117 @@
+"""
+Move users whose shard changed after USER_SHARDS was edited.
+
+ShardIndex is scanned in keyset batches; each batch's misplaced users are
+copied to their new shard (user row, role child row, group and permission
+links), the index is pointed at the new shard, and the old rows are deleted.
+Copies ignore rows that already exist, so an interrupted run can simply be
+started again. Changes made to a user while its batch is being copied are
+lost, so run this during quiet periods.
+"""
+import time
+
+from django.db import transaction
+from django.db.models.constants import OnConflict
+
+from . import sharding
+from .cache import user_cache
+from .models import Pengguna, Admin, Instruktur, ShardIndex
+
+ROLE_MODELS = (Admin, Instruktur)
+
+
+def _link_models():
+    return (Pengguna.groups.through, Pengguna.user_permissions.through)
+
+
+class ShardRebalancer:
+    """
+    Streams ShardIndex and moves misplaced users batch by batch.
+    """
+    def __init__(self, batch_size=1000, dry_run=False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.scanned = 0
+        self.moved = 0
+        self.started_at = None
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            'scanned': self.scanned,
+            'moved': self.moved,
+            'seconds': round(elapsed, 3),
+            'users_per_second': round(self.moved / elapsed, 1) if elapsed else 0.0,
+        }
+
+    def run(self):
+        """
+        Rebalance every user and yield a progress dict per batch.
+        """
+        shards = sharding.shard_aliases()
+        if not shards:
+            raise ValueError('USER_SHARDS is empty, there is nothing to rebalance.')
+        self.started_at = time.monotonic()
+        last_pk = 0
+        while True:
+            batch = list(
+                ShardIndex.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', 'user_id', 'shard')[:self.batch_size]
+            )
+            if not batch:
+                return
+            last_pk = batch[-1][0]
+            self.scanned += len(batch)
+
+            moves = {}
+            for pk, user_id, shard in batch:
+                target = sharding.shard_for(user_id, shards)
+                if target != shard:
+                    moves.setdefault((shard, target), []).append(pk)
+            for (source, target), pks in moves.items():
+                if not self.dry_run:
+                    self.move(source, target, pks)
+                self.moved += len(pks)
+            yield {'progress': self.summary()}
+
+    def move(self, source, target, pks):
+        """
+        Move the users with pks from the source shard to the target shard.
+        """
+        users = list(Pengguna._base_manager.using(source).filter(pk__in=pks))
+        children = [
+            (model, list(model._base_manager.using(source).filter(pk__in=pks)))
+            for model in ROLE_MODELS
+        ]
+        links = []
+        for through in _link_models():
+            rows = list(through._base_manager.using(source).filter(pengguna_id__in=pks))
+            for row in rows:
+                # Link ids are per shard; the (user, group) pair is the identity
+                row.pk = None
+            links.append((through, rows))
+
+        with transaction.atomic(using=target):
+            Pengguna._base_manager.using(target).bulk_create(users, ignore_conflicts=True)
+            for model, rows in children:
+                if rows:
+                    # bulk_create() refuses multi-table inherited models
+                    model._base_manager._insert(
+                        rows, fields=model._meta.local_concrete_fields,
+                        using=target, on_conflict=OnConflict.IGNORE,
+                    )
+            for through, rows in links:
+                through._base_manager.using(target).bulk_create(rows, ignore_conflicts=True)
+
+        ShardIndex.objects.filter(pk__in=pks).update(shard=target)
+
+        # Raw deletes: no cascades or post_delete, which would drop the index rows
+        with transaction.atomic(using=source):
+            for through in _link_models():
+                through._base_manager.using(source).filter(pengguna_id__in=pks)._raw_delete(source)
+            for model in ROLE_MODELS:
+                model._base_manager.using(source).filter(pk__in=pks)._raw_delete(source)
+            Pengguna._base_manager.using(source).filter(pk__in=pks)._raw_delete(source)
+
+        for pk in pks:
+            user_cache.invalidate(pk)
@@ -0,0 +1,145 @@
+"""
+Role-based permissions compiled into per-process bitsets.
+
+Users get their permissions from their `role`: a role has the permissions
+of the group named for it in ROLE_GROUPS, and admins (superusers) have all
+of them. Per-user groups and user_permissions are not consulted.
+
+The first check in a process loads every Permission once and gives each a
+bit; each role becomes one integer with the bits of its permissions set,
+so has_perm() is a dict lookup and a shift with no queries.
+
+Saving or deleting a Group or Permission, or changing a group's
+permissions, drops this process's table and publishes a new version on the
+user cache's invalidation channel (see user_management.cache). Other
+workers check that version at most every ROLE_PERMISSIONS_CHECK_SECONDS and,
+without a shared channel, recompile after ROLE_PERMISSIONS_TIMEOUT.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import user_cache
+
+SUPERUSER_ROLES = ('admin',)
+VERSION_KEY = 'role-permissions'
+
+
+class PermissionTable:
+    """
+    Bit per permission and permission mask per role and per app label.
+    """
+    def __init__(self, version):
+        self.version = version
+        self.compiled_at = self.checked_at = time.monotonic()
+        self.bits = {}
+        self.names = []
+        self.app_masks = {}
+        for app_label, codename in (
+            Permission.objects.order_by('pk').values_list('content_type__app_label', 'codename')
+        ):
+            name = f'{app_label}.{codename}'
+            if name in self.bits:
+                continue
+            self.bits[name] = len(self.names)
+            self.names.append(name)
+            self.app_masks[app_label] = self.app_masks.get(app_label, 0) | 1 << self.bits[name]
+
+        group_roles = {group: role for role, group in settings.ROLE_GROUPS.items()}
+        self.role_masks = {role: 0 for role in settings.ROLE_GROUPS}
+        for group, app_label, codename in (
+            Group.permissions.through.objects.filter(group__name__in=group_roles)
+            .values_list('group__name', 'permission__content_type__app_label', 'permission__codename')
+        ):
+            self.role_masks[group_roles[group]] |= 1 << self.bits[f'{app_label}.{codename}']
+        for role in SUPERUSER_ROLES:
+            self.role_masks[role] = (1 << len(self.names)) - 1
+        self._role_names = {}
+
+    def has_perm(self, role, perm):
+        bit = self.bits.get(perm)
+        return bit is not None and self.role_masks.get(role, 0) >> bit & 1 == 1
+
+    def has_module_perms(self, role, app_label):
+        return self.role_masks.get(role, 0) & self.app_masks.get(app_label, 0) != 0
+
+    def permissions(self, role):
+        names = self._role_names.get(role)
+        if names is None:
+            mask = self.role_masks.get(role, 0)
+            names = self._role_names[role] = frozenset(
+                name for bit, name in enumerate(self.names) if mask >> bit & 1
+            )
+        return names
+
+
+class RolePermissions:
+    """
+    The process-wide PermissionTable, compiled on first use.
+    """
+    def __init__(self):
+        self._table = None
+        self._lock = threading.Lock()
+
+    def _stale(self, table):
+        now = time.monotonic()
+        if now - table.checked_at < settings.ROLE_PERMISSIONS_CHECK_SECONDS:
+            return False
+        if (
+            now - table.compiled_at >= settings.ROLE_PERMISSIONS_TIMEOUT
+            or user_cache.channel.version(VERSION_KEY) != table.version
+        ):
+            return True
+        table.checked_at = now
+        return False
+
+    def table(self):
+        table = self._table
+        if table is None or self._stale(table):
+            with self._lock:
+                # Only one thread recompiles a given stale table
+                if self._table is table:
+                    self._table = PermissionTable(user_cache.channel.version(VERSION_KEY))
+                table = self._table
+        return table
+
+    def has_perm(self, role, perm):
+        return self.table().has_perm(role, perm)
+
+    def has_module_perms(self, role, app_label):
+        return self.table().has_module_perms(role, app_label)
+
+    def permissions(self, role):
+        return self.table().permissions(role)
+
+    def invalidate(self):
+        self._table = None
+        user_cache.channel.publish(VERSION_KEY)
+
+
+role_permissions = RolePermissions()
+
+
+def invalidate_role_permissions():
+    role_permissions.invalidate()
+    # Another request may recompile from the old rows before this commits
+    transaction.on_commit(role_permissions.invalidate)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def _permissions_saved(sender, **kwargs):
+    invalidate_role_permissions()
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def _group_permissions_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_role_permissions()
@@ -0,0 +1,90 @@
+"""
+Optional hash sharding of users across databases.
+
+With USER_SHARDS set (see DATABASE_SHARD_URLS in settings), every user lives
+on the shard picked by a stable hash of its user_id, together with its role
+child row and group/permission links. Three things locate a user:
+
+- the user_id itself, which hashes to the shard with no lookup
+- ShardIndex, a global table on the default database mapping username and
+  user pk to the shard, so authenticate() and session lookups go straight
+  to one shard; its auto-increment id is the user's pk, which keeps pks
+  unique across shards
+- the instance's own database, for saves and deletes of loaded users and
+  for their groups and permissions
+
+Groups and permissions are joined to users on each shard, so every shard
+needs the same auth_group and auth_permission rows as the default database.
+
+Querysets on the user models that are not routed with
+PenggunaQuerySet.locate() or .using() fall through to the default database.
+After appending to DATABASE_SHARD_URLS, run `manage.py rebalance_shards`
+to move users to their new shards.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+APP_LABEL = 'user_management'
+INDEX_MODEL = 'shardindex'
+
+
+def shard_aliases():
+    return getattr(settings, 'USER_SHARDS', [])
+
+
+def shard_for(user_id, shards=None):
+    """
+    Return the shard alias for a user_id (UUID).
+    The hash is independent of the process, unlike hash().
+    """
+    shards = shard_aliases() if shards is None else shards
+    digest = hashlib.blake2b(user_id.bytes, digest_size=8).digest()
+    return shards[int.from_bytes(digest, 'big') % len(shards)]
+
+
+def is_sharded(model):
+    # The user models and their auto-created group/permission through models
+    return model._meta.app_label == APP_LABEL and model._meta.model_name != INDEX_MODEL
+
+
+class ShardRouter:
+    """
+    Route user models to their shard and ShardIndex to the default database.
+    Does nothing while USER_SHARDS is empty. Place before ReplicaRouter.
+    """
+    def _instance_shard(self, hints):
+        instance = hints.get('instance')
+        if instance is None or not is_sharded(type(instance)):
+            return None
+        if instance._state.db in shard_aliases():
+            return instance._state.db
+        user_id = getattr(instance, 'user_id', None)
+        return shard_for(user_id) if user_id is not None else None
+
+    def db_for_read(self, model, **hints):
+        if not shard_aliases():
+            return None
+        if model._meta.app_label == APP_LABEL:
+            if not is_sharded(model):
+                return DEFAULT_DB_ALIAS
+            return self._instance_shard(hints)
+        if model._meta.app_label == 'auth':
+            # user.groups / user.user_permissions are joined on the user's shard
+            return self._instance_shard(hints)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return self.db_for_read(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *shard_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == APP_LABEL and model_name == INDEX_MODEL:
+            return db == DEFAULT_DB_ALIAS
+        return None
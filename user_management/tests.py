@@ -1,3 +1,786 @@
-from django.test import TestCase
+import csv
+import importlib
+import io
+import json
+import struct
+import tempfile
+import uuid
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+from django.apps import apps as django_apps
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import Group, Permission
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.http import HttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+from . import directory, lookup
+from .importer import UserImporter
+from .cache import CacheChannel, UserCache, get_cached_user, user_cache
+from authentication.forms import RegisterForm
+from .models import Pengguna, Admin, Instruktur, ShardIndex
+from .permissions import HasRolePerm, IsInstructor
+from .profiles import EmailTaken, UsernameTaken, get_profile_data, update_profile
+from .rebalance import ShardRebalancer
+from .roles import role_permissions
+from .sharding import ShardRouter, shard_for
+
+
+class RoleQuerySetTest(TestCase):
+    """Test suite for role-aware user loading"""
+    
+    def setUp(self):
+        self.student = Pengguna.objects.create_user(username='student', password='TestPass123!')
+        self.instructor = Instruktur(username='instructor', keahlian=7)
+        self.instructor.set_password('TestPass123!')
+        self.instructor.save()
+        self.admin = Admin(username='admin')
+        self.admin.set_password('TestPass123!')
+        self.admin.save()
+    
+    def test_select_subclasses_single_query(self):
+        """Test every row comes back as its role subclass in one query"""
+        with self.assertNumQueries(1):
+            users = {u.username: u for u in Pengguna.objects.select_subclasses()}
+            self.assertIs(type(users['student']), Pengguna)
+            self.assertIsInstance(users['instructor'], Instruktur)
+            self.assertIsInstance(users['admin'], Admin)
+            self.assertEqual(users['instructor'].keahlian, 7)
+            self.assertEqual(users['instructor'].username, 'instructor')
+            self.assertEqual(users['admin'].admin_id, self.admin.admin_id)
+    
+    def test_natural_key_returns_subclass(self):
+        """Test authenticate() lookups return the role subclass"""
+        user = Pengguna.objects.get_by_natural_key('instructor')
+        self.assertIsInstance(user, Instruktur)
+    
+    def test_profile_data_without_queries(self):
+        """Test profile projection reads role fields from the loaded instance"""
+        user = Pengguna.objects.select_subclasses().get(username='instructor')
+        with self.assertNumQueries(0):
+            data = get_profile_data(user)
+        self.assertEqual(data['keahlian'], 7)
+        self.assertEqual(data['instruktur_id'], str(self.instructor.instruktur_id))
+    
+    def test_profile_get_query_count(self):
+        """Test a profile GET loads the user once, joined with its role table"""
+        self.client.login(username='admin', password='TestPass123!')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('user_management:profile'))
+        self.assertEqual(response.status_code, 200)
+        user_queries = [q for q in ctx.captured_queries if 'user_management_pengguna' in q['sql']]
+        self.assertEqual(len(user_queries), 1)
+        self.assertEqual(response.context['user']['admin_id'], str(self.admin.admin_id))
+    
+    def test_instructor_profile_update(self):
+        """Test keahlian updates are saved through the loaded subclass"""
+        self.client.login(username='instructor', password='TestPass123!')
+        self.client.post(reverse('user_management:profile'), {'keahlian': 9, 'first_name': 'New'})
+        instructor = Instruktur.objects.get(pk=self.instructor.pk)
+        self.assertEqual(instructor.keahlian, 9)
+        self.assertEqual(instructor.first_name, 'New')
+    
+    def test_profile_json(self):
+        """Test JSON clients get the profile payload and JSON update results"""
+        self.client.login(username='instructor', password='TestPass123!')
+        url = reverse('user_management:profile')
+        response = self.client.get(url, headers={'Accept': 'application/json'})
+        self.assertEqual(response.json(), get_profile_data(self.instructor))
+        
+        response = self.client.post(
+            url, {'keahlian': 9, 'username': 'admin'},
+            content_type='application/json', headers={'Accept': 'application/json'},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'success': False, 'message': 'Username already taken'})
+        
+        response = self.client.post(
+            url, {'keahlian': 9}, content_type='application/json', headers={'Accept': 'application/json'},
+        )
+        self.assertEqual(response.json(), {'success': True, 'message': 'Profile updated successfully'})
+        self.assertEqual(Instruktur.objects.get(pk=self.instructor.pk).keahlian, 9)
+
+
+class ImportUsersTest(TestCase):
+    """Test suite for bulk user import"""
+    
+    CSV = (
+        "username,password,email,first_name,last_name,role,keahlian\n"
+        "alice,TestPass123!,alice@test.com,Alice,A,student,\n"
+        "bob,TestPass123!,bob@test.com,Bob,B,instructor,4\n"
+        "carol,TestPass123!,carol@test.com,Carol,C,instructor,\n"
+        "dave,TestPass123!,dave@test.com,Dave,D,admin,\n"
+        "alice,TestPass123!,alice2@test.com,Alice,A,student,\n"
+    )
+    
+    def test_import_command(self):
+        """Test valid rows are created and invalid rows are reported"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as f:
+            f.write(self.CSV)
+            f.flush()
+            out, err = io.StringIO(), io.StringIO()
+            call_command('import_users', f.name, '--workers', '2', stdout=out, stderr=err)
+        
+        self.assertEqual(Pengguna.objects.count(), 2)
+        self.assertTrue(Pengguna.objects.get(username='alice').check_password('TestPass123!'))
+        bob = Pengguna.objects.select_subclasses().get(username='bob')
+        self.assertIsInstance(bob, Instruktur)
+        self.assertEqual(bob.keahlian, 4)
+        self.assertTrue(bob.check_password('TestPass123!'))
+        
+        errors = err.getvalue()
+        self.assertIn('line 4', errors)  # carol: instructor without keahlian
+        self.assertIn('line 5', errors)  # dave: admin role rejected
+        self.assertIn('line 6', errors)  # duplicate alice
+        self.assertIn('Imported 2 users', out.getvalue())
+    
+    def test_import_endpoint_admin_only(self):
+        """Test the upload endpoint streams results and requires an admin"""
+        url = reverse('user_management:import_users')
+        lines = [
+            json.dumps({'username': 'erin', 'password': 'TestPass123!', 'email': 'erin@test.com',
+                        'first_name': 'Erin', 'last_name': 'E', 'role': 'student'}),
+            'not json',
+        ]
+        upload = SimpleUploadedFile('users.jsonl', '\n'.join(lines).encode())
+        
+        student = Pengguna.objects.create_user(username='student', password='TestPass123!')
+        self.client.force_login(student)
+        self.assertEqual(self.client.post(url, {'file': upload}).status_code, 403)
+        
+        admin = Admin(username='admin')
+        admin.save()
+        self.client.force_login(admin)
+        upload.seek(0)
+        response = self.client.post(url, {'file': upload})
+        events = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(events[0], {'line': 2, 'errors': {'__all__': ['Malformed row.']}})
+        self.assertEqual(events[-1]['summary']['created'], 1)
+        self.assertTrue(Pengguna.objects.filter(username='erin').exists())
+
+
+
+class ExportUsersTest(TestCase):
+    """Test suite for streaming user export"""
+    
+    def setUp(self):
+        self.admin = Admin(username='admin', email='admin@test.com')
+        self.admin.save()
+        Instruktur.objects.create(username='bob', email='bob@test.com', keahlian=4)
+        for name in ('alice', 'carol', 'dave'):
+            Pengguna.objects.create_user(username=name, email=f'{name}@test.com', password='TestPass123!')
+    
+    def test_export_command_csv(self):
+        """Test the command writes every user with role columns in keyset batches"""
+        out = io.StringIO()
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('export_users', '--batch-size', '2', stdout=out, stderr=io.StringIO())
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        self.assertEqual([row['username'] for row in rows], ['admin', 'bob', 'alice', 'carol', 'dave'])
+        self.assertEqual(rows[1]['keahlian'], '4')
+        self.assertEqual(rows[1]['role'], 'instructor')
+        self.assertTrue(rows[0]['admin_id'])
+        self.assertEqual((rows[2]['keahlian'], rows[2]['admin_id'], rows[2]['last_login']), ('', '', ''))
+        # One query per batch of 2, each starting after the last id
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertIn('"id" >', ctx.captured_queries[1]['sql'])
+    
+    def test_export_endpoint_admin_only(self):
+        """Test the endpoint streams JSONL to admins only"""
+        url = reverse('user_management:export_users', args=['jsonl'])
+        self.client.force_login(Pengguna.objects.get(username='alice'))
+        self.assertEqual(self.client.get(url).status_code, 403)
+        
+        self.client.force_login(self.admin)
+        response = self.client.get(url)
+        self.assertIn('users.jsonl', response['Content-Disposition'])
+        users = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(users), 5)
+        self.assertEqual(users[1]['keahlian'], 4)
+        self.assertEqual(self.client.get(reverse('user_management:export_users', args=['xml'])).status_code, 400)
+    
+    def test_admin_export_action(self):
+        """Test the changelist action exports only the selected users"""
+        self.client.force_login(self.admin)
+        selected = Pengguna.objects.filter(username__in=['bob', 'carol']).values_list('pk', flat=True)
+        response = self.client.post(reverse('admin:user_management_pengguna_changelist'), {
+            'action': 'export_csv', '_selected_action': [str(pk) for pk in selected],
+        })
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row['username'] for row in rows], ['bob', 'carol'])
+    
+    def test_csv_escapes_formulas(self):
+        """Test CSV cells that a spreadsheet would run as formulas are kept as text"""
+        Pengguna.objects.create_user(
+            username='+mallory', first_name='=HYPERLINK("http://evil")', last_name='-2+3', email='@sum@test.com',
+        )
+        out = io.StringIO()
+        call_command('export_users', stdout=out, stderr=io.StringIO())
+        row = list(csv.DictReader(io.StringIO(out.getvalue())))[-1]
+        self.assertEqual(
+            (row['username'], row['first_name'], row['last_name'], row['email']),
+            ("'+mallory", '\'=HYPERLINK("http://evil")', "'-2+3", "'@sum@test.com"),
+        )
+        # JSONL is not opened in spreadsheets and stays as stored
+        out = io.StringIO()
+        call_command('export_users', '--format', 'jsonl', stdout=out, stderr=io.StringIO())
+        self.assertEqual(json.loads(out.getvalue().splitlines()[-1])['username'], '+mallory')
+    
+    def test_export_rejects_empty_batches(self):
+        """Test a batch size below 1 is an error instead of an empty export"""
+        with self.assertRaises(CommandError):
+            call_command('export_users', '--batch-size', '0', stdout=io.StringIO(), stderr=io.StringIO())
+
+
+
+class UserLookupTest(TestCase):
+    """Test suite for the batch public profile lookup"""
+    
+    def setUp(self):
+        self.alice = Pengguna.objects.create_user(username='alice', first_name='Alice', password='TestPass123!')
+        self.bob = Instruktur.objects.create(username='bob', first_name='Bób', keahlian=4)
+        self.unknown = uuid.uuid4()
+        self.ids = [str(self.bob.user_id), str(self.unknown), str(self.alice.user_id), str(self.bob.user_id)]
+        self.client.force_login(self.alice)
+    
+    def post(self, ids, **extra):
+        return self.client.post(reverse('user_management:lookup_users'), {'user_ids': ids},
+                                content_type='application/json', **extra)
+    
+    def test_single_query_then_cached(self):
+        """Test misses are loaded with one query and served from the cache afterwards"""
+        ids = lookup.parse_ids(self.ids)
+        with self.assertNumQueries(1):
+            profiles = lookup.lookup(ids)
+        self.assertEqual(list(profiles), [self.bob.user_id, self.unknown, self.alice.user_id])
+        with self.assertNumQueries(0):
+            self.assertEqual(lookup.lookup(ids), profiles)
+        
+        self.bob.first_name = 'Robert'
+        self.bob.save()
+        self.assertIn('"Robert"', lookup.lookup(ids)[self.bob.user_id][0])
+    
+    def test_json_response(self):
+        """Test JSON lists users in request order and the unknown ids"""
+        data = self.post(self.ids).json()
+        self.assertEqual([user['username'] for user in data['users']], ['bob', 'alice'])
+        self.assertEqual(data['users'][0]['keahlian'], 4)
+        self.assertNotIn('keahlian', data['users'][1])
+        self.assertNotIn('email', data['users'][1])
+        self.assertEqual(data['missing'], [str(self.unknown)])
+    
+    def test_ndjson_and_binary_responses(self):
+        """Test the Accept header selects NDJSON or the binary format"""
+        response = self.post(self.ids, HTTP_ACCEPT='application/x-ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(line)['username'] for line in response.content.splitlines()], ['bob', 'alice'])
+        
+        body = self.post(self.ids, HTTP_ACCEPT='application/vnd.auth-service.users').content
+        magic, count = lookup.BINARY_HEADER.unpack_from(body)
+        self.assertEqual((magic, count), (b'USRS', 2))
+        user_id, keahlian, *lengths = lookup.BINARY_RECORD.unpack_from(body, lookup.BINARY_HEADER.size)
+        offset = lookup.BINARY_HEADER.size + lookup.BINARY_RECORD.size
+        username, first_name = struct.unpack_from(f'{lengths[0]}s{lengths[1]}s', body, offset)
+        self.assertEqual((uuid.UUID(bytes=user_id), keahlian), (self.bob.user_id, 4))
+        self.assertEqual((username, first_name.decode()), (b'bob', 'Bób'))
+    
+    def test_rejects_bad_requests(self):
+        """Test anonymous callers, malformed ids and oversized batches are refused"""
+        with override_settings(USER_LOOKUP_MAX_IDS=2):
+            self.assertEqual(self.post(self.ids).status_code, 400)
+        self.assertEqual(self.post(['not-a-uuid']).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.post(self.ids).status_code, 401)
+    
+    def test_in_flight_ids_are_claimed_once(self):
+        """Test concurrent loads of the same id wait for the first one"""
+        in_flight = lookup.InFlight()
+        owned, waiting = in_flight.claim([self.unknown])
+        self.assertEqual((owned, waiting), ([self.unknown], []))
+        owned, waiting = in_flight.claim([self.unknown, self.alice.user_id])
+        self.assertEqual(owned, [self.alice.user_id])
+        self.assertFalse(waiting[0].is_set())
+        in_flight.release([self.unknown])
+        self.assertTrue(waiting[0].is_set())
+
+
+
+class CaseInsensitiveLoginTest(TestCase):
+    """Test suite for login by username or email and case-insensitive uniqueness"""
+    
+    def setUp(self):
+        self.alice = Pengguna.objects.create_user(username='Alice', email='Alice@Example.com', password='TestPass123!')
+        self.bob = Instruktur.objects.create(username='bob', email='bob@example.com', keahlian=3)
+        self.bob.set_password('TestPass123!')
+        self.bob.save()
+    
+    def registration(self, **fields):
+        data = {'username': 'carol', 'email': 'carol@example.com', 'password': 'TestPass123!',
+                'password2': 'TestPass123!', 'first_name': 'Carol', 'last_name': 'C', 'role': 'student'}
+        return RegisterForm(data={**data, **fields})
+    
+    def test_login_by_username_or_email_in_any_case(self):
+        """Test authenticate() accepts either identifier and returns the role subclass"""
+        self.assertEqual(authenticate(username='aLiCe', password='TestPass123!'), self.alice)
+        self.assertEqual(authenticate(username='alice@example.COM', password='TestPass123!'), self.alice)
+        user = authenticate(username='BOB@example.com', password='TestPass123!')
+        self.assertIsInstance(user, Instruktur)
+        self.assertIsNone(authenticate(username='alice@example.com', password='wrong'))
+    
+    def test_username_shaped_like_email_does_not_shadow_it(self):
+        """Test an older username equal to another user's email can't take over that login"""
+        # create_user() skips validators, like rows from before usernames lost '@'
+        other = Pengguna.objects.create_user(username='bob@example.com', password='OtherPass123!')
+        self.assertEqual(Pengguna.objects.get_by_login('BOB@example.com'), [other, self.bob])
+        self.assertEqual(authenticate(username='BOB@example.com', password='TestPass123!'), self.bob)
+        self.assertEqual(authenticate(username='BOB@example.com', password='OtherPass123!'), other)
+        self.assertIsNone(authenticate(username='BOB@example.com', password='wrong'))
+    
+    def test_usernames_reject_at_sign(self):
+        """Test registration and profile updates refuse usernames containing '@'"""
+        form = self.registration(username='bob@example.com')
+        self.assertFalse(form.is_valid())
+        self.assertIn('username', form.errors)
+        with self.assertRaises(ValidationError):
+            update_profile(self.alice, {'username': 'bob@example.com'})
+        self.assertEqual(Pengguna.objects.get(pk=self.alice.pk).username, 'Alice')
+    
+    def test_migration_refuses_case_duplicates(self):
+        """Test migration 0005 lists case-only duplicates instead of failing on the index"""
+        migration = importlib.import_module('user_management.migrations.0005_case_insensitive_login')
+        schema_editor = SimpleNamespace(connection=connection)
+        migration.check_duplicates(django_apps, schema_editor)
+        # SQLite DDL is transactional, so the test's rollback restores the index
+        with connection.cursor() as cursor:
+            cursor.execute('DROP INDEX pengguna_username_ci_unique')
+        Pengguna.objects.create_user(username='ALICE')
+        with self.assertRaisesMessage(RuntimeError, 'Pengguna.username: alice'):
+            migration.check_duplicates(django_apps, schema_editor)
+    
+    def test_registration_rejects_case_variants(self):
+        """Test registration probes each index once and reports field errors"""
+        with self.assertNumQueries(2):
+            self.assertTrue(self.registration().is_valid())
+        form = self.registration(username='ALICE', email='alice@EXAMPLE.com')
+        self.assertFalse(form.is_valid())
+        self.assertIn('username', form.errors)
+        self.assertIn('email', form.errors)
+    
+    def test_database_enforces_case_insensitive_uniqueness(self):
+        """Test the functional unique indexes reject case variants"""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Pengguna.objects.create_user(username='ALICE')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Pengguna.objects.create_user(username='dave', email='BOB@EXAMPLE.COM')
+        # Users without an email don't collide
+        Pengguna.objects.create_user(username='erin')
+        Pengguna.objects.create_user(username='frank')
+    
+    def test_profile_updates_reject_taken_identifiers(self):
+        """Test profile updates report the username or email that is taken"""
+        with self.assertRaises(UsernameTaken):
+            update_profile(self.bob, {'username': 'ALICE'})
+        with self.assertRaises(EmailTaken):
+            update_profile(self.bob, {'email': 'alice@example.com'})
+        user = update_profile(self.bob, {'email': 'Bob@Example.com'})
+        self.assertEqual(user.email, 'Bob@Example.com')
+
+
+
+class UserDirectoryTest(TestCase):
+    """Test suite for the keyset-paginated user directory"""
+    
+    def setUp(self):
+        self.admin = Admin(username='admin', first_name='Ada', email='ada@example.com')
+        self.admin.save()
+        self.instructor = Instruktur.objects.create(username='ibrahim', first_name='Alicia', last_name='Rahman', keahlian=5)
+        Instruktur.objects.create(username='irene', first_name='Irene', keahlian=2)
+        for name in ('alice', 'bambang', 'citra', 'dewi'):
+            Pengguna.objects.create_user(username=name, first_name=name.title(), email=f'{name}@example.com')
+        Pengguna.objects.filter(username='dewi').update(date_joined=timezone.now() - timedelta(days=30))
+        self.url = reverse('user_management:directory')
+    
+    def walk(self, **params):
+        pages, cursor = [], None
+        while True:
+            data = self.client.get(self.url, {**params, **({'cursor': cursor} if cursor else {})}).json()
+            pages.append([user['username'] for user in data['results']])
+            cursor = data['next']
+            if cursor is None:
+                return pages
+    
+    def test_pages_follow_role_and_id(self):
+        """Test every user appears once, in (role, id) order, with role columns"""
+        self.client.force_login(self.admin)
+        pages = self.walk(size=2)
+        self.assertEqual(pages, [['admin', 'ibrahim'], ['irene', 'alice'], ['bambang', 'citra'], ['dewi']])
+        
+        data = self.client.get(self.url, {'size': 2}).json()
+        self.assertIn('admin_id', data['results'][0])
+        self.assertEqual(data['results'][1]['keahlian'], 5)
+    
+    def test_page_queries_do_not_grow(self):
+        """Test a later page costs the same queries as the first"""
+        alice, irene = (directory.encode_cursor(Pengguna.objects.get(username=name)) for name in ('alice', 'irene'))
+        with self.assertNumQueries(1):
+            directory.directory_page(size=1)
+        with self.assertNumQueries(1):
+            directory.directory_page(alice, size=1)
+        # Moving on to the next role takes one more range query
+        with self.assertNumQueries(2):
+            directory.directory_page(irene, size=1)
+    
+    def test_filters_and_prefix_search(self):
+        """Test role, date and prefix filters, with every search term required"""
+        self.client.force_login(self.instructor)
+        self.assertEqual(self.walk(q='ali'), [['ibrahim', 'alice']])
+        self.assertEqual(self.walk(q='ALI rah'), [['ibrahim']])
+        self.assertEqual(self.walk(q='lice'), [[]])
+        self.assertEqual(self.walk(q='ada@'), [['admin']])
+        self.assertEqual(self.walk(role='student', joined_before=(timezone.now() - timedelta(days=1)).date().isoformat()), [['dewi']])
+    
+    def test_access_and_bad_parameters(self):
+        """Test students are refused and bad cursors or dates are rejected"""
+        self.client.force_login(Pengguna.objects.get(username='alice'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_login(self.admin)
+        self.assertEqual(self.client.get(self.url, {'cursor': 'garbage'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'joined_after': 'yesterday'}).status_code, 400)
+    
+    def test_admin_changelist_search(self):
+        """Test the admin changelist searches by prefix"""
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('admin:user_management_pengguna_changelist'), {'q': 'bam'})
+        self.assertContains(response, 'bambang')
+        self.assertNotContains(response, 'citra@example.com')
+
+
+class UserCacheTest(TestCase):
+    """Test suite for the per-process authenticated user cache"""
+    
+    def setUp(self):
+        user_cache.clear()
+        self.instructor = Instruktur(username='instructor', keahlian=3)
+        self.instructor.set_password('TestPass123!')
+        self.instructor.save()
+        self.client.force_login(self.instructor)
+    
+    def test_steady_state_requests_skip_user_queries(self):
+        """Test repeat requests serve request.user from the cache"""
+        url = reverse('user_management:profile')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.context['user']['keahlian'], 3)
+        self.assertFalse([q for q in ctx.captured_queries if 'user_management_pengguna' in q['sql']])
+    
+    def test_save_invalidates(self):
+        """Test saving a subclass instance drops its cache entry"""
+        get_cached_user(self.instructor.pk)
+        instructor = Instruktur.objects.get(pk=self.instructor.pk)
+        instructor.keahlian = 8
+        instructor.save()
+        self.assertEqual(get_cached_user(self.instructor.pk).keahlian, 8)
+    
+    def test_password_change_invalidates(self):
+        """Test a password change ends sessions served from the cache"""
+        url = reverse('user_management:profile')
+        self.client.get(url)
+        user = Pengguna.objects.get(pk=self.instructor.pk)
+        user.set_password('NewPass456!')
+        user.save()
+        self.assertEqual(self.client.get(url).status_code, 401)
+    
+    def test_cache_channel_invalidates_other_workers(self):
+        """Test a published version bump invalidates entries cached elsewhere"""
+        other_worker = UserCache(max_entries=10, timeout=60, channel=CacheChannel('default'))
+        other_worker.set(self.instructor.pk, self.instructor)
+        self.assertIsNotNone(other_worker.get(self.instructor.pk))
+        CacheChannel('default').publish(self.instructor.pk)
+        self.assertIsNone(other_worker.get(self.instructor.pk))
+    
+    def test_invalidation_is_shared_by_default(self):
+        """Test workers share invalidations unless USER_CACHE_INVALIDATION is 'local'"""
+        self.assertIsInstance(user_cache.channel, CacheChannel)
+    
+    def test_evicted_version_invalidates(self):
+        """Test entries are dropped when the shared cache loses their version"""
+        channel = CacheChannel('default')
+        other_worker = UserCache(max_entries=10, timeout=60, channel=channel)
+        other_worker.set(self.instructor.pk, self.instructor)
+        channel.cache.delete(f'{channel.key_prefix}{self.instructor.pk}')
+        self.assertIsNone(other_worker.get(self.instructor.pk))
+
+
+class ProfileETagTest(TestCase):
+    """Test suite for profile ETags and conditional requests"""
+    
+    def setUp(self):
+        user_cache.clear()
+        self.instructor = Instruktur(username='instructor', keahlian=3)
+        self.instructor.set_password('TestPass123!')
+        self.instructor.save()
+        self.client.force_login(self.instructor)
+        self.url = reverse('user_management:profile')
+        self.json = {'Accept': 'application/json'}
+    
+    def test_save_bumps_version(self):
+        """Test full saves bump the profile version and update_fields saves don't"""
+        version = Pengguna.objects.get(pk=self.instructor.pk).profile_version
+        self.instructor.save(update_fields=['last_login'])
+        self.instructor.save()
+        self.assertEqual(Pengguna.objects.get(pk=self.instructor.pk).profile_version, version + 1)
+    
+    def test_if_none_match_returns_304(self):
+        """Test a matching If-None-Match is answered without user queries or rendering"""
+        etag = self.client.get(self.url, headers=self.json)['ETag']
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, headers={**self.json, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse([q for q in ctx.captured_queries if 'user_management_pengguna' in q['sql']])
+        
+        # HTML and JSON are separate representations
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+    
+    def test_html_etag_changes_with_csrf_secret(self):
+        """Test a page cached before a re-login is rendered again with the new CSRF token"""
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': etag}).status_code, 304)
+        self.client.logout()
+        self.client.post(reverse('authentication:login'), {'username': 'instructor', 'password': 'TestPass123!'})
+        response = self.client.get(self.url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_if_match_conditional_update(self):
+        """Test updates based on a stale ETag are rejected with 412"""
+        etag = self.client.get(self.url, headers=self.json)['ETag']
+        response = self.client.post(
+            self.url, {'keahlian': 5}, content_type='application/json',
+            headers={**self.json, 'If-Match': etag},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        
+        response = self.client.post(
+            self.url, {'keahlian': 9}, content_type='application/json',
+            headers={**self.json, 'If-Match': etag},
+        )
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(Instruktur.objects.get(pk=self.instructor.pk).keahlian, 5)
+        
+        # The old ETag no longer matches, so the new profile is served
+        response = self.client.get(self.url, headers={**self.json, 'If-None-Match': etag})
+        self.assertEqual(response.json()['keahlian'], 5)
+    
+    def test_duplicate_username_rejected_by_database(self):
+        """Test username uniqueness is enforced by the update itself"""
+        Pengguna.objects.create_user(username='taken')
+        response = self.client.post(self.url, {'username': 'taken'}, content_type='application/json', headers=self.json)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'Username already taken')
+
+
+@override_settings(USER_SHARDS=['default'])
+class ShardingTest(TestCase):
+    """Test suite for hash-sharded user storage"""
+    
+    def setUp(self):
+        user_cache.clear()
+        self.instructor = Instruktur(username='instructor', keahlian=3)
+        self.instructor.set_password('TestPass123!')
+        self.instructor.save()
+    
+    def test_shard_for_is_stable_and_spread(self):
+        """Test placement depends only on user_id and spreads users evenly"""
+        shards = ['shard_1', 'shard_2', 'shard_3']
+        user_id = uuid.UUID('12345678-1234-5678-1234-567812345678')
+        self.assertEqual(shard_for(user_id, shards), shard_for(uuid.UUID(str(user_id)), shards))
+        counts = {shard: 0 for shard in shards}
+        for _ in range(3000):
+            counts[shard_for(uuid.uuid4(), shards)] += 1
+        self.assertTrue(all(800 < count < 1200 for count in counts.values()), counts)
+    
+    def test_new_users_are_indexed(self):
+        """Test the index allocates the pk and records the shard"""
+        entry = ShardIndex.objects.get(username='instructor')
+        self.assertEqual(entry.pk, self.instructor.pk)
+        self.assertEqual(entry.shard, 'default')
+        self.assertEqual(ShardRouter().db_for_write(Instruktur, instance=self.instructor), 'default')
+    
+    def test_authenticate_through_index(self):
+        """Test authenticate() finds the shard by username and loads the subclass"""
+        with self.assertNumQueries(2):
+            user = Pengguna.objects.get_by_natural_key('instructor')
+        self.assertIsInstance(user, Instruktur)
+        self.assertEqual(authenticate(username='instructor', password='TestPass123!'), user)
+        self.assertFalse(Pengguna.objects.locate(username='missing').exists())
+    
+    def test_username_changes_and_deletes_update_index(self):
+        """Test the index follows renames and deletes"""
+        self.instructor.username = 'renamed'
+        self.instructor.save()
+        self.assertTrue(ShardIndex.objects.filter(username='renamed').exists())
+        self.instructor.delete()
+        self.assertFalse(ShardIndex.objects.exists())
+    
+    def test_rebalance_finds_misplaced_users(self):
+        """Test the rebalancer streams the index and picks users on the wrong shard"""
+        ShardIndex.objects.filter(pk=self.instructor.pk).update(shard='retired')
+        Pengguna.objects.create_user(username='student')
+        rebalancer = ShardRebalancer(batch_size=1, dry_run=True)
+        events = list(rebalancer.run())
+        self.assertEqual(len(events), 2)
+        self.assertEqual(rebalancer.summary()['scanned'], 2)
+        self.assertEqual(rebalancer.summary()['moved'], 1)
+
+
+@override_settings(USER_SHARDS=['spare_1', 'spare_2'])
+class ShardMoveTest(TestCase):
+    """Test suite for users spread over two real shard databases"""
+    databases = {'default', 'spare_1', 'spare_2'}
+    
+    def setUp(self):
+        user_cache.clear()
+        # Groups are joined to users on each shard, so every shard has the same rows
+        for alias in self.databases:
+            Group.objects.using(alias).create(pk=1, name='mentors')
+    
+    def user_id_on(self, shard, shards=('spare_1', 'spare_2')):
+        while True:
+            user_id = uuid.uuid4()
+            if shard_for(user_id, list(shards)) == shard:
+                return user_id
+    
+    def test_users_are_stored_on_their_shard(self):
+        """Test each user's rows go to the shard its user_id hashes to"""
+        first = Pengguna.objects.create_user(username='first', user_id=self.user_id_on('spare_1'))
+        second = Pengguna.objects.create_user(username='second', user_id=self.user_id_on('spare_2'))
+        self.assertTrue(Pengguna.objects.using('spare_1').filter(pk=first.pk).exists())
+        self.assertFalse(Pengguna.objects.using('spare_2').filter(pk=first.pk).exists())
+        self.assertTrue(Pengguna.objects.using('spare_2').filter(pk=second.pk).exists())
+        self.assertFalse(Pengguna.objects.using('default').exists())
+        self.assertEqual(Pengguna.objects.get_by_natural_key('second'), second)
+    
+    def test_rebalance_moves_user_rows(self):
+        """Test a move copies the user, role row and links, then deletes the originals"""
+        user_id = self.user_id_on('spare_2')
+        with override_settings(USER_SHARDS=['spare_1']):
+            instructor = Instruktur(username='instructor', user_id=user_id, keahlian=3)
+            instructor.set_password('TestPass123!')
+            instructor.save()
+            instructor.groups.add(Group.objects.using('spare_1').get(pk=1))
+            stays = Pengguna.objects.create_user(username='stays', user_id=self.user_id_on('spare_1'))
+        
+        rebalancer = ShardRebalancer()
+        list(rebalancer.run())
+        self.assertEqual(rebalancer.summary()['moved'], 1)
+        
+        self.assertEqual(ShardIndex.objects.get(pk=instructor.pk).shard, 'spare_2')
+        moved = Instruktur.objects.using('spare_2').get(pk=instructor.pk)
+        self.assertEqual(moved.keahlian, 3)
+        self.assertEqual(list(moved.groups.values_list('name', flat=True)), ['mentors'])
+        self.assertFalse(Pengguna.objects.using('spare_1').filter(pk=instructor.pk).exists())
+        self.assertFalse(Instruktur.objects.using('spare_1').filter(pk=instructor.pk).exists())
+        self.assertFalse(Pengguna.groups.through.objects.using('spare_1').filter(pengguna_id=instructor.pk).exists())
+        self.assertTrue(Pengguna.objects.using('spare_1').filter(pk=stays.pk).exists())
+        self.assertEqual(authenticate(username='instructor', password='TestPass123!'), moved)
+    
+    def test_failed_shard_save_leaves_no_index_row(self):
+        """Test a user whose shard rejects the insert is removed from the index"""
+        Pengguna.objects.create_user(username='first', email='same@example.com', user_id=self.user_id_on('spare_1'))
+        user = Pengguna(username='second', email='SAME@example.com', user_id=self.user_id_on('spare_1'))
+        with self.assertRaises(IntegrityError), transaction.atomic(using='spare_1'):
+            user.save()
+        self.assertIsNone(user.pk)
+        self.assertFalse(ShardIndex.objects.filter(username='second').exists())
+        user.email = 'second@example.com'
+        user.save()
+        self.assertEqual(ShardIndex.objects.get(username='second').pk, user.pk)
+    
+    def test_failed_import_removes_committed_shard_rows(self):
+        """Test an import chunk that fails on a later shard deletes the users already on earlier shards"""
+        users = [
+            Pengguna(username='first', email='first@example.com', user_id=self.user_id_on('spare_1')),
+            Pengguna(username='second', email='second@example.com', user_id=self.user_id_on('spare_2')),
+        ]
+        importer = UserImporter(workers=0)
+        insert = importer._insert
+        
+        def insert_or_fail(shard_users, keahlian, using):
+            if using == 'spare_2':
+                raise IntegrityError('spare_2 rejected the chunk')
+            insert(shard_users, keahlian, using)
+        
+        with mock.patch.object(importer, '_insert', insert_or_fail), self.assertRaises(IntegrityError):
+            importer._insert_sharded(users, [None, None])
+        self.assertFalse(Pengguna.objects.using('spare_1').exists())
+        self.assertFalse(ShardIndex.objects.exists())
+
+
+class RolePermissionTest(TestCase):
+    """Test suite for role-based permissions"""
+    
+    def setUp(self):
+        role_permissions.invalidate()
+        self.view_user = Permission.objects.get(codename='view_pengguna')
+        Group.objects.create(name='Students').permissions.add(self.view_user)
+        self.student = Pengguna.objects.create_user(username='student', password='TestPass123!')
+        self.instructor = Instruktur.objects.create_user(username='instructor', password='TestPass123!', keahlian=3)
+    
+    def test_role_permissions_without_queries(self):
+        """Test permission checks come from the role and cost no queries once compiled"""
+        self.student.has_perm('user_management.view_pengguna')
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(self.student.has_perm('user_management.view_pengguna'))
+            self.assertTrue(self.student.has_module_perms('user_management'))
+            self.assertFalse(self.student.has_perm('user_management.delete_pengguna'))
+            self.assertFalse(self.instructor.has_perm('user_management.view_pengguna'))
+            self.assertEqual(self.student.get_all_permissions(), {'user_management.view_pengguna'})
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertTrue(role_permissions.has_perm('admin', 'user_management.delete_pengguna'))
+    
+    def test_group_changes_invalidate(self):
+        """Test changing a role group's permissions takes effect immediately"""
+        self.assertFalse(self.instructor.has_perm('user_management.view_pengguna'))
+        Group.objects.create(name='Instructors').permissions.add(self.view_user)
+        self.assertTrue(self.instructor.has_perm('user_management.view_pengguna'))
+        Group.objects.get(name='Students').permissions.clear()
+        self.assertFalse(self.student.has_perm('user_management.view_pengguna'))
+    
+    def test_drf_permission_classes(self):
+        """Test IsInstructor and HasRolePerm allow and deny by role"""
+        class RoleView(APIView):
+            permission_classes = [IsInstructor | HasRolePerm.require('user_management.view_pengguna')]
+            
+            def get(self, request):
+                return HttpResponse()
+        
+        class RequiredPermsView(RoleView):
+            permission_classes = [HasRolePerm]
+            required_perms = ['user_management.delete_pengguna']
+        
+        factory = APIRequestFactory()
+        admin = Admin.objects.create_user(username='admin', password='TestPass123!')
+        for view, user, status_code in (
+            (RoleView, self.instructor, 200),
+            (RoleView, self.student, 200),
+            (RequiredPermsView, self.student, 403),
+            (RequiredPermsView, admin, 200),
+        ):
+            request = factory.get('/')
+            force_authenticate(request, user)
+            response = view.as_view()(request)
+            self.assertEqual(response.status_code, status_code, (view.__name__, user.username))
 
-# Create your tests here.
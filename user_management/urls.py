@@ -1,10 +1,18 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
 app_name = 'user_management'
 
+# ASGI deployments serve the native async versions of the profile views
+_views = async_views if settings.ASYNC_VIEWS else views
+
 urlpatterns = [
-    path('profile/', views.UserProfileView.as_view(), name='profile'),
-    path('password/change/', views.ChangePasswordView.as_view(), name='change_password'),
+    path('profile/', _views.UserProfileView.as_view(), name='profile'),
+    path('password/change/', _views.ChangePasswordView.as_view(), name='change_password'),
     path('account/delete/', views.DeleteAccountView.as_view(), name='delete_account'),
+    path('import/', views.UserImportView.as_view(), name='import_users'),
+    path('directory/', views.UserDirectoryView.as_view(), name='directory'),
+    path('lookup/', views.UserLookupView.as_view(), name='lookup_users'),
+    path('export/<str:fmt>/', views.UserExportView.as_view(), name='export_users'),
 ]
@@ -1,12 +1,25 @@
-from django.http import JsonResponse
+import json
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import update_session_auth_hash, logout
-from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib import messages
-from .models import Pengguna, Admin, Instruktur
+from auth_service.negotiation import ObjectEncoded, json_response, negotiated, wants_json
+from authentication.throttling import PasswordChangeThrottle
+from security.sessions import logout_other_sessions
+from .forms import PasswordChangeForm
+from .exporter import EXPORT_FORMATS, UserExporter
+from .importer import UserImporter, read_rows, text_stream
+from . import directory, lookup
+from .models import Pengguna
+from . import profiles
+from .profiles import get_profile_data
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.views import APIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from .permissions import IsAdminRole, IsInstructor
 
+@negotiated
 class UserProfileView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -16,72 +29,66 @@ class UserProfileView(APIView):
         - Include user metadata
         - Handle privacy settings
         """
-        # Get detailed user profile    
-        user = get_object_or_404(Pengguna, id=request.user.id)
+        as_json = wants_json(request)
         
-        # Basic user data available for all users
-        data = {
-            'username': user.username,
-            'email': user.email,
-            'first_name': user.first_name,
-            'last_name': user.last_name,
-            'role': user.role,
-            'user_id': str(user.user_id),
-        }
+        # request.user comes from the user cache, so a matching
+        # If-None-Match is answered without queries or rendering
+        etag, response = profiles.conditional_get(request, as_json)
+        if response is not None:
+            return response
         
-        # Add role-specific data
-        if user.role == 'admin':
-            admin = Admin.objects.get(id=user.id)
-            data['admin_id'] = str(admin.admin_id)
-            data['is_staff'] = admin.is_staff
-            data['is_superuser'] = admin.is_superuser
+        # request.user is already the role subclass loaded by RoleModelBackend
+        data = get_profile_data(request.user)
         
-        elif user.role == 'instructor':
-            instruktur = Instruktur.objects.get(id=user.id)
-            data['instruktur_id'] = str(instruktur.instruktur_id)
-            data['keahlian'] = instruktur.keahlian
-        
-        # Render template
-        return render(request, 'user_management/profile.html', {'user': data})
+        if as_json:
+            response = json_response(profiles.PROFILE_ENCODER.encode(data))
+        else:
+            # Render template
+            response = render(request, 'user_management/profile.html', {'user': data})
+        response['ETag'] = etag
+        return response
 
     def post(self, request):
         """
         - Validate profile update data
         - Apply profile changes
+        - Honour If-Match with an optimistic conditional update
         """
-        user = get_object_or_404(Pengguna, id=request.user.id)
+        user = request.user.as_role()
         
         try:
-            data = request.POST
+            user = profiles.update_profile(user, request.data, profiles.if_match_version(request, user))
             
-            # Update user fields
-            if 'email' in data:
-                user.email = data['email']
-            if 'first_name' in data:
-                user.first_name = data['first_name']
-            if 'last_name' in data:
-                user.last_name = data['last_name']
-            if 'username' in data and user.username != data['username']:
-                # Check if username is available
-                if Pengguna.objects.filter(username=data['username']).exists():
-                    messages.error(request, 'Username already taken')
-                    return redirect('user_management:profile')
-                user.username = data['username']
-                
-            # Role-specific updates
-            if user.role == 'instructor' and 'keahlian' in data:
-                instruktur = Instruktur.objects.get(id=user.id)
-                instruktur.keahlian = data['keahlian']
-                instruktur.save()
+        except profiles.ProfileConflict:
+            if wants_json(request):
+                return json_response(profiles.PROFILE_CONFLICT, status=412)
+            messages.error(request, profiles.PROFILE_CONFLICT_MESSAGE)
+            return redirect('user_management:profile')
             
-            user.save()
+        except profiles.UsernameTaken:
+            if wants_json(request):
+                return json_response(profiles.USERNAME_TAKEN, status=400)
+            messages.error(request, 'Username already taken')
+            return redirect('user_management:profile')
             
-            messages.success(request, 'Profile updated successfully')
+        except profiles.EmailTaken:
+            if wants_json(request):
+                return json_response(profiles.EMAIL_TAKEN, status=400)
+            messages.error(request, 'Email already taken')
             return redirect('user_management:profile')
             
         except Exception as e:
+            if wants_json(request):
+                return json_response(profiles.result_payload(False, f'Error updating profile: {str(e)}'), status=400)
             messages.error(request, f'Error updating profile: {str(e)}')
             return redirect('user_management:profile')
+        
+        if wants_json(request):
+            response = json_response(profiles.PROFILE_UPDATED)
+            response['ETag'] = profiles.profile_etag(user, 'json')
+            return response
+        messages.success(request, 'Profile updated successfully')
+        return redirect('user_management:profile')
 
     def delete(self, request):
         """
@@ -89,54 +96,49 @@ class UserProfileView(APIView):
         - Return success/failure response
         """
         try:
-            user = get_object_or_404(Pengguna, id=request.user.id)
+            user = get_object_or_404(Pengguna.objects.locate(pk=request.user.pk), id=request.user.id)
             user.delete()
             
+            if wants_json(request):
+                return json_response(profiles.ACCOUNT_DELETED)
             messages.success(request, 'Your account has been deleted successfully')
             return redirect('authentication:login')
             
         except Exception as e:
+            if wants_json(request):
+                return json_response(profiles.result_payload(False, f'Error deleting account: {str(e)}'), status=400)
             messages.error(request, f'Error deleting account: {str(e)}')
             return redirect('user_management:profile')
 
+@negotiated
 class ChangePasswordView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [PasswordChangeThrottle]
     
     def post(self, request):
         """
         Change user password
         """
-        form = PasswordChangeForm(user=request.user, data=request.POST)
+        # The loaded user, not a bearer token's TokenUser, so the new hash is saved
+        form = PasswordChangeForm(user=request.user.as_role(), data=request.data)
         if form.is_valid():
             user = form.save()
-            # Update the session to prevent logging out
+            # Update the session to prevent logging out, and end every other session
             update_session_auth_hash(request, user)
+            logout_other_sessions(request, user)
+            
+            if wants_json(request):
+                return json_response(profiles.PASSWORD_UPDATED)
             
             messages.success(request, 'Your password was successfully updated!')
             return redirect('user_management:profile')
+        elif wants_json(request):
+            return json_response(profiles.result_payload(
+                False, 'Password change failed. Please correct the errors below.', form.errors
+            ), status=400)
         else:
-            # Get user data for the template, similar to ProfileView
-            user = get_object_or_404(Pengguna, id=request.user.id)
-            user_data = {
-                'username': user.username,
-                'email': user.email,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'role': user.role,
-                'user_id': str(user.user_id),
-            }
-            
-            # Add role-specific data
-            if user.role == 'admin':
-                admin = Admin.objects.get(id=user.id)
-                user_data['admin_id'] = str(admin.admin_id)
-                user_data['is_staff'] = admin.is_staff
-                user_data['is_superuser'] = admin.is_superuser
-            
-            elif user.role == 'instructor':
-                instruktur = Instruktur.objects.get(id=user.id)
-                user_data['instruktur_id'] = str(instruktur.instruktur_id)
-                user_data['keahlian'] = instruktur.keahlian
+            # Get user data for the template, same projection as ProfileView
+            user_data = get_profile_data(request.user)
             
             messages.error(request, 'Password change failed. Please correct the errors below.')
             return render(request, 'user_management/profile.html', {
@@ -145,6 +147,7 @@ class ChangePasswordView(APIView):
                 'active_tab': 'security'  # This will help the template show the security tab
             })
 
+@negotiated
 class DeleteAccountView(APIView):
     """
     Handle account deletion and logging out the user
@@ -162,9 +165,132 @@ class DeleteAccountView(APIView):
             # Delete the user account
             user.delete()
             
+            if wants_json(request):
+                return json_response(profiles.ACCOUNT_DELETED)
             messages.success(request, 'Your account has been deleted successfully')
             return redirect('home')
             
         except Exception as e:
+            if wants_json(request):
+                return json_response(profiles.result_payload(False, f'Error deleting account: {str(e)}'), status=400)
             messages.error(request, f'Error deleting account: {str(e)}')
             return redirect('user_management:profile')
+
+class UserImportView(APIView):
+    """
+    Bulk import users from an uploaded CSV or JSONL file (admin only).
+    Streams one NDJSON line per rejected row and per committed chunk,
+    followed by a summary line.
+    """
+    permission_classes = [IsAdminUser]
+    
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return JsonResponse({'status': 'error', 'message': 'No file uploaded'}, status=400)
+        
+        fmt = request.POST.get('format') or (
+            'jsonl' if upload.name.endswith(('.jsonl', '.ndjson')) else 'csv'
+        )
+        if fmt not in ('csv', 'jsonl'):
+            return JsonResponse({'status': 'error', 'message': f'Unsupported format: {fmt}'}, status=400)
+        
+        importer = UserImporter()
+        
+        def stream():
+            for event in importer.run(read_rows(text_stream(upload.file), fmt)):
+                yield json.dumps(event) + '\n'
+            yield json.dumps({'status': 'success', 'summary': importer.summary()}) + '\n'
+        
+        return StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+
+
+def export_response(exporter, filename):
+    """
+    Stream an exporter's chunks as a file download.
+    """
+    content_type, extension = EXPORT_FORMATS[exporter.fmt]
+    response = StreamingHttpResponse(exporter.chunks(), content_type=f'{content_type}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    return response
+
+class UserExportView(APIView):
+    """
+    Stream every user as CSV or JSONL (admin only), with the
+    Instruktur and Admin columns filled in for those roles.
+    """
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request, fmt):
+        if fmt not in EXPORT_FORMATS:
+            return JsonResponse({'status': 'error', 'message': f'Unsupported format: {fmt}'}, status=400)
+        return export_response(UserExporter(fmt), 'users')
+
+
+class PassthroughRenderer(BaseRenderer):
+    """
+    Declares a media type for content negotiation; the view encodes the body.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+class NDJSONRenderer(PassthroughRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+class UserBinaryRenderer(PassthroughRenderer):
+    media_type = 'application/vnd.auth-service.users'
+    format = 'binary'
+    charset = None
+
+class UserLookupView(APIView):
+    """
+    Public profiles (username, name, role) of up to USER_LOOKUP_MAX_IDS users
+    for other services. POST {"user_ids": [...]}; the Accept header picks
+    JSON, NDJSON or the binary format described in user_management.lookup.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer, NDJSONRenderer, UserBinaryRenderer]
+    
+    def post(self, request):
+        try:
+            ids = lookup.parse_ids(request.data.get('user_ids') if isinstance(request.data, dict) else None)
+        except ValueError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+        
+        profiles = lookup.lookup(ids)
+        fmt = request.accepted_renderer.format
+        if fmt == 'binary':
+            body = lookup.render_binary(profiles)
+        elif fmt == 'ndjson':
+            body = lookup.render_ndjson(profiles)
+        else:
+            body = lookup.render_json(profiles)
+        return HttpResponse(body, content_type=request.accepted_media_type)
+
+class UserDirectoryView(APIView):
+    """
+    Browse and search users (admins and instructors), one keyset page at a time.
+    Query parameters: role, joined_after, joined_before (ISO dates), q
+    (prefix search over username, name and email), size, cursor (the
+    `next` of the previous page).
+    """
+    permission_classes = [IsAdminRole | IsInstructor]
+    
+    def get(self, request):
+        params = request.query_params
+        filters = {'role': params.get('role'), 'q': params.get('q')}
+        try:
+            for name in ('joined_after', 'joined_before'):
+                if params.get(name):
+                    filters[name] = directory.parse_joined(params[name])
+            size = min(int(params.get('size', settings.USER_DIRECTORY_PAGE_SIZE)), settings.USER_DIRECTORY_MAX_PAGE_SIZE)
+            if size < 1:
+                raise ValueError('size must be positive')
+            users, cursor = directory.directory_page(params.get('cursor'), size, **filters)
+        except ValueError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+        
+        body = '{"results":[' + ','.join(directory.directory_entry(user) for user in users) + '],"next":'
+        body += ('"' + cursor + '"' if cursor else 'null') + '}'
+        return json_response(ObjectEncoded(body))